@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks offline del pipeline (procesar_infoleg, parsear_html, extraer_relaciones_json, telaraña, analítica del grafo).
+
+Uso:
+    python benchmarks/correr_benchmarks.py --tamanos 10000,100000 --guardar
+    python benchmarks/correr_benchmarks.py --tamanos 10000 --fallar-si-regresion
+
+Los resultados se agregan a benchmarks/resultados.jsonl (uno por benchmark y corrida) y cada
+corrida se compara contra la mediana de las últimas corridas del mismo benchmark.
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import shutil
+import platform
+import argparse
+import statistics
+import subprocess
+import tempfile
+from collections import Counter
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.join(BENCH_DIR, "..")
+SCRIPTS_DIR = os.path.join(ROOT_DIR, "scripts")
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures", "fichas")
+CORPUS_DIR = os.path.join(BENCH_DIR, "corpus")
+RESULTADOS = os.path.join(BENCH_DIR, "resultados.jsonl")
+BLOQUE = 50000                  # filas por bloque para el modo de memoria acotada
+
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, SCRIPTS_DIR)
+
+from generar_corpus import generar
+
+# ==================================================
+# Helpers
+# ==================================================
+
+def commit_actual():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def medir(func, repeticiones):
+    """Devuelve la mediana de `repeticiones` ejecuciones de func()."""
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        func()
+        tiempos.append(time.perf_counter() - t0)
+    return statistics.median(tiempos)
+
+
+def corpus(tamano):
+    destino = os.path.join(CORPUS_DIR, str(tamano))
+    if not os.path.exists(os.path.join(destino, "infoleg_normativa.csv")):
+        print(f"🧪 Generando corpus sintético de {tamano:,} normas...")
+        generar(destino, tamano)
+    return destino
+
+
+def cargar_fixtures():
+    fichas = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        id_norma = os.path.splitext(os.path.basename(path))[0]
+        with open(path, encoding="utf-8") as f:
+            fichas[id_norma] = f.read()
+    return fichas
+
+
+def fichas_sinteticas(plantillas, cantidad):
+    """Replica las fichas parseadas de los fixtures con ids distintos."""
+    base = [p for p in plantillas if p]
+    for i in range(cantidad):
+        ficha = dict(base[i % len(base)])
+        ficha["id_norma"] = str(1000000 + i)
+        yield ficha
+
+# fichas con casos borde para verificar_extraccion (ids de más de 19 dígitos, negativos, número/año)
+FICHAS_BORDE = [
+    {
+        "id_norma": "5",
+        "relaciones": {"modifica": [("Ley", "http://servicios.infoleg.gob.ar/?id=123456789012345678901234")]},
+        "deep": {
+            "normas_mencionadas": ["77", "-3", "2147483648"],
+            "normas_mencionadas_texto": ["Ley 99999999999999999999", "Decreto 1023/2001", "Ley 12"],
+        },
+    },
+    {"id_norma": "99999999999999999999", "relaciones": {}, "deep": {"normas_mencionadas": ["8"]}},
+]
+
+# ==================================================
+# Verificación
+# ==================================================
+
+def verificar_extraccion(plantillas):
+    """extraer_relaciones_lote tiene que dar lo mismo que extraer_relaciones_json ficha por ficha.
+
+    Los destinos que no son un id válido quedan NA en los dos. Devuelve la lista de diferencias.
+    """
+    from construir_telaraña import _entero, extraer_relaciones_json, extraer_relaciones_lote
+
+    fichas = [p for p in plantillas if p] + FICHAS_BORDE
+    diferencias = []
+    for ficha in fichas:
+        def a_id(x):
+            valor = _entero(x)
+            return None if valor < 0 else valor
+
+        esperadas = Counter((a_id(o), a_id(d), t, f) for o, d, t, f in extraer_relaciones_json(ficha))
+        df = extraer_relaciones_lote([ficha])
+        obtenidas = Counter(
+            (None if o is None else int(o), None if d is None else int(d), t, f)
+            for o, d, t, f in df.astype(object).where(df.notna(), None).itertuples(index=False)
+        )
+        if esperadas != obtenidas:
+            diferencias.append((ficha["id_norma"], esperadas, obtenidas))
+    return diferencias
+
+# ==================================================
+# Benchmarks
+# ==================================================
+
+def bench_procesar(tamano, salida, argumentos=()):
+    """Corre procesar_infoleg.py como subproceso sobre el corpus sintético."""
+    metricas_dir = os.path.join(salida, "metricas")
+    shutil.rmtree(metricas_dir, ignore_errors=True)
+    env = dict(
+        os.environ,
+        DIGESTO_DATA_DIR=corpus(tamano),
+        DIGESTO_PROCESADA_DIR=salida,
+        DIGESTO_METRICAS=metricas_dir,
+        DIGESTO_METRICAS_FORMATO="jsonl",
+    )
+    t0 = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(SCRIPTS_DIR, "procesar_infoleg.py"), *argumentos],
+        env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+    segundos = time.perf_counter() - t0
+
+    rss = None
+    with open(os.path.join(metricas_dir, "metricas.jsonl"), encoding="utf-8") as f:
+        for linea in f:
+            reg = json.loads(linea)
+            if reg["tipo"] == "proceso":
+                rss = reg["rss_pico_bytes"]
+    return {"segundos": segundos, "rss_bytes": rss}
+
+
+def bench_parsear_html(fixtures, repeticiones):
+    from scraper_fichas_infoleg import parsear_html
+
+    def correr():
+        for id_norma, html in fixtures.items():
+            parsear_html(id_norma, html)
+
+    segundos = medir(correr, repeticiones)
+    return {"segundos": segundos, "por_ficha": segundos / len(fixtures)}
+
+
+def bench_extraer_relaciones(plantillas, cantidad, repeticiones):
+    from construir_telaraña import extraer_relaciones_json
+
+    fichas = list(fichas_sinteticas(plantillas, cantidad))
+
+    def correr():
+        for ficha in fichas:
+            extraer_relaciones_json(ficha)
+
+    return {"segundos": medir(correr, repeticiones)}
+
+
+def bench_extraer_relaciones_lote(plantillas, cantidad, repeticiones):
+    from construir_telaraña import extraer_relaciones_lote
+
+    fichas = list(fichas_sinteticas(plantillas, cantidad))
+    return {"segundos": medir(lambda: extraer_relaciones_lote(fichas), repeticiones)}
+
+
+def bench_telarana(plantillas, cantidad, salida, repeticiones):
+    from construir_telaraña import construir_telarana
+    from esquema_digesto import leer_relaciones
+
+    df_oficial = leer_relaciones(os.path.join(salida, "digesto_relaciones.csv"))
+    fichas = list(fichas_sinteticas(plantillas, cantidad))
+    return {"segundos": medir(lambda: construir_telarana(df_oficial, fichas), repeticiones)}
+
+def bench_analitica(salida, repeticiones):
+    from analitica_grafo import analizar
+    from esquema_digesto import leer_normas, leer_relaciones
+
+    df_rel = leer_relaciones(os.path.join(salida, "digesto_relaciones.csv"))
+    ids = leer_normas(os.path.join(salida, "digesto_normas.csv"), columnas=["id_norma"])["id_norma"]
+    return {"segundos": medir(lambda: analizar(df_rel, ids), repeticiones)}
+
+# ==================================================
+# Historial y regresiones
+# ==================================================
+
+def leer_historial():
+    if not os.path.exists(RESULTADOS):
+        return []
+    with open(RESULTADOS, encoding="utf-8") as f:
+        return [json.loads(l) for l in f if l.strip()]
+
+
+def comparar(resultados, historial, ventana, umbral):
+    regresiones = []
+    for r in resultados:
+        previos = [
+            h["segundos"] for h in historial
+            if h["benchmark"] == r["benchmark"] and h["tamano"] == r["tamano"]
+        ][-ventana:]
+        if not previos:
+            r["referencia"] = None
+            continue
+        referencia = statistics.median(previos)
+        r["referencia"] = referencia
+        if r["segundos"] > referencia * (1 + umbral):
+            regresiones.append(r)
+    return regresiones
+
+
+def imprimir(resultados):
+    print(f"\n{'benchmark':<28}{'tamaño':>10}{'segundos':>12}{'referencia':>12}{'RSS MB':>10}")
+    for r in resultados:
+        ref = f"{r['referencia']:.3f}" if r.get("referencia") else "-"
+        rss = f"{r['rss_bytes'] / 2**20:.0f}" if r.get("rss_bytes") else "-"
+        print(f"{r['benchmark']:<28}{r['tamano']:>10,}{r['segundos']:>12.3f}{ref:>12}{rss:>10}")
+
+# ==================================================
+# MAIN
+# ==================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", default="10000,100000", help="filas del corpus, separadas por coma (ej. 10000,100000,1000000)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--guardar", action="store_true", help="agrega los resultados a benchmarks/resultados.jsonl")
+    parser.add_argument("--umbral", type=float, default=0.25, help="tolerancia antes de marcar regresión (0.25 = +25%%)")
+    parser.add_argument("--ventana", type=int, default=5, help="corridas previas usadas como referencia")
+    parser.add_argument("--fallar-si-regresion", action="store_true")
+    args = parser.parse_args()
+
+    tamanos = [int(t) for t in args.tamanos.split(",") if t.strip()]
+    base = {
+        "ts": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit_actual(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+    }
+    resultados = []
+
+    fixtures = cargar_fixtures()
+    print(f"🧪 Fixtures de fichas: {len(fixtures)}")
+
+    from scraper_fichas_infoleg import parsear_html
+    plantillas = [parsear_html(id_norma, html) for id_norma, html in fixtures.items()]
+
+    diferencias = verificar_extraccion(plantillas)
+    if diferencias:
+        print("❌ extraer_relaciones_lote no coincide con extraer_relaciones_json:")
+        for id_norma, esperadas, obtenidas in diferencias:
+            print(f"   ficha {id_norma}: faltan {dict(esperadas - obtenidas)}, sobran {dict(obtenidas - esperadas)}")
+        sys.exit(1)
+    print(f"✔ Extracción por lotes igual a la de ficha por ficha ({len(plantillas) + len(FICHAS_BORDE)} fichas)")
+
+    r = bench_parsear_html(fixtures, args.repeticiones)
+    resultados.append({**base, "benchmark": "parsear_html", "tamano": len(fixtures), **r})
+
+    for tamano in tamanos:
+        salida = tempfile.mkdtemp(prefix=f"digesto_bench_{tamano}_")
+        try:
+            print(f"⏱️ procesar_infoleg sobre {tamano:,} normas...")
+            r = bench_procesar(tamano, salida)
+            resultados.append({**base, "benchmark": "procesar_infoleg", "tamano": tamano, **r})
+
+            print(f"⏱️ procesar_infoleg por bloques de {BLOQUE:,} filas...")
+            r = bench_procesar(tamano, salida, ["--bloque", str(BLOQUE)])
+            resultados.append({**base, "benchmark": "procesar_infoleg_bloques", "tamano": tamano, **r})
+
+            print(f"⏱️ procesar_infoleg por bloques en {os.cpu_count()} procesos...")
+            r = bench_procesar(tamano, salida, ["--bloque", str(BLOQUE), "--procesos", "0"])
+            resultados.append({**base, "benchmark": "procesar_infoleg_paralelo", "tamano": tamano, **r})
+
+            # una ficha cada diez normas, como en el corpus real a medio scrapear
+            cantidad = max(tamano // 10, 1)
+            print(f"⏱️ extraer_relaciones_json sobre {cantidad:,} fichas...")
+            r = bench_extraer_relaciones(plantillas, cantidad, args.repeticiones)
+            resultados.append({**base, "benchmark": "extraer_relaciones_json", "tamano": cantidad, **r})
+
+            r = bench_extraer_relaciones_lote(plantillas, cantidad, args.repeticiones)
+            resultados.append({**base, "benchmark": "extraer_relaciones_lote", "tamano": cantidad, **r})
+
+            print(f"⏱️ construir_telarana sobre {tamano:,} normas...")
+            r = bench_telarana(plantillas, cantidad, salida, args.repeticiones)
+            resultados.append({**base, "benchmark": "construir_telarana", "tamano": tamano, **r})
+
+            print(f"⏱️ analitica_grafo sobre {tamano:,} normas...")
+            r = bench_analitica(salida, args.repeticiones)
+            resultados.append({**base, "benchmark": "analitica_grafo", "tamano": tamano, **r})
+        finally:
+            shutil.rmtree(salida, ignore_errors=True)
+
+    regresiones = comparar(resultados, leer_historial(), args.ventana, args.umbral)
+    imprimir(resultados)
+
+    if args.guardar:
+        with open(RESULTADOS, "a", encoding="utf-8") as f:
+            for r in resultados:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        print(f"\n💾 Resultados agregados a {RESULTADOS}")
+
+    sin_historial = [r for r in resultados if r["referencia"] is None]
+    if sin_historial:
+        aviso = f"{len(sin_historial)} de {len(resultados)} benchmarks sin historial en {RESULTADOS}: no se comparan"
+        print(f"\n⚠️ {aviso}:")
+        for r in sin_historial:
+            print(f"   {r['benchmark']}[{r['tamano']:,}]")
+        if os.environ.get("GITHUB_ACTIONS"):
+            print(f"::warning title=Benchmarks sin historial::{aviso}")
+
+    if regresiones:
+        print("\n❌ Regresiones detectadas:")
+        for r in regresiones:
+            print(f"   {r['benchmark']}[{r['tamano']:,}]: {r['segundos']:.3f}s vs {r['referencia']:.3f}s")
+        if args.fallar_si_regresion:
+            sys.exit(1)
+    elif len(sin_historial) == len(resultados):
+        print("\n⚠️ Sin historial: no se pudo buscar regresiones.")
+    else:
+        print(f"\n✔ Sin regresiones en {len(resultados) - len(sin_historial)} benchmarks comparados.")
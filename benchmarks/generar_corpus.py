@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""Genera un corpus sintético con el mismo esquema que los CSV crudos de Infoleg.
+
+Uso:
+    python benchmarks/generar_corpus.py --filas 100000 --destino benchmarks/corpus/100k
+"""
+
+import os
+import csv
+import random
+import argparse
+from datetime import date, timedelta
+
+# ==================================================
+# Vocabulario
+# ==================================================
+
+TIPOS = [
+    ("Resolución", 0.55), ("Decreto", 0.18), ("Disposición", 0.15), ("Ley", 0.04),
+    ("Decisión Administrativa", 0.03), ("Resolución General", 0.03), ("Acordada", 0.02),
+]
+
+ORGANISMOS = [
+    "MINISTERIO DE ECONOMIA", "SECRETARIA DE ENERGIA", "PODER EJECUTIVO NACIONAL (P.E.N.)",
+    "HONORABLE CONGRESO DE LA NACION ARGENTINA", "ADMINISTRACION FEDERAL DE INGRESOS PUBLICOS",
+    "MINISTERIO DE SALUD", "SECRETARIA DE COMERCIO INTERIOR", "BANCO CENTRAL DE LA REPUBLICA ARGENTINA",
+    "ENTE NACIONAL REGULADOR DEL GAS", "MINISTERIO DE TRABAJO, EMPLEO Y SEGURIDAD SOCIAL",
+]
+
+TEMAS = [
+    "ENERGIA ELECTRICA", "IMPUESTOS", "PRECIOS", "ADMINISTRACION PUBLICA NACIONAL", "SALUD PUBLICA",
+    "COMERCIO EXTERIOR", "JUBILACIONES Y PENSIONES", "TRANSPORTE", "EDUCACION", "TELECOMUNICACIONES",
+]
+
+SUMARIOS = [
+    "APRUÉBANSE LOS PRECIOS DE REFERENCIA DE LA POTENCIA Y LA ENERGÍA",
+    "DESÍGNASE FUNCIONARIO EN EL ÁMBITO DE LA DIRECCIÓN NACIONAL",
+    "MODIFÍCASE EL RÉGIMEN DE PROMOCIÓN ESTABLECIDO POR LA LEY",
+    "ESTABLÉCESE EL PROCEDIMIENTO PARA LA INSCRIPCIÓN EN EL REGISTRO",
+    "PRORRÓGASE LA EMERGENCIA PÚBLICA EN MATERIA ECONÓMICA Y SOCIAL",
+    "FÍJANSE LOS VALORES MÁXIMOS DE VENTA AL PÚBLICO",
+    "APRUÉBASE EL REGLAMENTO DE CONTRATACIONES DE LA ADMINISTRACIÓN",
+]
+
+COLUMNAS_NORMATIVA = [
+    "id_norma", "tipo_norma", "numero_norma", "clase_norma", "organismo_origen", "fecha_sancion",
+    "numero_boletin", "fecha_boletin", "pagina_boletin", "titulo_resumido", "titulo_sumario",
+    "texto_resumido", "observaciones", "texto_original", "texto_actualizado", "modificada_por", "modifica_a",
+]
+
+COLUMNAS_RELACION = [
+    "id_norma_modificada", "tipo_norma", "nro_norma", "organismo_origen", "fecha_boletin",
+    "titulo_sumario", "id_norma_modificatoria",
+]
+
+# ==================================================
+# Helpers
+# ==================================================
+
+def mojibake(texto):
+    """Reproduce el UTF-8 leído como latin1 que trae Infoleg ("ResoluciÃ³n")."""
+    return texto.encode("utf-8").decode("latin1")
+
+
+def quizas_mojibake(rng, texto, proporcion):
+    return mojibake(texto) if rng.random() < proporcion else texto
+
+
+def fecha_aleatoria(rng):
+    return date(1950, 1, 1) + timedelta(days=rng.randrange(0, 27000))
+
+
+def url_anexo(id_norma, archivo):
+    bloque = id_norma // 5000 * 5000
+    return f"http://servicios.infoleg.gob.ar/infolegInternet/anexos/{bloque}-{bloque + 4999}/{id_norma}/{archivo}"
+
+# ==================================================
+# Generación
+# ==================================================
+
+def generar(destino, filas, semilla=42, proporcion_mojibake=0.05, relaciones_por_norma=1.5):
+    rng = random.Random(semilla)
+    os.makedirs(destino, exist_ok=True)
+
+    tipos = [t for t, _ in TIPOS]
+    pesos = [p for _, p in TIPOS]
+    ids = rng.sample(range(1, filas * 4), filas)
+
+    with open(os.path.join(destino, "infoleg_normativa.csv"), "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(COLUMNAS_NORMATIVA)
+        for id_norma in ids:
+            tipo = rng.choices(tipos, pesos)[0]
+            sancion = fecha_aleatoria(rng)
+            boletin = sancion + timedelta(days=rng.randrange(1, 20))
+            numero = f"{rng.randrange(1, 3000)}/{sancion.year}" if tipo != "Ley" else str(rng.randrange(10000, 28000))
+            sumario = quizas_mojibake(rng, rng.choice(SUMARIOS), proporcion_mojibake)
+            w.writerow([
+                id_norma,
+                quizas_mojibake(rng, tipo, proporcion_mojibake),
+                numero,
+                "",
+                rng.choice(ORGANISMOS),
+                sancion.isoformat(),
+                rng.randrange(20000, 35000),
+                boletin.isoformat() if rng.random() > 0.02 else "",
+                rng.randrange(1, 120),
+                rng.choice(TEMAS),
+                sumario,
+                sumario if rng.random() < 0.3 else "",
+                "",
+                url_anexo(id_norma, "norma.htm") if rng.random() < 0.6 else "",
+                url_anexo(id_norma, "texact.htm") if rng.random() < 0.2 else "",
+                rng.randrange(0, 5),
+                rng.randrange(0, 5),
+            ])
+
+    n_rel = int(filas * relaciones_por_norma)
+    for archivo, columna_a, columna_b in (
+        ("infoleg_modificadas.csv", "id_norma_modificada", "id_norma_modificatoria"),
+        ("infoleg_modificatorias.csv", "id_norma_modificatoria", "id_norma_modificada"),
+    ):
+        with open(os.path.join(destino, archivo), "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(COLUMNAS_RELACION)
+            for _ in range(n_rel):
+                # sesgo hacia pocas normas muy modificadas, como en el corpus real
+                modificada = ids[int(rng.paretovariate(1.2)) % filas]
+                modificatoria = rng.choice(ids)
+                w.writerow([
+                    modificada,
+                    rng.choice(tipos),
+                    rng.randrange(1, 3000),
+                    rng.choice(ORGANISMOS),
+                    fecha_aleatoria(rng).isoformat(),
+                    quizas_mojibake(rng, rng.choice(SUMARIOS), proporcion_mojibake),
+                    modificatoria,
+                ])
+
+    return destino
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=10000)
+    parser.add_argument("--destino", required=True)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--mojibake", type=float, default=0.05, help="proporción de textos con mojibake")
+    args = parser.parse_args()
+
+    generar(args.destino, args.filas, args.semilla, args.mojibake)
+    print(f"✔ Corpus sintético de {args.filas:,} normas en {args.destino}")
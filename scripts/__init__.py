@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+
+"""Scripts del digesto. `python -m scripts` es la CLI única (ver __main__.py).
+
+A propósito no importa nada: importar el paquete o uno de sus módulos no carga pandas, bs4 ni
+los modelos de embeddings hasta que una función los necesita.
+"""
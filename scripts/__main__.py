@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""CLI única del digesto: python -m scripts <comando> [argumentos del comando]
+
+Cada comando corre uno de los scripts de esta carpeta igual que `python scripts/<script>.py`,
+y el script recién se importa cuando se lo pide: listar los comandos o pedir `estado` no carga
+pandas ni requests, y `consultar` abre solo los artefactos ya publicados (numpy + mmap).
+
+    python -m scripts                           lista los comandos
+    python -m scripts estado                    versión publicada y cola de fichas
+    python -m scripts consultar "/buscar?q=emergencia sanitaria"
+    python -m scripts telarana --help
+"""
+
+import os
+import sys
+import json
+import runpy
+import argparse
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+# ============================================
+# COMANDOS
+# ============================================
+
+# comando: (script, argumentos que se anteponen, descripción)
+COMANDOS = {
+    "descargar": ("descargar_infoleg", [], "baja los CSV de Infoleg y los sube a Dropbox"),
+    "cambios": ("cambios_infoleg", [], "qué normas y relaciones cambiaron respecto del dump anterior"),
+    "procesar": ("procesar_infoleg", [], "arma digesto_normas.csv y digesto_relaciones.csv"),
+    "fichas": ("procesar_fichas_pendientes", [], "descarga y parsea las fichas pendientes de la cola"),
+    "sync-fichas": ("sync_fichas_dropbox", [], "marca en digesto_normas las fichas que ya están en Dropbox"),
+    "almacen": ("almacen_fichas", [], "migrar, compactar o ver el almacén de fichas"),
+    "telarana": ("construir_telaraña", [], "arma la telaraña expandida, su analítica y los casi duplicados"),
+    "exportar": ("exportar_grafo", [], "exporta la telaraña a parquet, CSR, GraphML o TSV"),
+    "analitica": ("analitica_grafo", [], "PageRank, componentes y grados de la telaraña"),
+    "temporal": ("indice_temporal", [], "construir o consultar el índice temporal de modificaciones"),
+    "duplicados": ("duplicados", [], "grupos de normas casi duplicadas"),
+    "textos": ("textos_normas", [], "descarga los textos completos y los indexa por artículo"),
+    "indice": ("indice_busqueda", [], "construir o consultar el índice BM25 de normas"),
+    "pasajes": ("pasajes", [], "buscar en el índice de pasajes de los textos completos"),
+    "servicio": ("servicio_consultas", [], "publicar, servir o consultar los artefactos"),
+    "consultar": ("servicio_consultas", ["consultar"], "resuelve una ruta del servicio sin levantarlo"),
+}
+
+
+def listar():
+    print(__doc__)
+    print("Comandos:")
+    print(f"    {'estado':<14}lo publicado y la cola de fichas, sin abrir artefactos")
+    for comando, (_, _, descripcion) in COMANDOS.items():
+        print(f"    {comando:<14}{descripcion}")
+
+
+def estado(argv):
+    """Lo que ya quedó escrito en disco: manifiesto de la versión vigente y resumen de la cola."""
+    from servicio_consultas import SERVICIO_DIR, version_actual
+    from cola_fichas import COLA_PATH, ColaFichas
+
+    parser = argparse.ArgumentParser(prog="python -m scripts estado")
+    parser.add_argument("--base", default=SERVICIO_DIR, help="carpeta del servicio")
+    parser.add_argument("--cola", default=COLA_PATH)
+    args = parser.parse_args(argv)
+
+    salida = {"servicio": None, "cola_fichas": None}
+    version = version_actual(args.base)
+    if version:
+        with open(os.path.join(args.base, "versiones", version, "manifiesto.json"), encoding="utf-8") as f:
+            manifiesto = json.load(f)
+        salida["servicio"] = {
+            k: manifiesto.get(k) for k in ("version", "normas", "aristas", "pasajes", "modelo_embeddings")
+        }
+    if os.path.exists(args.cola):
+        cola = ColaFichas(args.cola)
+        salida["cola_fichas"] = cola.resumen()
+        cola.cerrar()
+    print(json.dumps(salida, indent=2, ensure_ascii=False))
+
+# ============================================
+# PRINCIPAL
+# ============================================
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        listar()
+        return
+    # los scripts se importan entre sí por nombre (import metricas, ...)
+    sys.path.insert(0, DIRECTORIO)
+    comando, resto = argv[0], argv[1:]
+    if comando == "estado":
+        estado(resto)
+        return
+    if comando not in COMANDOS:
+        print(f"❌ Comando desconocido: {comando}\n")
+        listar()
+        sys.exit(2)
+    script, previos, _ = COMANDOS[comando]
+    sys.argv = [script] + previos + resto
+    runpy.run_module(script, run_name="__main__", alter_sys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,594 @@
+# -*- coding: utf-8 -*-
+
+"""Almacén empaquetado de fichas: segmentos comprimidos con zstd + índice por id_norma.
+
+En vez de un archivo por norma en /fichas_html y /fichas_json, cada ficha es un registro
+dentro de un segmento (seg-000001.pack, ...) de hasta SEGMENTO_MAX bytes. El índice
+(indice.tsv) dice en qué segmento y offset está la última versión de cada (tipo, id_norma),
+así que se puede leer una ficha suelta con un seek o recorrer todo el corpus con unas
+pocas lecturas secuenciales.
+
+Las fichas de Infoleg repiten casi todo el markup y las claves del JSON, así que cada tipo
+se comprime con un diccionario zstd entrenado sobre una muestra del propio almacén
+(dic-<tipo>-NNN.zdict). Cada frame guarda el id de su diccionario: al leer se elige solo.
+
+Uso:
+    python scripts/almacen_fichas.py migrar      # copia /fichas_json y /fichas_html al almacén
+    python scripts/almacen_fichas.py compactar   # reescribe sin versiones viejas
+    python scripts/almacen_fichas.py entrenar    # diccionarios nuevos + recompresión de todo
+    python scripts/almacen_fichas.py estado
+"""
+
+import os
+import sys
+import json
+import glob
+import shutil
+import struct
+import zlib
+import random
+import argparse
+import threading
+
+import requests
+import zstandard
+
+# ============================================
+# CONFIG
+# ============================================
+
+DROPBOX_CLIENT_ID = os.environ.get("APP_KEY")
+DROPBOX_CLIENT_SECRET = os.environ.get("APP_SECRET")
+DROPBOX_REFRESH_TOKEN = os.environ.get("REFRESH_TOKEN")
+
+ALMACEN_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "fichas_pack"
+)
+DROPBOX_ALMACEN_FOLDER = "/fichas_pack"
+
+SEGMENTO_MAX = 64 * 2**20      # 64 MB, holgado bajo el límite de 150 MB de /files/upload
+NIVEL_ZSTD = 9
+
+# registro: cabecera | id_norma | datos comprimidos
+# cabecera: magia, tipo, largo del id, largo de los datos, crc32 de los datos
+CABECERA = struct.Struct("<4scHII")
+MAGIA = b"DGF1"
+TIPOS = {"html": b"h", "json": b"j", "texto": b"t"}
+TIPOS_INV = {v: k for k, v in TIPOS.items()}
+
+INDICE = "indice.tsv"
+
+# diccionarios: ~100 KB es el punto dulce de zstd para objetos de pocos KB
+DICCIONARIO_TAMANO = 112 * 1024
+DICCIONARIO_MUESTRAS = 2000
+DICCIONARIO_MIN_MUESTRAS = 200    # con menos, el diccionario sobreajusta y no aporta
+TIPOS_CON_DICCIONARIO = ("html", "json")
+
+# ============================================
+# ÍNDICE
+# ============================================
+
+def leer_indice(path):
+    """Recorre indice.tsv: ((tipo, id_norma), (segmento, offset, largo)); la última línea de cada id gana."""
+    with open(path, encoding="utf-8") as f:
+        for linea in f:
+            partes = linea.rstrip("\n").split("\t")
+            if len(partes) != 5:
+                continue  # línea cortada por un corte abrupto
+            tipo, id_norma, seg, offset, largo = partes
+            yield (tipo, id_norma), (int(seg), int(offset), int(largo))
+
+# ============================================
+# ALMACÉN
+# ============================================
+
+class AlmacenFichas:
+    """Segmentos append-only + índice (tipo, id_norma) -> (segmento, offset, largo)."""
+
+    def __init__(self, directorio=ALMACEN_DIR, primer_segmento=1, bajar_faltantes=False):
+        """Con `bajar_faltantes` los segmentos que no están en disco se traen de Dropbox al leerlos."""
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+        self.lock = threading.Lock()
+        self.indice = {}
+        self._zstd = threading.local()   # los (de)compresores de zstandard no son thread-safe
+        self._lectores = {}
+        self.bajar_faltantes = bajar_faltantes
+
+        self.diccionarios = {}   # dict_id -> ZstdCompressionDict (todos, para leer)
+        self.vigentes = {}       # tipo -> ZstdCompressionDict con el que se escribe
+        self._cargar_diccionarios()
+
+        self.activo = primer_segmento
+        self._cargar_indice()
+
+    # ---------- archivos ----------
+
+    def segmentos(self):
+        nombres = glob.glob(os.path.join(self.directorio, "seg-*.pack"))
+        return sorted(int(os.path.basename(n)[4:10]) for n in nombres)
+
+    def ruta_segmento(self, numero):
+        return os.path.join(self.directorio, f"seg-{numero:06d}.pack")
+
+    def _lector(self, numero):
+        f = self._lectores.get(numero)
+        if f is None:
+            ruta = self.ruta_segmento(numero)
+            if not os.path.exists(ruta) and self.bajar_faltantes:
+                bajar_segmento(numero, self.directorio)
+            f = self._lectores[numero] = open(ruta, "rb")
+        return f
+
+    def rutas_diccionarios(self, tipo="*"):
+        return sorted(glob.glob(os.path.join(self.directorio, f"dic-{tipo}-*.zdict")))
+
+    def cerrar(self):
+        with self.lock:
+            for f in self._lectores.values():
+                f.close()
+            self._lectores.clear()
+
+    # ---------- índice ----------
+
+    def _cargar_indice(self):
+        path = os.path.join(self.directorio, INDICE)
+        locales = self.segmentos()
+        if not os.path.exists(path):
+            if locales:
+                self.activo = locales[-1]
+                self.reconstruir_indice()
+            return
+
+        tamanos = {n: os.path.getsize(self.ruta_segmento(n)) for n in locales}
+        for clave, (seg, offset, largo) in leer_indice(path):
+            # entradas que apuntan más allá del segmento son escrituras que no llegaron al disco
+            # (los segmentos que no se bajaron de Dropbox no se pueden validar: se confía en el índice)
+            if seg not in tamanos or offset + largo <= tamanos[seg]:
+                self.indice[clave] = (seg, offset, largo)
+
+        self.activo = max(locales + [s for s, _, _ in self.indice.values()], default=self.activo)
+
+        # registros escritos después de la última línea del índice (corte entre los dos appends)
+        self._recuperar_cola_activa(tamanos.get(self.activo, 0))
+
+    def _recuperar_cola_activa(self, tamano):
+        fin = max((o + l for s, o, l in self.indice.values() if s == self.activo), default=0)
+        if fin >= tamano or not os.path.exists(self.ruta_segmento(self.activo)):
+            return
+        for tipo, id_norma, offset, largo, _ in self._recorrer(self.activo, desde=fin):
+            self.indice[(tipo, id_norma)] = (self.activo, offset, largo)
+            self._anotar(tipo, id_norma, self.activo, offset, largo)
+
+    def reconstruir_indice(self):
+        """Rearma el índice recorriendo los segmentos (la última versión de cada id gana)."""
+        self.indice = {}
+        for seg in self.segmentos():
+            for tipo, id_norma, offset, largo, _ in self._recorrer(seg):
+                self.indice[(tipo, id_norma)] = (seg, offset, largo)
+        self._escribir_indice()
+
+    def _escribir_indice(self):
+        path = os.path.join(self.directorio, INDICE)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for (tipo, id_norma), (seg, offset, largo) in self.indice.items():
+                f.write(f"{tipo}\t{id_norma}\t{seg}\t{offset}\t{largo}\n")
+        os.replace(tmp, path)
+
+    def _anotar(self, tipo, id_norma, seg, offset, largo):
+        with open(os.path.join(self.directorio, INDICE), "a", encoding="utf-8") as f:
+            f.write(f"{tipo}\t{id_norma}\t{seg}\t{offset}\t{largo}\n")
+
+    # ---------- diccionarios ----------
+
+    def _cargar_diccionarios(self):
+        # el último número de cada tipo es el vigente; los anteriores quedan para leer registros viejos
+        for ruta in self.rutas_diccionarios():
+            with open(ruta, "rb") as f:
+                dic = zstandard.ZstdCompressionDict(f.read())
+            self.diccionarios[dic.dict_id()] = dic
+            self.vigentes[os.path.basename(ruta).split("-")[1]] = dic
+
+    def entrenar_diccionario(self, tipo, muestras=DICCIONARIO_MUESTRAS, semilla=0):
+        """Entrena un diccionario nuevo para `tipo` con una muestra de lo que hay en disco.
+
+        Devuelve el dict_id, o None si no hay muestras suficientes. Lo ya guardado sigue
+        comprimido con el diccionario anterior hasta la próxima compactación.
+        """
+        azar = random.Random(semilla)
+        muestra = []
+        for n, (_, _, datos) in enumerate(self.iterar(tipo)):
+            # muestreo de reservorio: no hace falta saber cuántas fichas hay
+            if len(muestra) < muestras:
+                muestra.append(datos)
+            elif azar.randrange(n + 1) < muestras:
+                muestra[azar.randrange(muestras)] = datos
+        if len(muestra) < DICCIONARIO_MIN_MUESTRAS:
+            return None
+
+        dic = zstandard.train_dictionary(DICCIONARIO_TAMANO, muestra, level=NIVEL_ZSTD)
+        rutas = self.rutas_diccionarios(tipo)
+        numero = int(os.path.basename(rutas[-1])[len(f"dic-{tipo}-"):-len(".zdict")]) + 1 if rutas else 1
+        ruta = os.path.join(self.directorio, f"dic-{tipo}-{numero:03d}.zdict")
+        with open(ruta + ".tmp", "wb") as f:
+            f.write(dic.as_bytes())
+        os.replace(ruta + ".tmp", ruta)
+
+        with self.lock:
+            self.diccionarios[dic.dict_id()] = dic
+            self.vigentes[tipo] = dic
+        return dic.dict_id()
+
+    def asegurar_diccionarios(self):
+        """Entrena el primer diccionario de cada tipo en cuanto hay muestras suficientes."""
+        for tipo in TIPOS_CON_DICCIONARIO:
+            if tipo not in self.vigentes:
+                dict_id = self.entrenar_diccionario(tipo)
+                if dict_id is not None:
+                    print(f"📚 Diccionario zstd para {tipo} entrenado (id {dict_id}).")
+
+    # ---------- escritura ----------
+
+    def _compresor(self, tipo):
+        # un compresor por hilo y por diccionario: los de zstandard no son thread-safe
+        dic = self.vigentes.get(tipo)
+        clave = (tipo, dic.dict_id() if dic is not None else 0)
+        compresores = self._zstd.__dict__.setdefault("compresores", {})
+        if clave not in compresores:
+            compresores[clave] = zstandard.ZstdCompressor(level=NIVEL_ZSTD, dict_data=dic)
+        return compresores[clave]
+
+    def _descompresor(self, dict_id):
+        descompresores = self._zstd.__dict__.setdefault("descompresores", {})
+        if dict_id not in descompresores:
+            if dict_id and dict_id not in self.diccionarios:
+                raise ValueError(f"Falta el diccionario zstd {dict_id} (¿se bajaron los .zdict?)")
+            descompresores[dict_id] = zstandard.ZstdDecompressor(dict_data=self.diccionarios.get(dict_id))
+        return descompresores[dict_id]
+
+    def _comprimir(self, tipo, datos):
+        return self._compresor(tipo).compress(datos)
+
+    def agregar(self, tipo, id_norma, datos):
+        """Agrega (o reemplaza) una ficha. `datos` en bytes; la versión anterior queda como basura."""
+        self._agregar_crudo(tipo, str(id_norma), self._comprimir(tipo, datos))
+
+    def _agregar_crudo(self, tipo, id_norma, comprimido):
+        id_bytes = id_norma.encode("utf-8")
+        registro = CABECERA.pack(MAGIA, TIPOS[tipo], len(id_bytes), len(comprimido), zlib.crc32(comprimido))
+        registro += id_bytes + comprimido
+
+        with self.lock:
+            ruta = self.ruta_segmento(self.activo)
+            if os.path.exists(ruta) and os.path.getsize(ruta) + len(registro) > SEGMENTO_MAX:
+                self.activo += 1
+                ruta = self.ruta_segmento(self.activo)
+            with open(ruta, "ab") as f:
+                offset = f.tell()
+                f.write(registro)
+            lector = self._lectores.pop(self.activo, None)
+            if lector:
+                lector.close()
+            self.indice[(tipo, id_norma)] = (self.activo, offset, len(registro))
+            self._anotar(tipo, id_norma, self.activo, offset, len(registro))
+
+    # ---------- lectura ----------
+
+    def __contains__(self, clave):
+        tipo, id_norma = clave
+        return (tipo, str(id_norma)) in self.indice
+
+    def ids(self, tipo):
+        return {i for t, i in self.indice if t == tipo}
+
+    def _descomprimir(self, comprimido):
+        dict_id = zstandard.get_frame_parameters(comprimido).dict_id
+        return self._descompresor(dict_id).decompress(comprimido)
+
+    def leer(self, tipo, id_norma):
+        """Bytes de la ficha o None si no está."""
+        ubicacion = self.indice.get((tipo, str(id_norma)))
+        if ubicacion is None:
+            return None
+        seg, offset, largo = ubicacion
+        with self.lock:
+            f = self._lector(seg)
+            f.seek(offset)
+            registro = f.read(largo)
+        _, _, largo_id, largo_datos, crc = CABECERA.unpack_from(registro)
+        comprimido = registro[CABECERA.size + largo_id:]
+        if zlib.crc32(comprimido) != crc:
+            raise ValueError(f"Registro corrupto: {tipo} {id_norma} en segmento {seg}")
+        return self._descomprimir(comprimido)
+
+    def crc(self, tipo, id_norma):
+        """crc32 de la versión vigente (comprimida) leyendo solo la cabecera, o None si no está.
+
+        Cambia si la ficha se vuelve a guardar con otro contenido (y, sin que cambie el contenido,
+        si compactar la recomprime con otro diccionario).
+        """
+        ubicacion = self.indice.get((tipo, str(id_norma)))
+        if ubicacion is None:
+            return None
+        seg, offset, _ = ubicacion
+        with self.lock:
+            f = self._lector(seg)
+            f.seek(offset)
+            cabecera = f.read(CABECERA.size)
+        return CABECERA.unpack(cabecera)[4]
+
+    def leer_json(self, id_norma):
+        datos = self.leer("json", id_norma)
+        return json.loads(datos.decode("utf-8")) if datos is not None else None
+
+    def _recorrer(self, seg, desde=0):
+        """Recorre un segmento: (tipo, id, offset, largo, comprimido). Corta en el primer registro roto."""
+        with open(self.ruta_segmento(seg), "rb") as f:
+            f.seek(desde)
+            offset = desde
+            while True:
+                cabecera = f.read(CABECERA.size)
+                if len(cabecera) < CABECERA.size:
+                    return
+                magia, tipo, largo_id, largo_datos, crc = CABECERA.unpack(cabecera)
+                if magia != MAGIA:
+                    return
+                id_bytes = f.read(largo_id)
+                comprimido = f.read(largo_datos)
+                if len(comprimido) < largo_datos or zlib.crc32(comprimido) != crc:
+                    return
+                largo = CABECERA.size + largo_id + largo_datos
+                yield TIPOS_INV[tipo], id_bytes.decode("utf-8"), offset, largo, comprimido
+                offset += largo
+
+    def iterar(self, tipo=None):
+        """Recorre el almacén en orden de disco devolviendo (tipo, id_norma, bytes) vigentes."""
+        for seg in self.segmentos():
+            for t, id_norma, offset, largo, comprimido in self._recorrer(seg):
+                if tipo is not None and t != tipo:
+                    continue
+                if self.indice.get((t, id_norma)) != (seg, offset, largo):
+                    continue  # versión reemplazada
+                yield t, id_norma, self._descomprimir(comprimido)
+
+    def iterar_json(self):
+        for _, _, datos in self.iterar("json"):
+            yield json.loads(datos.decode("utf-8"))
+
+    # ---------- mantenimiento ----------
+
+    def estadisticas(self):
+        total = sum(os.path.getsize(self.ruta_segmento(s)) for s in self.segmentos())
+        vivos = sum(l for _, _, l in self.indice.values())
+        return {
+            "segmentos": len(self.segmentos()),
+            "registros": len(self.indice),
+            "bytes_totales": total,
+            "bytes_vivos": vivos,
+            "diccionarios": {tipo: dic.dict_id() for tipo, dic in self.vigentes.items()},
+        }
+
+    def compactar(self):
+        """Reescribe solo las versiones vigentes en segmentos nuevos y reemplaza el almacén.
+
+        Los segmentos nuevos arrancan después del último número usado, así un nombre de
+        segmento nunca cambia de contenido (importa para la sincronización con Dropbox).
+        """
+        tmp = self.directorio.rstrip("/") + ".compactando"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for ruta in self.rutas_diccionarios():
+            shutil.copy2(ruta, tmp)
+        nuevo = AlmacenFichas(tmp, primer_segmento=max(self.segmentos(), default=0) + 1)
+        for seg in self.segmentos():
+            for tipo, id_norma, offset, largo, comprimido in self._recorrer(seg):
+                if self.indice.get((tipo, id_norma)) == (seg, offset, largo):
+                    nuevo._agregar_crudo(tipo, id_norma, self._recomprimir(tipo, comprimido))
+        nuevo._escribir_indice()
+        nuevo.cerrar()
+        self.cerrar()
+
+        viejo = self.directorio.rstrip("/") + ".viejo"
+        shutil.rmtree(viejo, ignore_errors=True)
+        os.replace(self.directorio, viejo)
+        os.replace(tmp, self.directorio)
+        shutil.rmtree(viejo, ignore_errors=True)
+        self.__init__(self.directorio)
+
+    def _recomprimir(self, tipo, comprimido):
+        """Pasa al diccionario vigente lo que quedó comprimido con otro (o sin diccionario)."""
+        dic = self.vigentes.get(tipo)
+        vigente = dic.dict_id() if dic is not None else 0
+        if zstandard.get_frame_parameters(comprimido).dict_id == vigente:
+            return comprimido
+        return self._comprimir(tipo, self._descomprimir(comprimido))
+
+# ============================================
+# DROPBOX
+# ============================================
+
+def dropbox_get_access_token():
+    data = {
+        "grant_type": "refresh_token",
+        "refresh_token": DROPBOX_REFRESH_TOKEN,
+        "client_id": DROPBOX_CLIENT_ID,
+        "client_secret": DROPBOX_CLIENT_SECRET,
+    }
+    r = requests.post("https://api.dropbox.com/oauth2/token", data=data)
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+def dropbox_list_folder_tamanos(token, path):
+    """{nombre: tamaño} de los archivos de una carpeta (vacío si no existe)."""
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    r = requests.post("https://api.dropboxapi.com/2/files/list_folder", headers=headers, json={"path": path})
+    if r.status_code != 200:
+        return {}
+    data = r.json()
+    entries = data.get("entries", [])
+    while data.get("has_more"):
+        r = requests.post("https://api.dropboxapi.com/2/files/list_folder/continue",
+                          headers=headers, json={"cursor": data["cursor"]})
+        r.raise_for_status()
+        data = r.json()
+        entries.extend(data.get("entries", []))
+    return {e["name"]: e["size"] for e in entries if e[".tag"] == "file"}
+
+
+def dropbox_download_a_archivo(token, remoto, local):
+    headers = {"Authorization": f"Bearer {token}", "Dropbox-API-Arg": json.dumps({"path": remoto})}
+    with requests.post("https://content.dropboxapi.com/2/files/download", headers=headers, stream=True) as r:
+        r.raise_for_status()
+        with open(local, "wb") as f:
+            for bloque in r.iter_content(2**20):
+                f.write(bloque)
+
+
+def dropbox_upload_archivo(token, local, remoto):
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/octet-stream",
+        "Dropbox-API-Arg": json.dumps({"path": remoto, "mode": "overwrite", "autorename": False})
+    }
+    with open(local, "rb") as f:
+        r = requests.post("https://content.dropboxapi.com/2/files/upload", headers=headers, data=f)
+    if r.status_code not in (200, 409):
+        raise Exception(f"Error subiendo a Dropbox: {r.text}")
+
+
+def dropbox_delete(token, path):
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    requests.post("https://api.dropboxapi.com/2/files/delete_v2", headers=headers, json={"path": path})
+
+
+def bajar_segmento(numero, directorio=ALMACEN_DIR):
+    token = dropbox_get_access_token()
+    nombre = f"seg-{numero:06d}.pack"
+    print(f"⬇️ {DROPBOX_ALMACEN_FOLDER}/{nombre}")
+    dropbox_download_a_archivo(token, f"{DROPBOX_ALMACEN_FOLDER}/{nombre}", os.path.join(directorio, nombre))
+
+
+def bajar_almacen(directorio=ALMACEN_DIR, completo=True):
+    """Trae de Dropbox los archivos del almacén que faltan o cambiaron de tamaño. False si no hay almacén remoto.
+
+    Con completo=False solo baja el índice y el último segmento (lo necesario para agregar fichas);
+    el resto se puede traer a demanda con AlmacenFichas(bajar_faltantes=True).
+    """
+    token = dropbox_get_access_token()
+    remotos = dropbox_list_folder_tamanos(token, DROPBOX_ALMACEN_FOLDER)
+    if INDICE not in remotos:
+        return False
+    os.makedirs(directorio, exist_ok=True)
+    if not completo:
+        segmentos = sorted(n for n in remotos if n.endswith(".pack"))
+        remotos = {
+            n: t for n, t in remotos.items()
+            if n == INDICE or n.endswith(".zdict") or n in segmentos[-1:]
+        }
+    for nombre, tamano in remotos.items():
+        local = os.path.join(directorio, nombre)
+        if os.path.exists(local) and os.path.getsize(local) == tamano:
+            continue
+        print(f"⬇️ {DROPBOX_ALMACEN_FOLDER}/{nombre} ({tamano / 2**20:.1f} MB)")
+        dropbox_download_a_archivo(token, f"{DROPBOX_ALMACEN_FOLDER}/{nombre}", local)
+    return True
+
+
+def ids_en_dropbox():
+    """{tipo: set(id_norma)} según el índice remoto, sin bajar los segmentos."""
+    token = dropbox_get_access_token()
+    if INDICE not in dropbox_list_folder_tamanos(token, DROPBOX_ALMACEN_FOLDER):
+        return {}
+    tmp = ALMACEN_DIR + ".indice_remoto.tsv"
+    dropbox_download_a_archivo(token, f"{DROPBOX_ALMACEN_FOLDER}/{INDICE}", tmp)
+    ids = {}
+    for (tipo, id_norma), _ in leer_indice(tmp):
+        ids.setdefault(tipo, set()).add(id_norma)
+    os.remove(tmp)
+    return ids
+
+
+def subir_almacen(directorio=ALMACEN_DIR):
+    """Sube lo que cambió (diccionarios, segmento activo, segmentos nuevos e índice) y borra lo que ya no existe."""
+    token = dropbox_get_access_token()
+    remotos = dropbox_list_folder_tamanos(token, DROPBOX_ALMACEN_FOLDER)
+    locales = {
+        os.path.basename(p): os.path.getsize(p)
+        for p in glob.glob(os.path.join(directorio, "*"))
+        if p.endswith((".pack", ".zdict")) or os.path.basename(p) == INDICE
+    }
+    # diccionarios, después segmentos, índice al final: un lector nunca ve un índice que
+    # apunte a datos no subidos ni un segmento sin su diccionario
+    for nombre in sorted(locales, key=lambda n: (n == INDICE, not n.endswith(".zdict"))):
+        if remotos.get(nombre) == locales[nombre]:
+            continue
+        print(f"⬆️ {DROPBOX_ALMACEN_FOLDER}/{nombre} ({locales[nombre] / 2**20:.1f} MB)")
+        dropbox_upload_archivo(token, os.path.join(directorio, nombre), f"{DROPBOX_ALMACEN_FOLDER}/{nombre}")
+    # solo se borra lo que el índice ya no usa (p. ej. tras compactar): con una bajada parcial
+    # los segmentos sellados siguen en el índice aunque no estén en disco
+    path_indice = os.path.join(directorio, INDICE)
+    usados = {f"seg-{seg:06d}.pack" for _, (seg, _, _) in leer_indice(path_indice)} if os.path.exists(path_indice) else set()
+    for nombre in set(remotos) - set(locales) - usados:
+        dropbox_delete(token, f"{DROPBOX_ALMACEN_FOLDER}/{nombre}")
+
+# ============================================
+# MIGRACIÓN DESDE UN ARCHIVO POR NORMA
+# ============================================
+
+def migrar(almacen):
+    """Copia al almacén las fichas de /fichas_json y /fichas_html que todavía no están."""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from sync_fichas_dropbox import dropbox_list_folder
+    from scraper_fichas_infoleg import dropbox_download, DROPBOX_FOLDER_HTML, DROPBOX_FOLDER_JSON
+
+    for tipo, carpeta, extension in (("json", DROPBOX_FOLDER_JSON, ".json"), ("html", DROPBOX_FOLDER_HTML, ".html")):
+        ya = almacen.ids(tipo)
+        nombres = [n for n in dropbox_list_folder(carpeta) if n[:-len(extension)] not in ya]
+        print(f"📌 {carpeta}: {len(nombres):,} archivos para migrar")
+        for i, nombre in enumerate(nombres, 1):
+            contenido = dropbox_download(f"{carpeta}/{nombre}")
+            if contenido:
+                almacen.agregar(tipo, nombre[:-len(extension)], contenido)
+            if i == DICCIONARIO_MUESTRAS and tipo not in almacen.vigentes:
+                # con la primera muestra ya se entrena: el resto de la migración sale comprimido con diccionario
+                almacen.entrenar_diccionario(tipo)
+            if i % 1000 == 0:
+                print(f"   {i:,}/{len(nombres):,}")
+
+# ============================================
+# PRINCIPAL
+# ============================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("comando", choices=["migrar", "compactar", "entrenar", "estado"])
+    parser.add_argument("--local", action="store_true", help="no sincronizar con Dropbox")
+    args = parser.parse_args()
+
+    if not args.local:
+        bajar_almacen()
+    almacen = AlmacenFichas()
+
+    if args.comando == "migrar":
+        try:
+            migrar(almacen)
+            almacen.asegurar_diccionarios()
+        finally:
+            if not args.local:
+                subir_almacen()
+    elif args.comando in ("compactar", "entrenar"):
+        antes = almacen.estadisticas()
+        if args.comando == "entrenar":
+            for tipo in TIPOS_CON_DICCIONARIO:
+                print(f"📚 {tipo}: diccionario {almacen.entrenar_diccionario(tipo)}")
+        almacen.compactar()
+        despues = almacen.estadisticas()
+        print(f"✔ Compactado: {antes['bytes_totales'] / 2**20:.1f} MB → {despues['bytes_totales'] / 2**20:.1f} MB")
+        if not args.local:
+            subir_almacen()
+
+    print(json.dumps(almacen.estadisticas(), indent=2))
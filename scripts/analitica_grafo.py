@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+"""Analítica precalculada de la telaraña: PageRank, componentes débilmente conexas y grados por tipo.
+
+Los resultados se agregan como columnas de digesto_normas (ver NORMAS en esquema_digesto):
+
+    pagerank              centralidad (la autoridad fluye de la norma que modifica/cita a la modificada/citada)
+    componente            id_norma más chico de su componente débilmente conexa
+    tamano_componente     cantidad de normas de esa componente
+    grado_entrada         normas distintas que la modifican, citan, reglamentan, ...
+    grado_salida          normas distintas a las que ella apunta
+    veces_<tipo>          normas distintas que la apuntan con ese tipo de relación
+
+Entre corridas se guarda un estado chico (nodos, aristas, pagerank, componentes): si el grafo no
+cambió se reusa tal cual, y si cambiaron pocas aristas PageRank arranca del vector anterior y las
+componentes solo se unen a través de las aristas nuevas.
+
+Uso:
+    python scripts/analitica_grafo.py --ranking veces_modificada --top 20
+"""
+
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from esquema_digesto import leer_normas, leer_relaciones, escribir_normas
+from exportar_grafo import GRAFO_DIR
+
+# ============================================
+# CONFIG
+# ============================================
+
+ESTADO_PATH = os.path.join(GRAFO_DIR, "analitica_estado.npz")
+
+AMORTIGUACION = 0.85
+TOLERANCIA = 1e-9             # suma de |x_nuevo - x| para dar PageRank por convergido
+MAX_ITERACIONES = 200
+
+# "es_X_por" es el mismo vínculo que "X" mirado desde la otra punta
+INVERSAS = {
+    "es_modificada_por": "modifica",
+    "es_complementada_por": "complementa",
+    "es_reglamentada_por": "reglamenta",
+    "es_citada_por": "cita",
+}
+
+COLUMNAS_POR_TIPO = {
+    "modifica": "veces_modificada",
+    "complementa": "veces_complementada",
+    "reglamenta": "veces_reglamentada",
+    "cita": "veces_citada",
+    "menciona": "veces_mencionada",
+}
+
+COLUMNAS = [
+    "pagerank", "componente", "tamano_componente", "grado_entrada", "grado_salida",
+    *COLUMNAS_POR_TIPO.values(),
+]
+
+# ============================================
+# ARISTAS
+# ============================================
+
+def unicos(valores):
+    """np.unique para enteros, ordenando y comparando vecinos (el np.unique con hash es varias veces más lento acá)."""
+    valores = np.sort(valores)
+    return valores[np.concatenate(([True], valores[1:] != valores[:-1]))] if len(valores) else valores
+
+
+def posiciones(nodos, valores):
+    """Posición de cada valor en `nodos` (-1 si no está), con una tabla hash en vez de búsqueda binaria."""
+    return pd.Index(nodos).get_indexer(valores)
+
+def aristas_canonicas(df_rel, nodos=None):
+    """Aristas (origen, destino, tipo) en sentido activo, sin NA ni lazos.
+
+    origen/destino son posiciones en `nodos` (ids ordenados; si no se pasan, los de las aristas)
+    y tipo es la posición en COLUMNAS_POR_TIPO (-1 para tipos sin columna propia). Las aristas
+    con alguna punta fuera de `nodos` se descartan.
+    """
+    df_rel = df_rel.dropna(subset=["id_origen", "id_destino"])
+    origen = df_rel["id_origen"].to_numpy("int64")
+    destino = df_rel["id_destino"].to_numpy("int64")
+
+    # todo se decide por categoría y se lleva a las filas con los códigos
+    categorias = list(df_rel["tipo_relacion"].cat.categories)
+    invertida = np.array([c in INVERSAS for c in categorias] + [False])
+    tipos = list(COLUMNAS_POR_TIPO)
+    canonica = np.array([tipos.index(INVERSAS.get(c, c)) if INVERSAS.get(c, c) in tipos else -1
+                         for c in categorias] + [-1])
+    codigos = df_rel["tipo_relacion"].cat.codes.to_numpy()     # -1 (NA) cae en el último lugar
+    dar_vuelta = invertida[codigos]
+    origen, destino = np.where(dar_vuelta, destino, origen), np.where(dar_vuelta, origen, destino)
+    tipo = canonica[codigos]
+
+    if nodos is None:
+        nodos = unicos(np.concatenate([origen, destino]))
+    pos_origen = posiciones(nodos, origen)
+    pos_destino = posiciones(nodos, destino)
+    validas = (pos_origen >= 0) & (pos_destino >= 0) & (origen != destino)
+    return nodos, pos_origen[validas], pos_destino[validas], tipo[validas]
+
+
+def pares_unicos(origen, destino, n, tipo=None):
+    """Dedupe de (origen, destino[, tipo]) con una clave int64 por arista; devuelve las claves ordenadas."""
+    clave = origen * n + destino
+    if tipo is not None:
+        clave = clave * (len(COLUMNAS_POR_TIPO) + 1) + (tipo + 1)
+    return unicos(clave)
+
+# ============================================
+# ALGORITMOS
+# ============================================
+
+def pagerank(origen, destino, n, inicial=None, amortiguacion=AMORTIGUACION,
+             tolerancia=TOLERANCIA, max_iteraciones=MAX_ITERACIONES):
+    """PageRank por iteración de potencias; devuelve (vector que suma 1, iteraciones).
+
+    Cada iteración es un producto matriz rala por vector hecho con bincount sobre las aristas.
+    La masa de los nodos sin salida se reparte uniforme, junto con el teletransporte.
+    """
+    if n == 0:
+        return np.zeros(0), 0
+    salida = np.bincount(origen, minlength=n)
+    colgante = salida == 0
+    inversa = np.divide(1.0, salida, out=np.zeros(n), where=~colgante)
+
+    x = np.full(n, 1.0 / n) if inicial is None else inicial / inicial.sum()
+    for iteracion in range(1, max_iteraciones + 1):
+        nuevo = amortiguacion * np.bincount(destino, weights=(x * inversa)[origen], minlength=n)
+        nuevo += (1.0 - amortiguacion * (1.0 - x[colgante].sum())) / n
+        error = np.abs(nuevo - x).sum()
+        x = nuevo
+        if error < tolerancia:
+            break
+    return x, iteracion
+
+
+def componentes(origen, destino, n, etiqueta=None):
+    """Componentes débilmente conexas: a cada nodo le queda la posición más chica de su componente.
+
+    Propagación del mínimo por las aristas (en los dos sentidos) con saltos de puntero, así
+    converge en pocas vueltas aunque las cadenas sean largas. Con `etiqueta` se arranca de
+    componentes ya conocidas y solo hace falta pasar las aristas nuevas.
+    """
+    etiqueta = np.arange(n) if etiqueta is None else etiqueta.copy()
+    while True:
+        anterior = etiqueta.copy()
+        np.minimum.at(etiqueta, origen, anterior[destino])
+        np.minimum.at(etiqueta, destino, anterior[origen])
+        # la etiqueta de la etiqueta también baja (solo usa nodos de la misma componente)
+        np.minimum.at(etiqueta, anterior, etiqueta.copy())
+        while True:
+            salto = etiqueta[etiqueta]
+            if np.array_equal(salto, etiqueta):
+                break
+            etiqueta = salto
+        if np.array_equal(etiqueta, anterior):
+            return etiqueta
+
+# ============================================
+# ESTADO ENTRE CORRIDAS
+# ============================================
+
+def cargar_estado(path=ESTADO_PATH):
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as f:
+        return {k: f[k] for k in f.files}
+
+
+def guardar_estado(estado, path=ESTADO_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(path, **estado)
+    return path
+
+
+def _claves_por_id(nodos, claves):
+    # las claves de pares usan posiciones; para comparar corridas se pasan a ids (siguen ordenadas
+    # porque los nodos están ordenados)
+    n = len(nodos)
+    return nodos[claves // n] * 2**31 + nodos[claves % n] if n else claves
+
+
+def arranque(previo, nodos, claves_id):
+    """Lo que se puede reusar de la corrida anterior: (pagerank inicial, etiquetas, aristas nuevas o None).
+
+    Aristas nuevas None significa que alguna arista desapareció y las componentes se recalculan.
+    """
+    if previo is None or not len(previo["nodos"]):
+        return None, None, None
+    pos = posiciones(previo["nodos"], nodos)
+    existia = pos >= 0
+
+    # los nodos nuevos arrancan con el valor de teletransporte
+    inicial = np.where(existia, previo["pagerank"][pos], (1.0 - AMORTIGUACION) / len(nodos))
+
+    if np.isin(previo["claves"], claves_id, assume_unique=True).all():
+        nuevas = np.setdiff1d(claves_id, previo["claves"], assume_unique=True)
+        # la componente previa se identifica por su id más chico, que sigue siendo un nodo
+        etiqueta = np.where(existia, posiciones(nodos, previo["componente"][pos]), np.arange(len(nodos)))
+        return inicial, etiqueta, nuevas
+    return inicial, None, None
+
+
+def analizar(df_rel, ids=None, previo=None):
+    """Calcula las columnas de COLUMNAS para cada nodo; devuelve (DataFrame por id_norma, estado).
+
+    `ids` son las normas del digesto: los nodos son todas ellas (aisladas incluidas) y se descartan
+    las aristas que apuntan a ids que no existen. `previo` es el estado de la corrida anterior.
+    """
+    nodos = None if ids is None else unicos(pd.Series(ids).dropna().to_numpy("int64"))
+    nodos, origen, destino, tipo = aristas_canonicas(df_rel, nodos)
+    n = len(nodos)
+
+    claves = pares_unicos(origen, destino, n)
+    o, d = claves // n, claves % n
+    claves_id = _claves_por_id(nodos, claves)
+
+    inicial, etiqueta, nuevas = arranque(previo, nodos, claves_id)
+    if nuevas is not None and not len(nuevas) and np.array_equal(previo["nodos"], nodos):
+        print("✔ La telaraña no cambió: se reusan PageRank y componentes.")
+        rango = inicial
+    else:
+        rango, iteraciones = pagerank(o, d, n, inicial=inicial)
+        print(f"✔ PageRank: {iteraciones} iteraciones ({'arranque en caliente' if inicial is not None else 'desde cero'})")
+        if nuevas is not None:
+            etiqueta = componentes(posiciones(nodos, nuevas // 2**31), posiciones(nodos, nuevas % 2**31), n, etiqueta)
+            print(f"✔ Componentes: {len(nuevas):,} aristas nuevas unidas a las anteriores")
+        else:
+            etiqueta = componentes(o, d, n)
+
+    tipadas = pares_unicos(origen, destino, n, tipo)
+    tipo_unico = tipadas % (len(COLUMNAS_POR_TIPO) + 1) - 1
+    destino_tipado = (tipadas // (len(COLUMNAS_POR_TIPO) + 1)) % n
+
+    df = pd.DataFrame({
+        "id_norma": pd.array(nodos, dtype="Int32"),
+        "pagerank": rango,
+        "componente": pd.array(nodos[etiqueta], dtype="Int32"),
+        "tamano_componente": pd.array(np.bincount(etiqueta, minlength=n)[etiqueta], dtype="Int32"),
+        "grado_entrada": pd.array(np.bincount(d, minlength=n), dtype="Int32"),
+        "grado_salida": pd.array(np.bincount(o, minlength=n), dtype="Int32"),
+    })
+    for i, columna in enumerate(COLUMNAS_POR_TIPO.values()):
+        df[columna] = pd.array(np.bincount(destino_tipado[tipo_unico == i], minlength=n), dtype="Int32")
+
+    estado = {"nodos": nodos, "claves": claves_id, "pagerank": rango, "componente": nodos[etiqueta]}
+    return df, estado
+
+
+def unir_a_normas(df_normas, df_grafo):
+    """Reemplaza las columnas de analítica de digesto_normas por las recién calculadas."""
+    df_normas = df_normas.drop(columns=[c for c in COLUMNAS if c in df_normas.columns])
+    return df_normas.merge(df_grafo, on="id_norma", how="left")
+
+
+def ranking(df, columna, top=20):
+    columnas = [c for c in ("id_norma", "tipo_norma", "numero_norma", "titulo_resumido") if c in df.columns]
+    return df.nlargest(top, columna)[columnas + [columna]]
+
+
+def actualizar_normas(df_rel, normas_path, estado_path=ESTADO_PATH):
+    """Calcula la analítica (arrancando del estado previo si existe) y la escribe en digesto_normas."""
+    df_normas = leer_normas(normas_path)
+    df_grafo, estado = analizar(df_rel, df_normas["id_norma"], cargar_estado(estado_path))
+    df_normas = unir_a_normas(df_normas, df_grafo)
+    escribir_normas(df_normas, normas_path)
+    guardar_estado(estado, estado_path)
+    return df_normas
+
+# ============================================
+# PRINCIPAL
+# ============================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--relaciones", default="data_procesada/digesto_relaciones_expandido.csv")
+    parser.add_argument("--normas", default="data_procesada/digesto_normas.csv")
+    parser.add_argument("--estado", default=ESTADO_PATH)
+    parser.add_argument("--ranking", choices=COLUMNAS, help="imprimir las normas con más valor en esta columna")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    df = actualizar_normas(leer_relaciones(args.relaciones), args.normas, args.estado)
+    if args.ranking:
+        print(ranking(df, args.ranking, args.top).to_string(index=False))
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+
+"""Cambios del dump de Infoleg respecto de la corrida anterior, en una sola pasada.
+
+descargar_infoleg.py pisa los CSV de cada noche. Acá cada archivo se resume en una "huella" por
+fila, ordenada por clave y guardada como .npy:
+
+    normas              id_norma + un hash por grupo de columnas (GRUPOS)
+    modifica            (id_norma_modificatoria << 32) | id_norma_modificada     (solo la clave)
+    es_modificada_por   (id_norma_modificada << 32) | id_norma_modificatoria     (solo la clave)
+
+La huella nueva se compara con la de la corrida anterior con un merge por bloques sobre los dos
+archivos ordenados (mapeados con mmap: nunca están los dos enteros en memoria), y el resultado
+queda en cambios.npz:
+
+    normas_agregadas, normas_eliminadas, normas_modificadas   ids (int32)
+    motivos                                                   por cada modificada, bits de GRUPOS
+    <relación>_agregadas, <relación>_eliminadas               pares (origen, destino) (int32)
+    meta                                                      JSON con fechas y conteos
+
+Lo consumen las etapas siguientes en vez de recorrer todo el corpus: la cola de fichas vuelve a
+pendiente las normas modificadas y textos_normas baja primero los textos de las normas cuyo
+texto o vínculos cambiaron.
+
+Uso:
+    python scripts/cambios_infoleg.py                 # después de descargar_infoleg.py
+    python scripts/cambios_infoleg.py --mostrar 20    # resumen del último changeset
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import datetime, timezone
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import metricas
+from esquema_digesto import a_id
+
+# ============================================
+# CONFIG
+# ============================================
+
+DROPBOX_CLIENT_ID = os.environ.get("APP_KEY")
+DROPBOX_CLIENT_SECRET = os.environ.get("APP_SECRET")
+DROPBOX_REFRESH_TOKEN = os.environ.get("REFRESH_TOKEN")
+
+DATA_DIR = os.environ.get("DIGESTO_DATA_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "data"
+)
+CAMBIOS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "data_procesada",
+    "cambios"
+)
+CAMBIOS_PATH = os.path.join(CAMBIOS_DIR, "cambios.npz")
+DROPBOX_CAMBIOS_FOLDER = "/data_procesada/cambios"
+
+# tabla: (archivo de Infoleg, columnas de la clave)
+TABLAS = {
+    "normas": ("infoleg_normativa.csv", ["id_norma"]),
+    "modifica": ("infoleg_modificatorias.csv", ["id_norma_modificatoria", "id_norma_modificada"]),
+    "es_modificada_por": ("infoleg_modificadas.csv", ["id_norma_modificada", "id_norma_modificatoria"]),
+}
+RELACIONES = [t for t in TABLAS if t != "normas"]
+
+# una huella por grupo: así se sabe *qué* cambió (las columnas que no figuran cuentan como "datos")
+GRUPOS = {
+    "datos": ["tipo_norma", "numero_norma", "clase_norma", "organismo_origen", "fecha_sancion",
+              "numero_boletin", "fecha_boletin", "pagina_boletin"],
+    "titulos": ["titulo_resumido", "titulo_sumario", "texto_resumido", "observaciones"],
+    "textos": ["texto_original", "texto_actualizado"],
+    "vinculos": ["modificada_por", "modifica_a"],
+}
+BITS = {grupo: 1 << i for i, grupo in enumerate(GRUPOS)}
+
+FILAS_POR_LECTURA = 100000
+FILAS_POR_BLOQUE = 1 << 16      # filas de cada lado por paso del merge
+
+# ============================================
+# DROPBOX
+# ============================================
+
+def dropbox_get_access_token():
+    data = {
+        "grant_type": "refresh_token",
+        "refresh_token": DROPBOX_REFRESH_TOKEN,
+        "client_id": DROPBOX_CLIENT_ID,
+        "client_secret": DROPBOX_CLIENT_SECRET,
+    }
+    r = requests.post("https://api.dropbox.com/oauth2/token", data=data)
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+def dropbox_download_a_archivo(token, remoto, local):
+    """Baja `remoto` a `local`; False si no existe."""
+    headers = {"Authorization": f"Bearer {token}", "Dropbox-API-Arg": json.dumps({"path": remoto})}
+    with requests.post("https://content.dropboxapi.com/2/files/download", headers=headers, stream=True) as r:
+        if r.status_code == 409:
+            return False
+        r.raise_for_status()
+        with open(local, "wb") as f:
+            for bloque in r.iter_content(2**20):
+                f.write(bloque)
+    return True
+
+
+def dropbox_upload_archivo(token, local, remoto):
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/octet-stream",
+        "Dropbox-API-Arg": json.dumps({"path": remoto, "mode": "overwrite", "autorename": False}),
+    }
+    with open(local, "rb") as f:
+        r = requests.post("https://content.dropboxapi.com/2/files/upload", headers=headers, data=f)
+    r.raise_for_status()
+
+
+def ruta_huella(tabla, directorio=CAMBIOS_DIR):
+    return os.path.join(directorio, f"huella_{tabla}.npy")
+
+
+def bajar_huellas(directorio=CAMBIOS_DIR):
+    """Trae de Dropbox las huellas de la corrida anterior que no estén en disco."""
+    os.makedirs(directorio, exist_ok=True)
+    token = None
+    for tabla in TABLAS:
+        local = ruta_huella(tabla, directorio)
+        if os.path.exists(local):
+            continue
+        token = token or dropbox_get_access_token()
+        if dropbox_download_a_archivo(token, f"{DROPBOX_CAMBIOS_FOLDER}/{os.path.basename(local)}", local + ".tmp"):
+            os.replace(local + ".tmp", local)
+
+
+def subir_huellas(directorio=CAMBIOS_DIR):
+    token = dropbox_get_access_token()
+    for local in [ruta_huella(t, directorio) for t in TABLAS] + [os.path.join(directorio, "cambios.npz")]:
+        if os.path.exists(local):
+            dropbox_upload_archivo(token, local, f"{DROPBOX_CAMBIOS_FOLDER}/{os.path.basename(local)}")
+
+# ============================================
+# HUELLAS
+# ============================================
+
+def _tipo(tabla):
+    campos = [("id", "<i8")]
+    if tabla == "normas":
+        campos += [(grupo, "<u8") for grupo in GRUPOS]
+    return np.dtype(campos)
+
+
+def _bloques_csv(path, filas=FILAS_POR_LECTURA):
+    import pandas as pd
+    # todo como texto y sin NaN: la huella depende solo de lo que dice el archivo
+    return pd.read_csv(path, dtype=str, keep_default_na=False, encoding="utf-8-sig", chunksize=filas)
+
+
+def _huella_bloque(tabla, df, claves):
+    import pandas as pd
+    ids = [a_id(df[c]) for c in claves]
+    valido = np.logical_and.reduce([i.notna().to_numpy() for i in ids])
+    if tabla == "normas":
+        clave = ids[0].to_numpy("int64", na_value=0)
+    else:
+        clave = (ids[0].to_numpy("int64", na_value=0) << 32) | ids[1].to_numpy("int64", na_value=0)
+    huella = np.zeros(len(df), dtype=_tipo(tabla))
+    huella["id"] = clave
+    if tabla == "normas":
+        agrupadas = {c for cols in GRUPOS.values() for c in cols}
+        for grupo, columnas in GRUPOS.items():
+            columnas = [c for c in columnas if c in df.columns]
+            if grupo == "datos":
+                columnas += [c for c in df.columns if c not in agrupadas and c not in claves]
+            if columnas:
+                huella[grupo] = pd.util.hash_pandas_object(df[columnas], index=False).to_numpy()
+    return huella[valido], int((~valido).sum())
+
+
+def calcular_huella(tabla, path, destino, filas=FILAS_POR_LECTURA):
+    """Lee el CSV de a bloques y escribe en `destino` su huella ordenada por clave, una fila por clave.
+
+    Si una clave se repite en el archivo sus hashes se suman: un cambio en cualquiera de las
+    filas cambia la huella.
+    """
+    _, claves = TABLAS[tabla]
+    partes, invalidas = [], 0
+    for df in _bloques_csv(path, filas):
+        huella, n = _huella_bloque(tabla, df, claves)
+        partes.append(huella)
+        invalidas += n
+    huella = np.concatenate(partes) if partes else np.zeros(0, dtype=_tipo(tabla))
+    huella = huella[np.argsort(huella["id"], kind="stable")]
+
+    ids, inicio = np.unique(huella["id"], return_index=True)
+    unicas = np.zeros(len(ids), dtype=huella.dtype)
+    unicas["id"] = ids
+    for campo in huella.dtype.names[1:]:
+        unicas[campo] = np.add.reduceat(huella[campo], inicio) if len(huella) else huella[campo]
+    if invalidas:
+        print(f"⚠️ {tabla}: {invalidas:,} filas sin clave válida quedan fuera de la huella")
+    np.save(destino, unicas)
+    return len(unicas)
+
+# ============================================
+# MERGE
+# ============================================
+
+def comparar(previa, nueva, bloque=FILAS_POR_BLOQUE):
+    """Merge de dos huellas ordenadas por id, de a `bloque` filas de cada lado.
+
+    Devuelve (agregados, eliminados, modificados, motivos): ids que solo están en `nueva`, ids
+    que solo están en `previa`, ids con alguna huella distinta y sus bits de GRUPOS.
+    """
+    campos = nueva.dtype.names[1:]
+    agregados, eliminados, modificados, motivos = [], [], [], []
+    i = j = 0
+    while i < len(previa) or j < len(nueva):
+        a, b = previa[i:i + bloque], nueva[j:j + bloque]
+        # se puede decidir hasta el último id del bloque que no llega al final de su archivo:
+        # cualquier id mayor puede estar todavía en el bloque siguiente del otro lado
+        limites = [x["id"][-1] for x, k, n in ((a, i, len(previa)), (b, j, len(nueva))) if k + bloque < n]
+        if limites:
+            limite = min(limites)
+            a = a[:np.searchsorted(a["id"], limite, side="right")]
+            b = b[:np.searchsorted(b["id"], limite, side="right")]
+        a, b = np.asarray(a), np.asarray(b)
+
+        en_b = np.isin(a["id"], b["id"], assume_unique=True)
+        en_a = np.isin(b["id"], a["id"], assume_unique=True)
+        eliminados.append(a["id"][~en_b])
+        agregados.append(b["id"][~en_a])
+
+        # las dos mitades comunes quedan alineadas: mismos ids, mismo orden
+        comun_a, comun_b = a[en_b], b[en_a]
+        motivo = np.zeros(len(comun_a), dtype=np.uint8)
+        for bit, campo in enumerate(campos):
+            motivo |= (comun_a[campo] != comun_b[campo]).astype(np.uint8) << bit
+        modificados.append(comun_b["id"][motivo > 0])
+        motivos.append(motivo[motivo > 0])
+
+        i += len(a)
+        j += len(b)
+
+    unir = lambda partes, tipo: np.concatenate(partes).astype(tipo) if partes else np.zeros(0, dtype=tipo)
+    return unir(agregados, np.int64), unir(eliminados, np.int64), unir(modificados, np.int64), unir(motivos, np.uint8)
+
+
+def _pares(claves):
+    return np.stack([claves >> 32, claves & 0xFFFFFFFF], axis=1).astype(np.int32)
+
+# ============================================
+# CHANGESET
+# ============================================
+
+def calcular(data_dir=DATA_DIR, directorio=CAMBIOS_DIR, bloque=FILAS_POR_BLOQUE):
+    """Huellas nuevas del dump, comparación con las anteriores y cambios.npz. Devuelve el meta."""
+    os.makedirs(directorio, exist_ok=True)
+    cambios, meta = {}, {"fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"), "tablas": {}}
+    nuevas = {}
+    for tabla, (archivo, _) in TABLAS.items():
+        with metricas.etapa(f"huella_{tabla}"):
+            nuevas[tabla] = ruta_huella(tabla, directorio)[:-len(".npy")] + ".nueva.npy"
+            filas = calcular_huella(tabla, os.path.join(data_dir, archivo), nuevas[tabla])
+            metricas.sumar_filas(filas)
+
+        previa_path = ruta_huella(tabla, directorio)
+        nueva = np.load(nuevas[tabla], mmap_mode="r")
+        if os.path.exists(previa_path):
+            previa = np.load(previa_path, mmap_mode="r")
+        else:
+            previa = np.zeros(0, dtype=nueva.dtype)
+            meta["primera_corrida"] = True
+        with metricas.etapa(f"merge_{tabla}"):
+            agregados, eliminados, modificados, motivos = comparar(previa, nueva, bloque)
+            metricas.sumar_filas(len(previa) + len(nueva))
+        del previa, nueva
+
+        if tabla == "normas":
+            cambios.update(normas_agregadas=agregados.astype(np.int32), normas_eliminadas=eliminados.astype(np.int32),
+                           normas_modificadas=modificados.astype(np.int32), motivos=motivos)
+            meta["tablas"][tabla] = {"filas": filas, "agregadas": len(agregados), "eliminadas": len(eliminados),
+                                     "modificadas": len(modificados)}
+            meta["motivos"] = {grupo: int(((motivos & bit) > 0).sum()) for grupo, bit in BITS.items()}
+        else:
+            cambios.update({f"{tabla}_agregadas": _pares(agregados), f"{tabla}_eliminadas": _pares(eliminados)})
+            meta["tablas"][tabla] = {"filas": filas, "agregadas": len(agregados), "eliminadas": len(eliminados)}
+
+    tmp = os.path.join(directorio, "cambios.tmp.npz")
+    np.savez_compressed(tmp, meta=np.array(json.dumps(meta)), **cambios)
+    os.replace(tmp, os.path.join(directorio, "cambios.npz"))
+    # recién con el changeset escrito la huella nueva pasa a ser la de referencia
+    for tabla, path in nuevas.items():
+        os.replace(path, ruta_huella(tabla, directorio))
+    return meta
+
+
+def cargar(path=CAMBIOS_PATH):
+    """El último changeset: dict de arrays más "meta" (dict), o None si no hay."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as f:
+        cambios = {k: f[k] for k in f.files}
+    cambios["meta"] = json.loads(str(cambios["meta"]))
+    return cambios
+
+
+def normas_con_cambios(cambios, grupos=tuple(GRUPOS)):
+    """ids de las normas modificadas en alguno de `grupos` (vacío si no hay changeset)."""
+    if cambios is None:
+        return np.zeros(0, dtype=np.int32)
+    mascara = sum(BITS[g] for g in grupos)
+    return cambios["normas_modificadas"][(cambios["motivos"] & mascara) > 0]
+
+
+def resumen(cambios, ejemplos=0):
+    meta = cambios["meta"]
+    lineas = [f"📋 Cambios del {meta['fecha']}" + (" (primera corrida: todo es nuevo)" if meta.get("primera_corrida") else "")]
+    for tabla, conteo in meta["tablas"].items():
+        detalle = ", ".join(f"{v:,} {k}" for k, v in conteo.items())
+        lineas.append(f"   {tabla}: {detalle}")
+    if meta.get("motivos"):
+        lineas.append("   motivos: " + ", ".join(f"{g} {n:,}" for g, n in meta["motivos"].items()))
+    if ejemplos:
+        for clave in ("normas_agregadas", "normas_eliminadas", "normas_modificadas"):
+            lineas.append(f"   {clave}: {cambios[clave][:ejemplos].tolist()}")
+        for tabla in RELACIONES:
+            lineas.append(f"   {tabla}_agregadas: {cambios[f'{tabla}_agregadas'][:ejemplos].tolist()}")
+    return "\n".join(lineas)
+
+# ============================================
+# PRINCIPAL
+# ============================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--datos", default=DATA_DIR, help="carpeta con los CSV de Infoleg")
+    parser.add_argument("--salida", default=CAMBIOS_DIR)
+    parser.add_argument("--local", action="store_true", help="no bajar ni subir huellas de Dropbox")
+    parser.add_argument("--mostrar", type=int, metavar="N",
+                        help="solo mostrar el último changeset (con hasta N ids de ejemplo)")
+    args = parser.parse_args()
+
+    if args.mostrar is not None:
+        cambios = cargar(os.path.join(args.salida, "cambios.npz"))
+        print(resumen(cambios, args.mostrar) if cambios else "No hay changeset.")
+        sys.exit(0)
+
+    metricas.iniciar("cambios_infoleg")
+    if not args.local:
+        with metricas.etapa("bajada_dropbox"):
+            bajar_huellas(args.salida)
+    calcular(args.datos, args.salida)
+    print(resumen(cargar(os.path.join(args.salida, "cambios.npz"))))
+    if not args.local:
+        with metricas.etapa("subida_dropbox"):
+            subir_huellas(args.salida)
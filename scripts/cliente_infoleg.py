@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import random
+import threading
+from collections import deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import metricas
+
+# ============================================
+# CONFIG
+# ============================================
+
+CONCURRENCIA_INICIAL = 2
+CONCURRENCIA_MIN = 1
+CONCURRENCIA_MAX = int(os.environ.get("DIGESTO_INFOLEG_CONCURRENCIA_MAX", "8"))
+
+TIMEOUT = (5, 20)              # (conexión, lectura)
+LATENCIA_OBJETIVO = 3.0        # por encima de esto se considera que el sitio está sufriendo
+MAX_INTENTOS = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+RETRY_AFTER_MAX = 300.0
+
+# circuit breaker
+VENTANA = 20                   # últimos N resultados para medir la tasa de error
+UMBRAL_ERROR = 0.5             # se abre con 50% de errores en la ventana
+ENFRIAMIENTO = 60.0            # segundos abierto antes de probar de nuevo (se duplica si la prueba falla)
+ENFRIAMIENTO_MAX = 15 * 60.0
+
+STATUS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class CircuitoAbierto(Exception):
+    """El sitio viene fallando: no se manda el request hasta que pase el enfriamiento."""
+
+    def __init__(self, espera):
+        super().__init__(f"circuito abierto, reintentar en {espera:.0f}s")
+        self.espera = espera
+
+# ============================================
+# HELPERS
+# ============================================
+
+def segundos_retry_after(valor):
+    """Retry-After puede venir en segundos o como fecha HTTP."""
+    if not valor:
+        return None
+    try:
+        return max(float(valor), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(valor).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def espera_con_jitter(intento):
+    """Backoff exponencial con "full jitter": reparte los reintentos en el tiempo."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** intento))
+
+# ============================================
+# CLIENTE
+# ============================================
+
+class ClienteAdaptativo:
+    """Cliente HTTP con concurrencia AIMD y circuit breaker, pensado para servicios.infoleg.gob.ar.
+
+    - Suma ~1 al límite de requests simultáneos por cada "vuelta" de respuestas sanas y lo
+      corta a la mitad ante errores, 429/5xx o latencias muy por encima del objetivo.
+    - Respeta Retry-After y reintenta con backoff exponencial y jitter.
+    - Con demasiados errores en la ventana abre el circuito y corta los requests hasta que
+      pasa el enfriamiento; después deja pasar un solo request de prueba (semiabierto).
+    """
+
+    def __init__(self, concurrencia_inicial=CONCURRENCIA_INICIAL, concurrencia_min=CONCURRENCIA_MIN,
+                 concurrencia_max=CONCURRENCIA_MAX, timeout=TIMEOUT, max_intentos=MAX_INTENTOS):
+        self.limite = float(concurrencia_inicial)
+        self.concurrencia_min = concurrencia_min
+        self.concurrencia_max = concurrencia_max
+        self.timeout = timeout
+        self.max_intentos = max_intentos
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrencia_max)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.cond = threading.Condition()
+        self.en_vuelo = 0
+        self.ultimo_recorte = 0.0
+        self.latencia_media = None
+
+        self.resultados = deque(maxlen=VENTANA)
+        self.estado = "cerrado"            # cerrado | abierto | semiabierto
+        self.abierto_hasta = 0.0
+        self.enfriamiento = ENFRIAMIENTO
+        self.aperturas = 0
+
+    # ---------- concurrencia ----------
+
+    def _adquirir(self):
+        with self.cond:
+            while True:
+                self._revisar_circuito()
+                cupo = 1 if self.estado == "semiabierto" else int(self.limite)
+                if self.en_vuelo < cupo:
+                    self.en_vuelo += 1
+                    return
+                self.cond.wait(timeout=1.0)
+
+    def _liberar(self):
+        with self.cond:
+            self.en_vuelo -= 1
+            self.cond.notify_all()
+
+    def _aumentar(self):
+        # incremento aditivo: +1 cuando respondieron "limite" requests sanos
+        self.limite = min(self.concurrencia_max, self.limite + 1.0 / self.limite)
+
+    def _recortar(self):
+        # decremento multiplicativo, como mucho una vez por latencia media (evita colapsar a 1 por una ráfaga)
+        ahora = time.monotonic()
+        if ahora - self.ultimo_recorte < (self.latencia_media or 1.0):
+            return
+        self.ultimo_recorte = ahora
+        self.limite = max(self.concurrencia_min, self.limite / 2)
+
+    # ---------- circuit breaker ----------
+
+    def _revisar_circuito(self):
+        if self.estado == "abierto":
+            espera = self.abierto_hasta - time.monotonic()
+            if espera > 0:
+                raise CircuitoAbierto(espera)
+            self.estado = "semiabierto"
+
+    def _abrir(self):
+        if self.estado == "semiabierto":
+            self.enfriamiento = min(self.enfriamiento * 2, ENFRIAMIENTO_MAX)
+        self.estado = "abierto"
+        self.abierto_hasta = time.monotonic() + self.enfriamiento
+        self.aperturas += 1
+        self.limite = float(self.concurrencia_min)
+        self.resultados.clear()
+        print(f"⛔ Infoleg degradado: circuito abierto por {self.enfriamiento:.0f}s")
+
+    def _registrar(self, ok, latencia):
+        with self.cond:
+            if latencia is not None:
+                self.latencia_media = latencia if self.latencia_media is None else (
+                    0.8 * self.latencia_media + 0.2 * latencia
+                )
+            lento = latencia is not None and latencia > 2 * LATENCIA_OBJETIVO
+
+            if ok and not lento:
+                self._aumentar()
+            else:
+                self._recortar()
+
+            if self.estado == "semiabierto":
+                if ok:
+                    self.estado = "cerrado"
+                    self.enfriamiento = ENFRIAMIENTO
+                else:
+                    self._abrir()
+                return
+
+            self.resultados.append(ok)
+            if len(self.resultados) == VENTANA and self.resultados.count(False) / VENTANA >= UMBRAL_ERROR:
+                self._abrir()
+
+    def espera_restante(self):
+        with self.cond:
+            return max(self.abierto_hasta - time.monotonic(), 0.0) if self.estado == "abierto" else 0.0
+
+    # ---------- requests ----------
+
+    def get(self, url, **kwargs):
+        """GET con reintentos. Devuelve la última respuesta (200, 404, ...) o levanta la última excepción.
+
+        Levanta CircuitoAbierto si el sitio está en enfriamiento.
+        """
+        # sin stream el cuerpo ya está leído cuando vuelve session.get: la respuesta sirve cerrada
+        with self._pedir(url, **kwargs) as r:
+            return r
+
+    def get_stream(self, url, **kwargs):
+        """Como get(url, stream=True), pero como context manager: el lugar de concurrencia queda
+        tomado hasta salir del with (hasta leer el último bloque) y la latencia que ajusta el
+        límite incluye la transferencia del cuerpo.
+
+            with CLIENTE_INFOLEG.get_stream(url) as r:
+                for bloque in r.iter_content(...): ...
+        """
+        return self._pedir(url, stream=True, **kwargs)
+
+    @contextmanager
+    def _pedir(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        ultimo_error = None
+
+        for intento in range(self.max_intentos):
+            if intento:
+                metricas.registrar_reintento(url)
+            ultimo = intento + 1 == self.max_intentos
+
+            self._adquirir()
+            t0 = time.perf_counter()
+            try:
+                r = self.session.get(url, **kwargs)
+            except requests.RequestException as e:
+                # el lugar se devuelve antes del backoff, que se espera sin ocuparlo
+                self._liberar()
+                self._registrar(False, None)
+                ultimo_error = e
+                if not ultimo:
+                    time.sleep(espera_con_jitter(intento))
+                continue
+
+            if r.status_code in STATUS_REINTENTABLES and not ultimo:
+                latencia = time.perf_counter() - t0
+                # la respuesta descartada no retiene la conexión durante la espera
+                r.close()
+                self._liberar()
+                self._registrar(False, latencia)
+                retry_after = segundos_retry_after(r.headers.get("Retry-After"))
+                if retry_after is not None:
+                    time.sleep(min(retry_after, RETRY_AFTER_MAX) + random.uniform(0, 1))
+                else:
+                    time.sleep(espera_con_jitter(intento))
+                continue
+
+            # respuesta final (incluso un 5xx del último intento): el lugar sigue tomado
+            # mientras quien pidió la lee
+            ok = r.status_code not in STATUS_REINTENTABLES
+            try:
+                with r:
+                    yield r
+            except requests.RequestException:
+                ok = False
+                raise
+            finally:
+                self._liberar()
+                self._registrar(ok, time.perf_counter() - t0)
+            return
+
+        raise ultimo_error
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import sqlite3
+import threading
+
+# ============================================
+# CONFIG
+# ============================================
+
+COLA_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "estado",
+    "cola_fichas.sqlite"
+)
+
+# ruta del checkpoint en Dropbox (el runner de Actions no conserva disco entre corridas)
+DROPBOX_COLA_PATH = "/estado/cola_fichas.sqlite"
+
+MAX_INTENTOS = 5
+BACKOFF_BASE = 15 * 60           # 15 min, se duplica en cada intento fallido
+BACKOFF_MAX = 7 * 24 * 3600      # nunca más de una semana
+REVISITA_MUERTAS = 30 * 24 * 3600  # las muertas se reintentan una vez por mes
+
+# estados: pendiente | en_curso | ok | error | muerta
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS fichas (
+    id_norma        TEXT PRIMARY KEY,
+    estado          TEXT NOT NULL DEFAULT 'pendiente',
+    intentos        INTEGER NOT NULL DEFAULT 0,
+    ultimo_error    TEXT,
+    proximo_intento REAL NOT NULL DEFAULT 0,
+    actualizado     REAL,
+    prioridad       REAL NOT NULL DEFAULT 0,
+    fijado          INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS fichas_listas ON fichas (estado, proximo_intento);
+"""
+
+# columnas agregadas después de la primera versión (colas ya guardadas en Dropbox)
+COLUMNAS_NUEVAS = {
+    "prioridad": "REAL NOT NULL DEFAULT 0",
+    "fijado": "INTEGER NOT NULL DEFAULT 0",
+}
+
+# ============================================
+# COLA
+# ============================================
+
+class ColaFichas:
+    """Cola persistente de ids a scrapear, con estado, intentos y próximo reintento por id.
+
+    Cada cambio se commitea al momento: si el proceso muere, la próxima corrida retoma desde
+    el último id marcado sin volver a listar Dropbox.
+    """
+
+    def __init__(self, path=COLA_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.con = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.con:
+            self.con.executescript(ESQUEMA)
+            existentes = {row[1] for row in self.con.execute("PRAGMA table_info(fichas)")}
+            for columna, tipo in COLUMNAS_NUEVAS.items():
+                if columna not in existentes:
+                    self.con.execute(f"ALTER TABLE fichas ADD COLUMN {columna} {tipo}")
+
+    def cerrar(self):
+        self.con.close()
+
+    # ---------- carga ----------
+
+    def sembrar(self, ids, estado="pendiente"):
+        """Agrega ids nuevos; los que ya están en la cola conservan su estado."""
+        ahora = time.time()
+        with self.lock, self.con:
+            cur = self.con.executemany(
+                "INSERT OR IGNORE INTO fichas (id_norma, estado, actualizado) VALUES (?, ?, ?)",
+                ((str(i), estado, ahora) for i in ids)
+            )
+        return cur.rowcount
+
+    def reabrir(self, ids):
+        """Vuelve a pendiente (sin intentos ni backoff) ids ya procesados cuya norma cambió en Infoleg."""
+        ahora = time.time()
+        with self.lock, self.con:
+            cur = self.con.executemany(
+                """
+                UPDATE fichas SET estado = 'pendiente', intentos = 0, proximo_intento = 0, actualizado = ?
+                WHERE id_norma = ? AND estado != 'en_curso'
+                """,
+                ((ahora, str(i)) for i in ids)
+            )
+        return cur.rowcount
+
+    def exportar(self, path, pendientes=()):
+        """Copia consistente de la cola en `path`, con los ids de `pendientes` que estén ok vueltos a pendiente.
+
+        Sirve para checkpoints de la cola cuando las fichas de esos ids todavía no se subieron.
+        """
+        destino = sqlite3.connect(path)
+        try:
+            with self.lock:
+                self.con.backup(destino)
+            with destino:
+                destino.executemany(
+                    "UPDATE fichas SET estado = 'pendiente', proximo_intento = 0 WHERE id_norma = ? AND estado = 'ok'",
+                    ((str(i),) for i in pendientes)
+                )
+        finally:
+            destino.close()
+
+    def recuperar_en_curso(self):
+        """Devuelve a pendiente lo que quedó tomado por una corrida que murió."""
+        with self.lock, self.con:
+            cur = self.con.execute("UPDATE fichas SET estado = 'pendiente' WHERE estado = 'en_curso'")
+        return cur.rowcount
+
+    # ---------- prioridad ----------
+
+    def actualizar_prioridades(self, prioridades):
+        """prioridades: iterable de (id_norma, score)."""
+        with self.lock, self.con:
+            self.con.executemany(
+                "UPDATE fichas SET prioridad = ? WHERE id_norma = ?",
+                ((float(p), str(i)) for i, p in prioridades)
+            )
+
+    def fijar(self, ids):
+        """Reemplaza el conjunto de ids fijados; los fijados sin ficha se procesan ya, sin esperar backoff."""
+        ids = [str(i) for i in ids]
+        with self.lock, self.con:
+            self.con.execute("UPDATE fichas SET fijado = 0 WHERE fijado = 1")
+            self.con.executemany(
+                "INSERT OR IGNORE INTO fichas (id_norma, actualizado) VALUES (?, ?)",
+                ((i, time.time()) for i in ids)
+            )
+            self.con.executemany(
+                """
+                UPDATE fichas SET fijado = 1,
+                    proximo_intento = CASE WHEN estado = 'ok' THEN proximo_intento ELSE 0 END
+                WHERE id_norma = ?
+                """,
+                ((i,) for i in ids)
+            )
+
+    # ---------- trabajo ----------
+
+    def tomar(self, limite):
+        """Marca como en_curso y devuelve hasta `limite` ids listos para procesar.
+
+        Primero los fijados por usuarios, después por intentos (los que vienen fallando
+        quedan al final) y dentro de eso por prioridad (ver prioridad_fichas.py).
+        """
+        ahora = time.time()
+        with self.lock, self.con:
+            ids = [row[0] for row in self.con.execute(
+                """
+                SELECT id_norma FROM fichas
+                WHERE estado IN ('pendiente', 'error', 'muerta') AND proximo_intento <= ?
+                ORDER BY fijado DESC, estado = 'muerta', intentos, prioridad DESC, proximo_intento
+                LIMIT ?
+                """,
+                (ahora, limite)
+            )]
+            self.con.executemany(
+                "UPDATE fichas SET estado = 'en_curso', actualizado = ? WHERE id_norma = ?",
+                ((ahora, i) for i in ids)
+            )
+        return ids
+
+    def marcar_ok(self, id_norma):
+        with self.lock, self.con:
+            self.con.execute(
+                "UPDATE fichas SET estado = 'ok', ultimo_error = NULL, actualizado = ? WHERE id_norma = ?",
+                (time.time(), str(id_norma))
+            )
+
+    def marcar_error(self, id_norma, error, permanente=False):
+        """Registra el fallo y agenda el reintento con backoff exponencial (o muerta)."""
+        ahora = time.time()
+        with self.lock, self.con:
+            row = self.con.execute(
+                "SELECT intentos FROM fichas WHERE id_norma = ?", (str(id_norma),)
+            ).fetchone()
+            intentos = (row[0] if row else 0) + 1
+
+            if permanente or intentos >= MAX_INTENTOS:
+                estado, espera = "muerta", REVISITA_MUERTAS
+            else:
+                estado, espera = "error", min(BACKOFF_BASE * 2 ** (intentos - 1), BACKOFF_MAX)
+
+            self.con.execute(
+                """
+                INSERT INTO fichas (id_norma, estado, intentos, ultimo_error, proximo_intento, actualizado)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (id_norma) DO UPDATE SET
+                    estado = excluded.estado,
+                    intentos = excluded.intentos,
+                    ultimo_error = excluded.ultimo_error,
+                    proximo_intento = excluded.proximo_intento,
+                    actualizado = excluded.actualizado
+                """,
+                (str(id_norma), estado, intentos, str(error)[:500], ahora + espera, ahora)
+            )
+        return estado
+
+    # ---------- consulta ----------
+
+    def resumen(self):
+        with self.lock:
+            return dict(self.con.execute("SELECT estado, COUNT(*) FROM fichas GROUP BY estado"))
+
+    def ids_ok(self):
+        with self.lock:
+            return {row[0] for row in self.con.execute("SELECT id_norma FROM fichas WHERE estado = 'ok'")}
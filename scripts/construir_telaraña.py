@@ -1,9 +1,22 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
+import csv
 import json
+import numpy as np
 import pandas as pd
 import requests
+from pandas.api.types import union_categoricals
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import metricas
+from almacen_fichas import AlmacenFichas, bajar_almacen
+from esquema_digesto import RELACIONES, tipar, leer_relaciones, escribir_relaciones
+from exportar_grafo import exportar, DROPBOX_GRAFO_FOLDER
+from analitica_grafo import actualizar_normas, ESTADO_PATH
+import indice_temporal
+import duplicados
 
 # ================================
 # SECRETS
@@ -15,6 +28,11 @@ DROPBOX_REFRESH_TOKEN = os.environ.get("REFRESH_TOKEN")
 
 DROPBOX_JSON_FOLDER = "/fichas_json"
 
+NORMAS_CSV = "data_procesada/digesto_normas.csv"
+
+# fichas por lote al extraer relaciones: cada lote se pasa a arrays de enteros y se liberan las listas
+LOTE_FICHAS = 20000
+
 # ================================
 # DROPBOX OPERATIONS
 # ================================
@@ -103,6 +121,7 @@ def dropbox_delete(path):
 # EXTRACCIÓN DE RELACIONES
 # ================================
 
+@metricas.perfilar
 def extraer_relaciones_json(json_data):
     id_origen = json_data["id_norma"]
     rels = []
@@ -120,28 +139,161 @@ def extraer_relaciones_json(json_data):
 
     # 3) Relaciones por texto libre
     for txt in json_data["deep"].get("normas_mencionadas_texto", []):
-        # Ejemplo: "Ley 1173"
-        numero = txt.split(" ")[-1]
+        # Ejemplo: "Ley 1173". Las menciones número/año ("Decreto 1023/2001") no son un id:
+        # extraer_relaciones_lote las descarta y construir_telarana informa cuántas
+        numero = txt.split(" ")[-1].replace(".", "")
         rels.append((id_origen, numero, "menciona", "texto_plano"))
 
     return rels
 
 
+def _entero(x):
+    """int(x), o -1 (queda NA) si no es un id válido: "1023/2001" o fuera de 0..2**31-1.
+
+    El rango se controla acá: un número de más de 19 dígitos ni siquiera entra en el
+    array int64 de extraer_relaciones_lote.
+    """
+    try:
+        valor = int(x)
+    except (TypeError, ValueError):
+        return -1
+    return valor if 0 <= valor <= 2**31 - 1 else -1
+
+
+def extraer_relaciones_lote(fichas):
+    """Lo mismo que extraer_relaciones_json sobre varias fichas, pero en columnas.
+
+    Por cada (ficha, tipo de relación) se anota un tramo: origen, tipo, fuente y cuántos
+    destinos trae; los destinos van a una sola lista de enteros. Después origen, tipo y
+    fuente se expanden con np.repeat, sin crear una tupla por relación.
+    Devuelve un DataFrame con ids Int32 y tipo_relacion/fuente como categorías.
+    """
+    tipos, fuentes = {}, {}
+    tramo_origen, tramo_tipo, tramo_fuente, tramo_largo = [], [], [], []
+    destinos = []
+
+    def agregar(id_origen, nuevos, tipo_relacion, fuente):
+        if not nuevos:
+            return
+        tramo_origen.append(id_origen)
+        tramo_tipo.append(tipos.setdefault(tipo_relacion, len(tipos)))
+        tramo_fuente.append(fuentes.setdefault(fuente, len(fuentes)))
+        tramo_largo.append(len(nuevos))
+        destinos.extend(nuevos)
+
+    for data in fichas:
+        id_origen = _entero(data["id_norma"])
+        for tipo_relacion, lista in data["relaciones"].items():
+            agregar(id_origen, [_entero(url.rpartition("id=")[2]) for _, url in lista if "id=" in url],
+                    tipo_relacion, "infoleg_ficha")
+        deep = data["deep"]
+        agregar(id_origen, [_entero(d) for d in deep.get("normas_mencionadas", [])], "menciona", "embebida_link")
+        agregar(id_origen, [_entero(txt.split(" ")[-1].replace(".", "")) for txt in deep.get("normas_mencionadas_texto", [])],
+                "menciona", "texto_plano")
+
+    largos = np.array(tramo_largo, dtype=np.int64)
+
+    def ids(valores):
+        valores = np.asarray(valores, dtype=np.int64)
+        invalido = (valores < 0) | (valores > 2**31 - 1)
+        return pd.arrays.IntegerArray(np.where(invalido, 0, valores).astype(np.int32), invalido)
+
+    def categorias(tramos, nombres):
+        codigos = np.repeat(np.array(tramos, dtype=np.int16), largos)
+        return pd.Categorical.from_codes(codigos, categories=list(nombres))
+
+    return pd.DataFrame({
+        "id_origen": ids(np.repeat(np.array(tramo_origen, dtype=np.int64), largos)),
+        "id_destino": ids(destinos),
+        "tipo_relacion": categorias(tramo_tipo, tipos),
+        "fuente": categorias(tramo_fuente, fuentes),
+    })
+
+
+def extraer_relaciones_por_lotes(fichas, tamano=LOTE_FICHAS):
+    """Recorre las fichas (puede ser un generador) y va devolviendo lotes ya en columnas."""
+    lote = []
+    for data in fichas:
+        lote.append(data)
+        if len(lote) >= tamano:
+            yield extraer_relaciones_lote(lote)
+            lote = []
+    if lote:
+        yield extraer_relaciones_lote(lote)
+
 # ================================
-# MAIN
+# CONSTRUCCIÓN
 # ================================
 
-if __name__ == "__main__":
-
-    print("Leyendo CSV oficiales...")
-    df_oficial = pd.read_csv("data_procesada/digesto_relaciones.csv", dtype=str)
-
-    print("Listando JSON en Dropbox...")
-    archivos = dropbox_list_json()
-    print(f"✔ JSON detectados: {len(archivos)}")
-
-    relaciones_expandidas = []
-
+def unir_relaciones(partes):
+    """concat que conserva categorías (unión de categorías en vez de caer a strings)."""
+    partes = [p for p in partes if len(p)]
+    if not partes:
+        return tipar(pd.DataFrame(columns=list(RELACIONES)), RELACIONES)
+    columnas = {}
+    for col in RELACIONES:
+        if RELACIONES[col] == "categoria":
+            columnas[col] = pd.Series(union_categoricals([p[col].astype("category") for p in partes]))
+        else:
+            columnas[col] = pd.concat([p[col].astype("Int32") for p in partes], ignore_index=True)
+    return pd.DataFrame(columnas)
+
+
+def aristas_duplicadas(df):
+    """Marca filas repetidas (se queda la primera) con una clave entera por arista.
+
+    (origen, destino) se empaqueta en un uint64 y se factoriza a un entero denso; sumándole
+    los códigos de tipo y fuente queda una sola clave int64 por fila, y el dedupe es un
+    hash de enteros en vez de comparar cuatro columnas.
+    """
+    origen = df["id_origen"].to_numpy("uint64")
+    destino = df["id_destino"].to_numpy("uint64")
+    par, _ = pd.factorize((origen << np.uint64(32)) | destino)
+
+    tipo = df["tipo_relacion"].cat.codes.to_numpy("int64") + 1        # +1: el NA es -1
+    fuente = df["fuente"].cat.codes.to_numpy("int64") + 1
+    n_tipos = len(df["tipo_relacion"].cat.categories) + 1
+    n_fuentes = len(df["fuente"].cat.categories) + 1
+
+    clave = (par * n_tipos + tipo) * n_fuentes + fuente
+    return pd.Index(clave).duplicated(keep="first")
+
+
+def filtrar_nuevas(df, vistas):
+    """Máscara de las filas de `df` cuya arista no está en `vistas` (ni antes en el mismo df).
+
+    `vistas` ({(tipo_relacion, fuente): array uint64 ordenado de claves origen << 32 | destino})
+    se actualiza y persiste entre lotes. Cada lote se busca con searchsorted contra las claves
+    ya aceptadas y las nuevas se intercalan en su lugar (np.insert: merge de dos arrays
+    ordenados, sin volver a ordenar lo acumulado). Son 8 bytes por arista y nada por fila en Python.
+    """
+    primeras = ~aristas_duplicadas(df)
+    par = (df["id_origen"].to_numpy("uint64") << np.uint64(32)) | df["id_destino"].to_numpy("uint64")
+    tipo = df["tipo_relacion"].cat.codes.to_numpy("int64")
+    fuente = df["fuente"].cat.codes.to_numpy("int64")
+    combinacion = (tipo + 1) * (len(df["fuente"].cat.categories) + 1) + fuente + 1
+
+    tipos = list(df["tipo_relacion"].cat.categories)
+    fuentes = list(df["fuente"].cat.categories)
+    mascara = np.zeros(len(df), dtype=bool)
+    for c in np.unique(combinacion[primeras]):
+        # dentro del grupo las claves de `primeras` ya son únicas
+        filas = np.flatnonzero(primeras & (combinacion == c))
+        t, f = tipo[filas[0]], fuente[filas[0]]
+        clave_grupo = (tipos[t] if t >= 0 else None, fuentes[f] if f >= 0 else None)
+        conocidas = vistas.get(clave_grupo, np.zeros(0, dtype=np.uint64))
+        claves = par[filas]
+
+        pos = np.searchsorted(conocidas, claves)
+        esta = pos < len(conocidas)
+        esta[esta] = conocidas[pos[esta]] == claves[esta]
+        nuevas = np.sort(claves[~esta])
+        vistas[clave_grupo] = np.insert(conocidas, np.searchsorted(conocidas, nuevas), nuevas)
+        mascara[filas[~esta]] = True
+    return mascara
+
+
+def iterar_fichas_dropbox(archivos):
     for file in archivos:
         path = f"{DROPBOX_JSON_FOLDER}/{file}"
         contenido = dropbox_download(path)
@@ -150,35 +302,128 @@ if __name__ == "__main__":
             print(f"⚠ No se pudo descargar: {file}")
             continue
 
-        data = json.loads(contenido.decode("utf-8"))
-        relaciones_expandidas.extend(extraer_relaciones_json(data))
+        yield json.loads(contenido.decode("utf-8"))
+
 
-    # dataframe extra
-    df_extra = pd.DataFrame(
-        relaciones_expandidas,
-        columns=["id_origen", "id_destino", "tipo_relacion", "fuente"]
-    )
+def iterar_fichas(archivos, almacen=None):
+    """Primero las fichas del almacén empaquetado; de /fichas_json solo las que todavía no migraron."""
+    if almacen is not None:
+        yield from almacen.iterar_json()
+        archivos = [f for f in archivos if ("json", f[:-len(".json")]) not in almacen]
+    yield from iterar_fichas_dropbox(archivos)
 
+
+def construir_telarana(df_oficial, fichas):
+    """Une las relaciones oficiales con las extraídas de las fichas (iterable de dicts, sin I/O).
+
+    Las fichas se extraen por lotes a columnas de enteros y categorías, y cada lote se
+    deduplica al llegar contra las claves ya aceptadas (filtrar_nuevas): la memoria depende de
+    las aristas distintas, no de las repetidas, y los lotes se concatenan una sola vez al final.
+    """
     # dataframe oficial
-    df_oficial2 = df_oficial.copy()
-    df_oficial2["fuente"] = "infoleg_csv"
+    df_oficial2 = tipar(df_oficial.copy(), RELACIONES)
+    df_oficial2["fuente"] = pd.Categorical(["infoleg_csv"] * len(df_oficial2))
+    df_oficial2 = df_oficial2.dropna(subset=["id_origen", "id_destino"]).reset_index(drop=True)
+
+    vistas = {}
+    descartadas = {}
+    partes = [df_oficial2[filtrar_nuevas(df_oficial2, vistas)]]
+    for df_extra in extraer_relaciones_por_lotes(fichas):
+        sin_id = df_extra["id_origen"].isna() | df_extra["id_destino"].isna()
+        for fuente, n in df_extra.loc[sin_id, "fuente"].value_counts().items():
+            descartadas[fuente] = descartadas.get(fuente, 0) + int(n)
+        df_extra = df_extra[~sin_id].reset_index(drop=True)
+        partes.append(df_extra[filtrar_nuevas(df_extra, vistas)])
+
+    if any(descartadas.values()):
+        detalle = ", ".join(f"{fuente}: {n:,}" for fuente, n in descartadas.items() if n)
+        print(f"⚠ Relaciones de fichas descartadas por no tener id de norma entero ({detalle})")
+    return unir_relaciones(partes).reset_index(drop=True)
 
-    # unión final
-    df_final = pd.concat([df_oficial2, df_extra], ignore_index=True)
 
-    df_final = df_final.dropna(subset=["id_origen", "id_destino"])
-    df_final = df_final.drop_duplicates()
+# ================================
+# MAIN
+# ================================
 
-    out_path = "data_procesada/digesto_relaciones_expandido.csv"
-    df_final.to_csv(out_path, index=False, encoding="utf-8")
+if __name__ == "__main__":
 
-    # ====== DELETE + RECREATE como pediste ======
-    print("📌 Eliminando remoto expandido previo...")
-    dropbox_delete("/data_procesada/digesto_relaciones_expandido.csv")
+    metricas.iniciar("construir_telarana")
 
-    print("📌 Subiendo nuevo expandido...")
-    with open(out_path, "rb") as f:
-        dropbox_upload("/data_procesada/digesto_relaciones_expandido.csv", f.read())
+    print("Leyendo CSV oficiales...")
+    with metricas.etapa("lectura_oficial"):
+        df_oficial = leer_relaciones("data_procesada/digesto_relaciones.csv")
+        metricas.sumar_filas(len(df_oficial))
 
-    print("✔ Telaraña jurídica generada y actualizada en Dropbox.")
+    print("Bajando almacén de fichas...")
+    with metricas.etapa("bajada_almacen"):
+        almacen = AlmacenFichas() if bajar_almacen() else None
+    if almacen is not None:
+        print(f"✔ Fichas en el almacén: {len(almacen.ids('json'))}")
+
+    print("Listando JSON en Dropbox...")
+    with metricas.etapa("listado_dropbox"):
+        archivos = dropbox_list_json()
+        metricas.sumar_filas(len(archivos))
+    print(f"✔ JSON detectados: {len(archivos)}")
+
+    with metricas.etapa("descarga_y_extraccion"):
+        df_final = construir_telarana(df_oficial, iterar_fichas(archivos, almacen))
+        metricas.sumar_filas(len(df_final))
+
+        out_path = "data_procesada/digesto_relaciones_expandido.csv"
+        escribir_relaciones(df_final, out_path, encoding="utf-8", quoting=csv.QUOTE_MINIMAL)
+
+    print("Exportando grafo (parquet, CSR, GraphML, lista de aristas)...")
+    with metricas.etapa("exportacion_grafo"):
+        exportados = exportar(df_final)
+
+    analitica = os.path.exists(NORMAS_CSV)
+    if analitica:
+        print("Calculando analítica del grafo (PageRank, componentes, grados)...")
+        with metricas.etapa("analitica_grafo"):
+            # el estado de la corrida anterior permite reusar o arrancar en caliente
+            if not os.path.exists(ESTADO_PATH):
+                estado = dropbox_download(f"{DROPBOX_GRAFO_FOLDER}/{os.path.basename(ESTADO_PATH)}")
+                if estado:
+                    with open(ESTADO_PATH, "wb") as f:
+                        f.write(estado)
+            df_normas = actualizar_normas(df_final, NORMAS_CSV)
+            exportados.append(ESTADO_PATH)
+
+        print("Armando índice temporal de modificaciones...")
+        with metricas.etapa("indice_temporal"):
+            indice = indice_temporal.construir(df_final, df_normas)
+            exportados.append(indice_temporal.guardar(indice))
+            metricas.sumar_filas(len(indice["modificadoras"]))
+
+        print("Buscando normas casi duplicadas (MinHash + LSH)...")
+        with metricas.etapa("duplicados"):
+            # con las firmas de la corrida anterior solo se firman las normas nuevas o cambiadas
+            if not os.path.exists(duplicados.ESTADO_PATH):
+                estado = dropbox_download(f"{DROPBOX_GRAFO_FOLDER}/{os.path.basename(duplicados.ESTADO_PATH)}")
+                if estado:
+                    with open(duplicados.ESTADO_PATH, "wb") as f:
+                        f.write(estado)
+            df_normas = duplicados.actualizar_normas(NORMAS_CSV, almacen, df_normas=df_normas)
+            exportados.append(duplicados.ESTADO_PATH)
+
+    with metricas.etapa("subida_dropbox"):
+        # ====== DELETE + RECREATE como pediste ======
+        print("📌 Eliminando remoto expandido previo...")
+        dropbox_delete("/data_procesada/digesto_relaciones_expandido.csv")
+
+        print("📌 Subiendo nuevo expandido...")
+        with open(out_path, "rb") as f:
+            dropbox_upload("/data_procesada/digesto_relaciones_expandido.csv", f.read())
+
+        for path in exportados:
+            print(f"📌 Subiendo {os.path.basename(path)}...")
+            with open(path, "rb") as f:
+                dropbox_upload(f"{DROPBOX_GRAFO_FOLDER}/{os.path.basename(path)}", f.read())
+
+        if analitica:
+            print("📌 Subiendo digesto_normas.csv con la analítica del grafo y los casi duplicados...")
+            with open(NORMAS_CSV, "rb") as f:
+                dropbox_upload("/data_procesada/digesto_normas.csv", f.read())
 
+    print("✔ Telaraña jurídica generada y actualizada en Dropbox.")
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
 import zipfile
 import io
 import requests
@@ -8,6 +9,9 @@ import pandas as pd
 import json
 from datetime import datetime, timedelta, timezone
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import metricas
+
 # ==========================================================
 # Configuración general
 # ==========================================================
@@ -20,7 +24,6 @@ DROPBOX_CLIENT_SECRET = os.environ.get("APP_SECRET")
 DROPBOX_REFRESH_TOKEN = os.environ.get("REFRESH_TOKEN")
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
-os.makedirs(DATA_DIR, exist_ok=True)
 
 # ==========================================================
 # URLs oficiales Infoleg
@@ -95,46 +98,46 @@ def subir_a_dropbox(local_path, remote_path, token):
 # Descarga + FIX de encoding
 # ==========================================================
 
-print("🔍 Iniciando descarga Infoleg...\n")
-
-for nombre, url in resources.items():
+def descargar(nombre, url):
     print(f"⬇️ Descargando {nombre}\n   {url}")
 
     try:
-        r = requests.get(url)
-        r.raise_for_status()
-
-        z = zipfile.ZipFile(io.BytesIO(r.content))
-        csv_files = [f for f in z.namelist() if f.endswith(".csv")]
-
-        if not csv_files:
-            print(f"⚠️ No se encontró CSV en {nombre}")
-            continue
-
-        csv_name = csv_files[0]
-        print(f"📄 Extrayendo {csv_name}...")
-
-        # Leemos el CSV crudo
-        with z.open(csv_name) as f:
-            raw = f.read()
-
-        # Caso 1: viene en UTF-8 con mojibake tipo "ResoluciÃ³n"
-        try:
-            texto_corrupto = raw.decode("utf-8")          # sin ignore, para no perder bytes
-            texto = (
-                texto_corrupto
-                    .encode("latin1")                     # reinterpretar como latin1
-                    .decode("utf-8")                      # y volver a utf-8 correcto
-            )
-        except UnicodeDecodeError:
-            # Caso 2: viene realmente en latin1 / cp1252
-            texto = raw.decode("latin1")
-
-        # Cargar en pandas desde el texto ya corregido
-        df = pd.read_csv(io.StringIO(texto), low_memory=False)
-
-        destino = os.path.join(DATA_DIR, f"{nombre}.csv")
-        df.to_csv(destino, index=False, encoding="utf-8")
+        with metricas.etapa(f"descarga_{nombre}"):
+            r = requests.get(url)
+            r.raise_for_status()
+
+            z = zipfile.ZipFile(io.BytesIO(r.content))
+            csv_files = [f for f in z.namelist() if f.endswith(".csv")]
+
+            if not csv_files:
+                print(f"⚠️ No se encontró CSV en {nombre}")
+                return
+
+            csv_name = csv_files[0]
+            print(f"📄 Extrayendo {csv_name}...")
+
+            # Leemos el CSV crudo
+            with z.open(csv_name) as f:
+                raw = f.read()
+
+            # Caso 1: viene en UTF-8 con mojibake tipo "ResoluciÃ³n"
+            try:
+                texto_corrupto = raw.decode("utf-8")          # sin ignore, para no perder bytes
+                texto = (
+                    texto_corrupto
+                        .encode("latin1")                     # reinterpretar como latin1
+                        .decode("utf-8")                      # y volver a utf-8 correcto
+                )
+            except UnicodeDecodeError:
+                # Caso 2: viene realmente en latin1 / cp1252
+                texto = raw.decode("latin1")
+
+            # Cargar en pandas desde el texto ya corregido
+            df = pd.read_csv(io.StringIO(texto), low_memory=False)
+
+            destino = os.path.join(DATA_DIR, f"{nombre}.csv")
+            df.to_csv(destino, index=False, encoding="utf-8")
+            metricas.sumar_filas(len(df))
 
         print(f"✅ Guardado: {destino} ({len(df):,} filas)\n")
 
@@ -145,19 +148,34 @@ for nombre, url in resources.items():
 # Subir a Dropbox con eliminación previa
 # ==========================================================
 
-print("☁️ Subiendo a Dropbox...")
+def subir_todo():
+    print("☁️ Subiendo a Dropbox...")
 
-token = obtener_access_token()
+    with metricas.etapa("subida_dropbox"):
+        token = obtener_access_token()
 
-for nombre in resources.keys():
-    archivo_local = os.path.join(DATA_DIR, f"{nombre}.csv")
-    archivo_remoto = f"/data/{nombre}.csv"
+        for nombre in resources.keys():
+            archivo_local = os.path.join(DATA_DIR, f"{nombre}.csv")
+            archivo_remoto = f"/data/{nombre}.csv"
 
-    borrar_en_dropbox(archivo_remoto, token)
-    subir_a_dropbox(archivo_local, archivo_remoto, token)
+            borrar_en_dropbox(archivo_remoto, token)
+            subir_a_dropbox(archivo_local, archivo_remoto, token)
+
+# ==========================================================
+# Principal
+# ==========================================================
 
-print("✔ Finalizado correctamente.")
+def main():
+    os.makedirs(DATA_DIR, exist_ok=True)
+    metricas.iniciar("descargar_infoleg")
 
+    print("🔍 Iniciando descarga Infoleg...\n")
+    for nombre, url in resources.items():
+        descargar(nombre, url)
 
+    subir_todo()
+    print("✔ Finalizado correctamente.")
 
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+
+"""Normas casi duplicadas (resoluciones seriadas, actualizaciones de precios repetidas) con MinHash + LSH.
+
+Cada norma se resume en una firma MinHash de NUM_HASHES valores sobre sus shingles de
+LARGO_SHINGLE caracteres (título sumario, resumen y texto de la ficha, sin tildes y con los
+números enmascarados: "Resolución 123/2020" y "Resolución 124/2020" dan los mismos shingles).
+La firma sale de una sola pasada de hashing por shingle (one permutation hashing con
+densificación), vectorizada sobre lotes de normas.
+
+Las firmas se cortan en BANDAS bandas de FILAS valores; dos normas que coinciden en una banda
+entera son candidatas. Cada candidata se compara solo contra el primer miembro de su balde y el
+par queda si la similitud estimada supera UMBRAL, así que el costo es lineal en la cantidad de
+normas aunque haya baldes de miles. Los grupos son las componentes conexas de esos pares.
+
+En digesto_normas queda:
+
+    grupo_duplicados            id_norma más chico del grupo (vacío si la norma no tiene duplicados)
+    tamano_grupo_duplicados     cantidad de normas del grupo
+
+Las firmas se guardan entre corridas (duplicados_estado.npz) con una huella del texto de cada
+norma: solo se recalculan las normas nuevas o cuyo texto cambió (p. ej. porque llegó su ficha).
+
+Uso:
+    python scripts/duplicados.py
+    python scripts/duplicados.py --grupo 12345      # normas del grupo de la norma 12345
+"""
+
+import os
+import re
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from esquema_digesto import leer_normas, escribir_normas
+from exportar_grafo import GRAFO_DIR
+from analitica_grafo import componentes, posiciones
+
+# ============================================
+# CONFIG
+# ============================================
+
+ESTADO_PATH = os.path.join(GRAFO_DIR, "duplicados_estado.npz")
+
+COLUMNAS_TEXTO = ["titulo_sumario", "resumen_infoleg"]
+COLUMNAS = ["grupo_duplicados", "tamano_grupo_duplicados"]
+
+LARGO_SHINGLE = 5
+NUM_HASHES = 64
+BANDAS = 16                    # 16 bandas de 4: la probabilidad de ser candidatas cruza 0.5 cerca de J=0.5
+FILAS = NUM_HASHES // BANDAS
+UMBRAL = 0.7                   # similitud de Jaccard estimada para aceptar un par
+MIN_SHINGLES = 20              # textos más cortos ("PRECIOS") no alcanzan para decir que son duplicados
+MAX_CARACTERES = 4000          # de cada norma se firma el principio: alcanza y acota el costo por norma
+LOTE = 5000                    # normas por lote de firmas (hasta MAX_CARACTERES shingles cada una)
+PARES_POR_COMPARACION = 500000
+
+_SIN_TILDES = str.maketrans("áéíóúüàèìòùâêîôûñ", "aeiouuaeiouaeioun")
+_NUMEROS = re.compile(r"\d+")
+_NO_ALFANUMERICO = re.compile(r"[^a-z0-9]+")
+
+_VACIO = np.uint32(0xFFFFFFFF)
+_MEZCLA = np.uint64(0x9E3779B97F4A7C15)
+
+# ============================================
+# TEXTO
+# ============================================
+
+def normalizar(textos):
+    """Serie de textos -> minúsculas ASCII, números como "0", un espacio entre palabras."""
+    textos = pd.Series(textos, dtype=object).fillna("").astype(str).str.slice(0, MAX_CARACTERES)
+    textos = textos.str.lower().str.translate(_SIN_TILDES)
+    textos = textos.str.replace(_NUMEROS, "0", regex=True)
+    return textos.str.replace(_NO_ALFANUMERICO, " ", regex=True).str.strip()
+
+
+def textos_normas(df, almacen=None, ids=None):
+    """Texto a firmar de cada norma (alineado con df): columnas de COLUMNAS_TEXTO + texto de la ficha.
+
+    La ficha se lee del almacén solo para las normas de `ids` (las que hay que firmar).
+    """
+    columnas = [c for c in COLUMNAS_TEXTO if c in df.columns]
+    texto = df[columnas[0]].astype(object).fillna("").astype(str)
+    for col in columnas[1:]:
+        texto = texto + " " + df[col].astype(object).fillna("").astype(str)
+    if almacen is not None:
+        con_ficha = {int(i) for i in almacen.ids("json")}
+        pedir = set(ids) if ids is not None else con_ficha
+        fichas = {
+            i: (almacen.leer_json(i) or {}).get("deep", {}).get("texto_completo_ficha") or ""
+            for i in pedir & con_ficha
+        }
+        texto = texto + " " + df["id_norma"].map(fichas).fillna("")
+    return texto
+
+# ============================================
+# FIRMAS
+# ============================================
+
+def _mezclar(x):
+    # splitmix64: reparte bien bits de hashes parecidos (shingles que difieren en una letra)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def firmas(textos):
+    """Firmas MinHash (n x NUM_HASHES, uint32) y cantidad de shingles de cada texto ya normalizado."""
+    n = len(textos)
+    datos = np.frombuffer("".join(textos).encode("ascii", "replace"), dtype=np.uint8)
+    largos = np.fromiter((len(t) for t in textos), dtype=np.int64, count=n)
+    n_shingles = np.maximum(largos - LARGO_SHINGLE + 1, 0)
+
+    firma = np.full((n, NUM_HASHES), _VACIO, dtype=np.uint32)
+    if n_shingles.sum():
+        # inicio de cada shingle que no cruza al texto siguiente
+        fin_texto = np.cumsum(largos)
+        inicio = np.arange(len(datos) - LARGO_SHINGLE + 1)
+        texto = np.repeat(np.arange(n), largos)[inicio]
+        inicio = inicio[inicio + LARGO_SHINGLE <= fin_texto[texto]]
+        texto = np.repeat(np.arange(n), n_shingles)
+
+        h = np.zeros(len(inicio), dtype=np.uint64)
+        for j in range(LARGO_SHINGLE):
+            h = h * np.uint64(257) + datos[inicio + j]
+        h = _mezclar(h * _MEZCLA)
+        # one permutation hashing: el hash elige la casilla y el resto es el valor
+        casilla = (h % np.uint64(NUM_HASHES)).astype(np.int64)
+        valor = (h >> np.uint64(32)).astype(np.uint32)
+        np.minimum.at(firma, (texto, casilla), valor)
+    return densificar(firma), n_shingles
+
+
+def densificar(firma):
+    """Las casillas vacías toman el valor de la siguiente ocupada (en círculo) más un corrimiento.
+
+    Sin esto dos textos cortos coincidirían en las casillas que ninguno de los dos llenó.
+    """
+    n, m = firma.shape
+    doble = np.concatenate([firma, firma], axis=1)
+    columna = np.where(doble != _VACIO, np.arange(2 * m), 2 * m)
+    siguiente = np.minimum.accumulate(columna[:, ::-1], axis=1)[:, ::-1][:, :m]
+    llena = siguiente < 2 * m
+    fila = np.arange(n)[:, None]
+    distancia = (siguiente - np.arange(m)).astype(np.uint32)
+    densa = np.where(llena, doble[fila, np.minimum(siguiente, 2 * m - 1)] + distancia * np.uint32(0x27D4EB2F), _VACIO)
+    return densa.astype(np.uint32)
+
+# ============================================
+# LSH
+# ============================================
+
+def _clave_banda(firma, banda):
+    clave = np.full(len(firma), banda, dtype=np.uint64)
+    for j in range(banda * FILAS, (banda + 1) * FILAS):
+        clave = _mezclar(clave * _MEZCLA + firma[:, j].astype(np.uint64))
+    return clave
+
+
+def pares_candidatos(firma, validas):
+    """(a, b) únicos: b cayó en el mismo balde que a en alguna banda y a es el primero del balde."""
+    posiciones_validas = np.flatnonzero(validas)
+    partes = []
+    for banda in range(BANDAS if len(posiciones_validas) else 0):
+        clave = _clave_banda(firma[posiciones_validas], banda)
+        orden = np.argsort(clave, kind="stable")
+        clave = clave[orden]
+        nuevo_balde = np.concatenate(([True], clave[1:] != clave[:-1]))
+        primero = orden[np.flatnonzero(nuevo_balde)[np.cumsum(nuevo_balde) - 1]]
+        repetido = ~nuevo_balde
+        partes.append(posiciones_validas[primero[repetido]] * len(firma) + posiciones_validas[orden[repetido]])
+    if not partes:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    pares = np.unique(np.concatenate(partes))
+    return pares // len(firma), pares % len(firma)
+
+
+def similitud(firma, a, b):
+    """Jaccard estimada de cada par: fracción de casillas iguales en las firmas."""
+    resultado = np.empty(len(a), dtype=np.float32)
+    for inicio in range(0, len(a), PARES_POR_COMPARACION):
+        tramo = slice(inicio, inicio + PARES_POR_COMPARACION)
+        resultado[tramo] = (firma[a[tramo]] == firma[b[tramo]]).mean(axis=1)
+    return resultado
+
+
+def agrupar(firma, validas, umbral=UMBRAL):
+    """Etiqueta (posición más chica del grupo) de cada firma; las que no tienen pares quedan solas."""
+    a, b = pares_candidatos(firma, validas)
+    queda = similitud(firma, a, b) >= umbral
+    return componentes(a[queda], b[queda], len(firma))
+
+# ============================================
+# ESTADO E INCREMENTAL
+# ============================================
+
+def cargar_estado(path=ESTADO_PATH):
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as f:
+        return {k: f[k] for k in f.files}
+
+
+def guardar_estado(estado, path=ESTADO_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(path, **estado)
+    return path
+
+
+def huellas(df, almacen=None):
+    """Hash de lo que entra en la firma de cada norma; cambia si cambia el texto o la ficha.
+
+    De la ficha entra el crc32 guardado en el almacén (solo se lee la cabecera): una ficha que
+    llega o se vuelve a scrapear con otro contenido cambia la huella.
+    """
+    columnas = [c for c in COLUMNAS_TEXTO if c in df.columns]
+    huella = pd.util.hash_pandas_object(df[columnas], index=False).to_numpy()
+    if almacen is not None:
+        con_ficha = almacen.ids("json")
+        # el bit 32 distingue "hay ficha con crc 0" de "no hay ficha"
+        fichas = np.fromiter(
+            ((almacen.crc("json", i) | 1 << 32) if i in con_ficha else 0 for i in df["id_norma"].astype(str)),
+            dtype=np.uint64, count=len(df),
+        )
+        huella = huella ^ (fichas * _MEZCLA)
+    return huella
+
+
+def calcular(df, almacen=None, previo=None):
+    """Grupos de casi duplicados de las normas de df. Devuelve (DataFrame con COLUMNAS, estado).
+
+    Con `previo` se reusan las firmas de las normas cuya huella no cambió.
+    """
+    df = df.dropna(subset=["id_norma"]).drop_duplicates("id_norma").sort_values("id_norma", ignore_index=True)
+    ids = df["id_norma"].to_numpy("int64")
+    huella = huellas(df, almacen)
+
+    firma = np.full((len(ids), NUM_HASHES), _VACIO, dtype=np.uint32)
+    n_shingles = np.zeros(len(ids), dtype=np.int64)
+    rehacer = np.ones(len(ids), dtype=bool)
+    if previo is not None and len(previo["ids"]):
+        pos = posiciones(previo["ids"], ids)
+        reusa = pos >= 0
+        reusa[reusa] = previo["huellas"][pos[reusa]] == huella[reusa]
+        firma[reusa] = previo["firmas"][pos[reusa]]
+        n_shingles[reusa] = previo["shingles"][pos[reusa]]
+        rehacer = ~reusa
+
+    a_firmar = np.flatnonzero(rehacer)
+    print(f"📌 Firmas: {len(a_firmar):,} nuevas o cambiadas, {len(ids) - len(a_firmar):,} reusadas")
+    for inicio in range(0, len(a_firmar), LOTE):
+        lote = a_firmar[inicio:inicio + LOTE]
+        sub = df.iloc[lote]
+        textos = normalizar(textos_normas(sub, almacen, set(ids[lote].tolist()))).tolist()
+        firma[lote], n_shingles[lote] = firmas(textos)
+
+    etiqueta = agrupar(firma, n_shingles >= MIN_SHINGLES)
+    tamano = np.bincount(etiqueta, minlength=len(ids))[etiqueta]
+    grupo = pd.array(ids[etiqueta], dtype="Int32")
+    tamano_grupo = pd.array(tamano, dtype="Int32")
+    grupo[tamano <= 1] = tamano_grupo[tamano <= 1] = pd.NA
+    df_grupos = pd.DataFrame({
+        "id_norma": df["id_norma"].to_numpy(),
+        "grupo_duplicados": grupo,
+        "tamano_grupo_duplicados": tamano_grupo,
+    })
+    estado = {"ids": ids, "huellas": huella, "firmas": firma, "shingles": n_shingles}
+    return df_grupos, estado
+
+
+def unir_a_normas(df_normas, df_grupos):
+    df_normas = df_normas.drop(columns=[c for c in COLUMNAS if c in df_normas.columns])
+    return df_normas.merge(df_grupos, on="id_norma", how="left")
+
+
+def actualizar_normas(normas_path, almacen=None, estado_path=ESTADO_PATH, df_normas=None):
+    """Calcula los grupos (reusando las firmas del estado previo) y los escribe en digesto_normas."""
+    if df_normas is None:
+        df_normas = leer_normas(normas_path)
+    df_grupos, estado = calcular(df_normas, almacen, cargar_estado(estado_path))
+    df_normas = unir_a_normas(df_normas, df_grupos)
+    escribir_normas(df_normas, normas_path)
+    guardar_estado(estado, estado_path)
+    en_grupo = df_grupos["grupo_duplicados"].notna()
+    print(f"✔ Casi duplicados: {en_grupo.sum():,} normas en {df_grupos.loc[en_grupo, 'grupo_duplicados'].nunique():,} grupos")
+    return df_normas
+
+# ============================================
+# PRINCIPAL
+# ============================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--normas", default="data_procesada/digesto_normas.csv")
+    parser.add_argument("--estado", default=ESTADO_PATH)
+    parser.add_argument("--sin-fichas", action="store_true", help="firmar solo con las columnas del CSV")
+    parser.add_argument("--grupo", type=int, help="mostrar las normas del grupo de esta norma (sin recalcular)")
+    args = parser.parse_args()
+
+    if args.grupo is not None:
+        df = leer_normas(args.normas, columnas=["id_norma", "tipo_norma", "numero_norma", "titulo_sumario"] + COLUMNAS)
+        grupo = df.loc[df["id_norma"] == args.grupo, "grupo_duplicados"]
+        if grupo.empty or grupo.isna().all():
+            print(f"La norma {args.grupo} no tiene casi duplicados.")
+        else:
+            print(df[df["grupo_duplicados"] == grupo.iloc[0]].to_string(index=False))
+    else:
+        almacen = None
+        if not args.sin_fichas:
+            from almacen_fichas import AlmacenFichas, ALMACEN_DIR
+            almacen = AlmacenFichas() if os.path.isdir(ALMACEN_DIR) else None
+        actualizar_normas(args.normas, almacen, args.estado)
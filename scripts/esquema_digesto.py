@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+import os
+import csv
+
+# pandas se importa adentro de cada función: el servicio y las consultas usan las constantes
+# del esquema y no tienen por qué pagar los ~0,4 s que tarda en cargar
+
+# ============================================
+# ESQUEMA
+# ============================================
+
+# Tipos de las tablas del digesto. Los CSV siguen siendo texto (Excel, Dropbox),
+# pero en memoria cada columna va con el tipo más chico que le sirve:
+#   id          -> Int32 (los id de Infoleg no llegan al millón)
+#   categoria   -> category (pocos valores distintos repetidos en cientos de miles de filas)
+#   fecha       -> datetime64
+#   bool        -> bool
+#   entero      -> Int32 (conteos)
+#   numero      -> float64
+#   texto       -> se deja como str
+
+NORMAS = {
+    "id_norma": "id",
+    "tipo_norma": "categoria",
+    "numero_norma": "texto",
+    "fecha_sancion": "fecha",
+    "organismo": "categoria",
+    "titulo_resumido": "texto",
+    "titulo_sumario": "texto",
+    "fecha_publicacion": "fecha",
+    "estado": "categoria",
+    "fuente": "categoria",
+    "url_texto_original": "texto",
+    "url_texto_actualizado": "texto",
+    "url_infoleg_ficha": "texto",
+    "path_ficha_html": "texto",
+    "path_ficha_json": "texto",
+    "ficha_descargada": "bool",
+    "ficha_parseada": "bool",
+    "tiene_texto_original": "bool",
+    "tiene_resumen": "bool",
+    "texto_original_alternativo": "texto",
+    "resumen_infoleg": "texto",
+    # analítica de la telaraña (analitica_grafo.py)
+    "pagerank": "numero",
+    "componente": "id",
+    "tamano_componente": "entero",
+    "grado_entrada": "entero",
+    "grado_salida": "entero",
+    "veces_modificada": "entero",
+    "veces_complementada": "entero",
+    "veces_reglamentada": "entero",
+    "veces_citada": "entero",
+    "veces_mencionada": "entero",
+    # casi duplicados (duplicados.py)
+    "grupo_duplicados": "id",
+    "tamano_grupo_duplicados": "entero",
+}
+
+RELACIONES = {
+    "id_origen": "id",
+    "id_destino": "id",
+    "tipo_relacion": "categoria",
+    "fuente": "categoria",
+}
+
+FORMATO_FECHA = "%Y-%m-%d"
+
+# ============================================
+# COLUMNAS DERIVADAS
+# ============================================
+
+# Columnas que son función pura de id_norma: se calculan vectorizadas cuando hacen falta.
+# Con DIGESTO_DERIVADAS=virtual no se guardan en el CSV y leer_normas las reconstruye.
+
+URL_VER_NORMA = "https://servicios.infoleg.gob.ar/infolegInternet/verNorma.do?id="
+
+GUARDAR_DERIVADAS = os.environ.get("DIGESTO_DERIVADAS", "guardar") != "virtual"
+
+
+DERIVADAS = {
+    # columna: (prefijo, sufijo) alrededor de id_norma
+    "url_infoleg_ficha": (URL_VER_NORMA, ""),
+    "path_ficha_html": ("/fichas_html/", ".html"),
+    "path_ficha_json": ("/fichas_json/", ".json"),
+    "texto_original_alternativo": (URL_VER_NORMA, ""),
+}
+
+
+def derivar(df, columnas=None):
+    """Agrega las columnas derivadas que falten (todas, o solo las de `columnas`).
+
+    El id se pasa a texto una sola vez y cada columna es una concatenación vectorizada;
+    NA en id_norma da NA.
+    """
+    faltan = [c for c in DERIVADAS if c not in df.columns and (columnas is None or c in columnas)]
+    if not faltan:
+        return df
+    valido = df["id_norma"].notna()
+    texto_id = df["id_norma"].astype(str).astype(object)
+    for col in faltan:
+        prefijo, sufijo = DERIVADAS[col]
+        df[col] = (prefijo + texto_id + sufijo).where(valido)
+    return df
+
+
+def ordenar(df, esquema):
+    """Columnas en el orden del esquema; las que no figuran van al final."""
+    return df[[c for c in esquema if c in df.columns] + [c for c in df.columns if c not in esquema]]
+
+# ============================================
+# CONVERSIONES
+# ============================================
+
+def a_id(serie):
+    """Normaliza ids ("594", "594.0", " 594 ", 594.0, NaN) a Int32; lo que no es un entero queda NA."""
+    import pandas as pd
+    if pd.api.types.is_integer_dtype(serie):
+        return serie.astype("Int32")
+    numero = pd.to_numeric(serie, errors="coerce")
+    numero = numero.where((numero % 1 == 0) & numero.between(0, 2**31 - 1))
+    return numero.astype("Int32")
+
+
+def a_bool(serie):
+    if serie.dtype == bool:
+        return serie
+    return serie.astype("string").str.strip().str.lower().isin(["true", "1"]).astype(bool)
+
+
+def tipar(df, esquema):
+    """Aplica el esquema a las columnas presentes (las que no figuran quedan como están)."""
+    import pandas as pd
+    for col, tipo in esquema.items():
+        if col not in df.columns:
+            continue
+        if tipo in ("id", "entero"):
+            df[col] = a_id(df[col])
+        elif tipo == "numero":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+        elif tipo == "categoria":
+            df[col] = df[col].astype("category")
+        elif tipo == "fecha":
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        elif tipo == "bool":
+            df[col] = a_bool(df[col])
+    return df
+
+
+def ids_enteros(ids):
+    """Conjunto de ids (por ejemplo nombres de archivo sin extensión) como enteros, para usar con isin."""
+    import pandas as pd
+    return a_id(pd.Series(list(ids), dtype="string")).dropna().unique()
+
+# ============================================
+# LECTURA / ESCRITURA
+# ============================================
+
+def _dtypes_lectura(esquema, columnas):
+    # categorías directo desde el parser; ids y números los infiere el parser (int/float si están
+    # limpios, sin pasar por un str por fila) y el resto se lee como texto
+    tipos = {}
+    for c in columnas:
+        if esquema.get(c) == "categoria":
+            tipos[c] = "category"
+        elif esquema.get(c) not in ("id", "entero", "numero"):
+            tipos[c] = str
+    return tipos
+
+
+def leer_tabla(path, esquema, columnas=None):
+    import pandas as pd
+    columnas = columnas or list(pd.read_csv(path, nrows=0).columns)
+    df = pd.read_csv(path, usecols=columnas, dtype=_dtypes_lectura(esquema, columnas), low_memory=False)
+    return tipar(df, esquema)
+
+
+def leer_normas(path, columnas=None):
+    """Como leer_tabla, pero las columnas derivadas que no estén en el CSV se calculan al leer."""
+    import pandas as pd
+    en_archivo = list(pd.read_csv(path, nrows=0).columns)
+    pedidas = columnas or list(ordenar(pd.DataFrame(columns=en_archivo + list(DERIVADAS)), NORMAS).columns.unique())
+    a_leer = [c for c in pedidas if c in en_archivo]
+    if any(c in DERIVADAS and c not in en_archivo for c in pedidas) and "id_norma" not in a_leer:
+        a_leer.append("id_norma")
+    df = derivar(leer_tabla(path, NORMAS, a_leer), pedidas)
+    return ordenar(df, NORMAS)[pedidas]
+
+
+def leer_relaciones(path, columnas=None):
+    return leer_tabla(path, RELACIONES, columnas)
+
+
+def escribir_normas(df, destino, encabezado=True, derivadas=GUARDAR_DERIVADAS):
+    """`destino` puede ser un path o un archivo ya abierto (para ir agregando bloques)."""
+    if derivadas:
+        df = derivar(df.copy())
+    else:
+        df = df.drop(columns=[c for c in DERIVADAS if c in df.columns])
+    # QUOTE_ALL para que Excel no corte las URLs
+    ordenar(df, NORMAS).to_csv(
+        destino,
+        index=False,
+        header=encabezado,
+        encoding="utf-8-sig",
+        quoting=csv.QUOTE_ALL,
+        escapechar="\\",
+        date_format=FORMATO_FECHA
+    )
+
+
+def escribir_relaciones(df, destino, encabezado=True, **kwargs):
+    kwargs.setdefault("encoding", "utf-8-sig")
+    kwargs.setdefault("quoting", csv.QUOTE_ALL)
+    df.to_csv(destino, index=False, header=encabezado, **kwargs)
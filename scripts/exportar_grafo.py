@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+"""Exporta la telaraña jurídica en formatos binarios/compactos para análisis.
+
+Todos salen del mismo DataFrame de aristas (id_origen, id_destino, tipo_relacion, fuente)
+que arma construir_telaraña.py:
+
+    aristas.parquet     lista de aristas tipada (ids Int32, categorías)           [pyarrow]
+    grafo_csr.npz       matriz de adyacencia CSR en arrays de NumPy + mapa de nodos
+    grafo.graphml.gz    GraphML dirigido (Gephi, networkx, igraph)
+    aristas.tsv.gz      lista de aristas "origen destino tipo fuente" (networkx.read_edgelist)
+
+Uso:
+    python scripts/exportar_grafo.py --entrada data_procesada/digesto_relaciones_expandido.csv
+"""
+
+import os
+import sys
+import gzip
+import argparse
+from xml.sax.saxutils import escape
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from esquema_digesto import leer_relaciones
+
+# ============================================
+# CONFIG
+# ============================================
+
+GRAFO_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "data_procesada",
+    "grafo"
+)
+DROPBOX_GRAFO_FOLDER = "/data_procesada/grafo"
+
+FORMATOS = ("parquet", "npz", "graphml", "aristas")
+
+COMPRESION_GZIP = 3            # ~20% más grande que el nivel por defecto, pero la mitad de tiempo
+FILAS_POR_ESCRITURA = 100000   # GraphML y TSV se escriben de a bloques, sin armar todo el texto en memoria
+
+# ============================================
+# NODOS
+# ============================================
+
+def etiquetas(serie, transformar=str):
+    """Valores de una columna categórica como array de str, transformando cada categoría una sola vez."""
+    nombres = np.array([transformar(c) for c in serie.cat.categories] + [""], dtype=object)
+    return nombres[serie.cat.codes.to_numpy()]   # el código -1 (NA) cae en el "" del final
+
+
+def indexar_nodos(df):
+    """ids de nodo ordenados y posiciones (0..n-1) de origen y destino de cada arista."""
+    origen = df["id_origen"].to_numpy("int64")
+    destino = df["id_destino"].to_numpy("int64")
+    nodos = np.unique(np.concatenate([origen, destino]))
+    return nodos, np.searchsorted(nodos, origen), np.searchsorted(nodos, destino)
+
+# ============================================
+# EXPORTADORES
+# ============================================
+
+def exportar_parquet(df, path):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("⚠️ pyarrow no está instalado: se omite aristas.parquet")
+        return None
+    df.to_parquet(path, index=False, compression="zstd")
+    return path
+
+
+def armar_csr(df, invertir=False):
+    """CSR por origen (o por destino con `invertir`): los vecinos del nodo i son indices[indptr[i]:indptr[i+1]].
+
+    Los nodos son posiciones en `nodos` (ids de norma ordenados); tipo y fuente van como
+    códigos alineados con `indices`, con sus nombres en `tipos` y `fuentes`.
+    """
+    import pandas as pd
+
+    if "fuente" not in df.columns:   # digesto_relaciones oficial no la trae
+        df = df.assign(fuente=pd.Categorical(["infoleg_csv"] * len(df)))
+    nodos, origen, destino = indexar_nodos(df)
+    if invertir:
+        origen, destino = destino, origen
+    orden = np.lexsort((destino, origen))
+    indptr = np.zeros(len(nodos) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(origen, minlength=len(nodos)), out=indptr[1:])
+    return {
+        "nodos": nodos.astype(np.int32),
+        "indptr": indptr,
+        "indices": destino[orden].astype(np.int32),
+        "tipo": df["tipo_relacion"].cat.codes.to_numpy()[orden].astype(np.int16),
+        "fuente": df["fuente"].cat.codes.to_numpy()[orden].astype(np.int16),
+        "tipos": np.array(df["tipo_relacion"].cat.categories, dtype=str),
+        "fuentes": np.array(df["fuente"].cat.categories, dtype=str),
+    }
+
+
+def exportar_csr(df, path):
+    np.savez_compressed(path, **armar_csr(df))
+    return path
+
+
+def cargar_csr(path):
+    """Lee grafo_csr.npz; con scipy instalado agrega "matriz" (scipy.sparse.csr_matrix)."""
+    with np.load(path) as f:
+        grafo = {k: f[k] for k in f.files}
+    try:
+        from scipy.sparse import csr_matrix
+    except ImportError:
+        return grafo
+    n = len(grafo["nodos"])
+    datos = np.ones(len(grafo["indices"]), dtype=np.int8)
+    grafo["matriz"] = csr_matrix((datos, grafo["indices"], grafo["indptr"]), shape=(n, n))
+    return grafo
+
+
+def _escribir_por_bloques(f, n, renglones):
+    for inicio in range(0, n, FILAS_POR_ESCRITURA):
+        f.write("".join(renglones(slice(inicio, inicio + FILAS_POR_ESCRITURA))))
+
+
+def exportar_graphml(df, path):
+    nodos, _, _ = indexar_nodos(df)
+    origen = df["id_origen"].to_numpy("int64")
+    destino = df["id_destino"].to_numpy("int64")
+    tipo = etiquetas(df["tipo_relacion"], escape)
+    fuente = etiquetas(df["fuente"], escape)
+
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=COMPRESION_GZIP) as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+        f.write('  <key id="tipo" for="edge" attr.name="tipo_relacion" attr.type="string"/>\n')
+        f.write('  <key id="fuente" for="edge" attr.name="fuente" attr.type="string"/>\n')
+        f.write('  <graph id="digesto" edgedefault="directed">\n')
+        _escribir_por_bloques(f, len(nodos), lambda s: (f'    <node id="{n}"/>\n' for n in nodos[s]))
+        _escribir_por_bloques(f, len(df), lambda s: (
+            f'    <edge source="{o}" target="{d}"><data key="tipo">{t}</data><data key="fuente">{fu}</data></edge>\n'
+            for o, d, t, fu in zip(origen[s], destino[s], tipo[s], fuente[s])
+        ))
+        f.write("  </graph>\n</graphml>\n")
+    return path
+
+
+def exportar_lista_aristas(df, path):
+    origen = df["id_origen"].to_numpy("int64")
+    destino = df["id_destino"].to_numpy("int64")
+    tipo = etiquetas(df["tipo_relacion"])
+    fuente = etiquetas(df["fuente"])
+
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=COMPRESION_GZIP) as f:
+        _escribir_por_bloques(f, len(df), lambda s: (
+            f"{o}\t{d}\t{t}\t{fu}\n" for o, d, t, fu in zip(origen[s], destino[s], tipo[s], fuente[s])
+        ))
+    return path
+
+
+EXPORTADORES = {
+    "parquet": ("aristas.parquet", exportar_parquet),
+    "npz": ("grafo_csr.npz", exportar_csr),
+    "graphml": ("grafo.graphml.gz", exportar_graphml),
+    "aristas": ("aristas.tsv.gz", exportar_lista_aristas),
+}
+
+
+def exportar(df, carpeta=GRAFO_DIR, formatos=FORMATOS):
+    """Genera los formatos pedidos en `carpeta` y devuelve los paths escritos.
+
+    `df` son las aristas ya tipadas y sin ids nulos (la salida de construir_telarana).
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    generados = []
+    for formato in formatos:
+        nombre, exportador = EXPORTADORES[formato]
+        path = exportador(df, os.path.join(carpeta, nombre))
+        if path:
+            print(f"✔ {formato}: {path} ({os.path.getsize(path) / 2**20:.1f} MB)")
+            generados.append(path)
+    return generados
+
+# ============================================
+# PRINCIPAL
+# ============================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entrada", default="data_procesada/digesto_relaciones_expandido.csv")
+    parser.add_argument("--salida", default=GRAFO_DIR)
+    parser.add_argument("--formatos", default=",".join(FORMATOS), help="separados por coma")
+    args = parser.parse_args()
+
+    df = leer_relaciones(args.entrada).dropna(subset=["id_origen", "id_destino"])
+    exportar(df, args.salida, [f.strip() for f in args.formatos.split(",") if f.strip()])
@@ -0,0 +1,465 @@
+# -*- coding: utf-8 -*-
+
+"""Índice invertido BM25 sobre el digesto, guardado como arrays de NumPy que se abren con mmap.
+
+Un índice es una carpeta con:
+
+    terminos.npy    vocabulario ordenado (para buscar cada término con searchsorted)
+    indptr.npy      las apariciones del término t son [indptr[t], indptr[t+1])
+    docs.npy        posición del documento de cada aparición
+    tf.npy          frecuencia del término en ese documento
+    largos.npy      cantidad de términos de cada documento
+    ids.npy         id de cada documento (id_norma)
+    meta.json       parámetros de BM25 y cantidad de documentos
+
+El índice de los textos completos (textos_normas.py) crece de a tandas: cada tanda es un
+segmento seg-NNNNNN/ con ese mismo formato, y IndiceSegmentado los consulta juntos.
+
+Uso:
+    python scripts/indice_busqueda.py construir
+    python scripts/indice_busqueda.py buscar "impuesto a las ganancias"
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+import numpy as np
+
+# ============================================
+# CONFIG
+# ============================================
+
+INDICE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "data_procesada",
+    "indice_bm25"
+)
+TEXTOS_DIR = os.path.join(os.path.dirname(INDICE_DIR), "indice_textos")
+
+K1 = 1.2
+B = 0.75
+LARGO_MAX_TERMINO = 30          # tokens más largos son basura de OCR/URLs y agrandan el dtype del vocabulario
+LOTE_DOCUMENTOS = 20000         # documentos por tokenización en lote
+SEPARADOR = "qqseparadorqq"     # marca el fin de cada documento dentro del lote unido
+
+# columnas de digesto_normas que forman el documento de cada norma
+COLUMNAS_TEXTO = ["tipo_norma", "numero_norma", "titulo_resumido", "titulo_sumario", "resumen_infoleg"]
+
+STOPWORDS = frozenset("""
+a al ante bajo con contra de del desde el en entre es la las le les lo los mediante para por que
+se sin sobre su sus un una uno y o u e ni ya como mas pero este esta estos estas ese esa dicho
+dicha articulo art inciso
+""".split())
+
+_SIN_TILDES = str.maketrans("áéíóúüàèìòùâêîôûñ", "aeiouuaeiouaeioun")
+_TOKEN = re.compile(r"\w+")
+_PUNTO_MILES = re.compile(r"(?<=\d)\.(?=\d{3}(?!\d))")   # "27.430" -> "27430", como se lo busca
+
+# ============================================
+# TEXTO
+# ============================================
+
+def tokenizar(texto):
+    """Minúsculas, sin tildes, sin stopwords ni tokens de una letra; los números quedan ("27430")."""
+    if not texto:
+        return []
+    return [
+        t for t in _TOKEN.findall(_PUNTO_MILES.sub("", texto).lower().translate(_SIN_TILDES))
+        if 1 < len(t) <= LARGO_MAX_TERMINO and t not in STOPWORDS
+    ]
+
+
+def tokenizar_lote(textos):
+    """Como tokenizar, pero para muchos textos de una vez: (documento de cada token, términos, vocabulario).
+
+    Se pasa una sola regex sobre el lote unido con un separador, y tildes, largo y stopwords se
+    resuelven sobre los tokens distintos (unas decenas de miles) en vez de sobre cada aparición.
+    """
+    import pandas as pd   # solo para construir: las consultas no lo cargan
+    unido = _PUNTO_MILES.sub("", f" {SEPARADOR} ".join(t or "" for t in textos)).lower()
+    codigos, distintos = pd.factorize(pd.Series(_TOKEN.findall(unido), dtype=object))
+    plegados = pd.Series(np.asarray(distintos, dtype=object)).str.translate(_SIN_TILDES)
+    largo = plegados.str.len()
+    valido = ((largo > 1) & (largo <= LARGO_MAX_TERMINO) & ~plegados.isin(STOPWORDS)).to_numpy()
+
+    separador = np.asarray(distintos == SEPARADOR)
+    valido &= ~separador
+    doc = np.cumsum(separador[codigos])
+    # los distintos que solo difieren en tildes ("articulo"/"artículo") pasan a ser un mismo término
+    terminos, vocabulario = pd.factorize(plegados.where(valido))
+    queda = valido[codigos]
+    return doc[queda], terminos[codigos[queda]], np.asarray(vocabulario, dtype=object)
+
+
+def documentos_normas(df):
+    """(id_norma, texto) por norma, uniendo COLUMNAS_TEXTO."""
+    columnas = [c for c in COLUMNAS_TEXTO if c in df.columns]
+    texto = df[columnas[0]].astype(object).fillna("").astype(str)
+    for col in columnas[1:]:
+        texto = texto + " " + df[col].astype(object).fillna("").astype(str)
+    return zip(df["id_norma"].to_numpy("int64"), texto.to_numpy())
+
+# ============================================
+# CONSTRUCCIÓN
+# ============================================
+
+def _lotes(iterable, tamano):
+    lote = []
+    for x in iterable:
+        lote.append(x)
+        if len(lote) == tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def construir(documentos, lote=LOTE_DOCUMENTOS):
+    """Arma el índice en memoria a partir de (id, texto); devuelve el dict de arrays.
+
+    Los textos se tokenizan de a `lote` documentos: en memoria quedan solo los términos como
+    enteros, no los textos.
+    """
+    vocabulario = {}
+    ids, partes_doc, partes_termino, partes_largo = [], [], [], []
+    for docs_lote in _lotes(documentos, lote):
+        doc, termino, palabras = tokenizar_lote([texto for _, texto in docs_lote])
+        global_ = np.array([vocabulario.setdefault(p, len(vocabulario)) for p in palabras], dtype=np.int64)
+        partes_doc.append(doc + len(ids))
+        partes_termino.append(global_[termino])
+        partes_largo.append(np.bincount(doc, minlength=len(docs_lote)))
+        ids.extend(id_doc for id_doc, _ in docs_lote)
+    n_docs = max(len(ids), 1)
+
+    # el vocabulario se renumera en orden alfabético para poder buscarlo con searchsorted
+    palabras = np.array(list(vocabulario), dtype=f"<U{LARGO_MAX_TERMINO}")
+    orden = np.argsort(palabras, kind="stable")
+    rango = np.empty(len(orden), dtype=np.int64)
+    rango[orden] = np.arange(len(orden))
+
+    termino = rango[np.concatenate(partes_termino)] if partes_termino else np.zeros(0, np.int64)
+    doc = np.concatenate(partes_doc) if partes_doc else np.zeros(0, np.int64)
+
+    # (término, documento) únicos con su cuenta: una clave int64 y un sort
+    clave = np.sort(termino * n_docs + doc)
+    corte = np.flatnonzero(np.concatenate(([True], clave[1:] != clave[:-1]))) if len(clave) else np.zeros(0, np.int64)
+    tf = np.diff(np.append(corte, len(clave)))
+    clave = clave[corte]
+
+    indptr = np.zeros(len(palabras) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(clave // n_docs, minlength=len(palabras)), out=indptr[1:])
+    return {
+        "terminos": palabras[orden],
+        "indptr": indptr,
+        "docs": (clave % n_docs).astype(np.int32),
+        "tf": np.minimum(tf, np.iinfo(np.uint16).max).astype(np.uint16),
+        "largos": (np.concatenate(partes_largo) if partes_largo else np.zeros(0)).astype(np.uint32),
+        "ids": np.array(ids, dtype=np.int64),
+    }
+
+
+def guardar(indice, directorio=INDICE_DIR, meta=None):
+    """Escribe el índice en una carpeta temporal y la pone en su lugar con un rename.
+
+    `meta` agrega claves a meta.json; los arrays de más en `indice` (alineados con ids) se
+    guardan igual y quedan en IndiceBM25.extras.
+    """
+    tmp = directorio.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for nombre, array in indice.items():
+        np.save(os.path.join(tmp, f"{nombre}.npy"), array)
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({**(meta or {}), "k1": K1, "b": B, "documentos": int(len(indice["ids"]))}, f)
+    viejo = directorio.rstrip(os.sep) + ".viejo"
+    shutil.rmtree(viejo, ignore_errors=True)
+    if os.path.exists(directorio):
+        os.rename(directorio, viejo)
+    os.rename(tmp, directorio)
+    shutil.rmtree(viejo, ignore_errors=True)
+    return directorio
+
+# ============================================
+# BÚSQUEDA
+# ============================================
+
+def _mejores(puntaje, k):
+    """Posiciones de los k puntajes positivos más altos, de mayor a menor."""
+    k = min(k, int((puntaje > 0).sum()))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    mejores = np.argpartition(-puntaje, k - 1)[:k]
+    return mejores[np.argsort(-puntaje[mejores], kind="stable")]
+
+
+def _idf(n_docs, df):
+    return np.log1p((n_docs - df + 0.5) / (df + 0.5))
+
+
+ARRAYS = ("terminos", "indptr", "docs", "tf", "largos", "ids")
+
+
+class IndiceBM25:
+    """Índice abierto con mmap: cargarlo no lee los arrays, solo las páginas que toca cada consulta."""
+
+    def __init__(self, directorio=INDICE_DIR, mmap=True):
+        modo = "r" if mmap else None
+        for nombre in ARRAYS:
+            setattr(self, nombre, np.load(os.path.join(directorio, f"{nombre}.npy"), mmap_mode=modo))
+        self.extras = {
+            nombre[:-4]: np.load(os.path.join(directorio, nombre), mmap_mode=modo)
+            for nombre in sorted(os.listdir(directorio))
+            if nombre.endswith(".npy") and nombre[:-4] not in ARRAYS
+        }
+        with open(os.path.join(directorio, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.k1, self.b = self.meta["k1"], self.meta["b"]
+        self.n_docs = len(self.ids)
+        self.ajustar(float(self.largos.mean()) if self.n_docs else 1.0)
+
+    def ajustar(self, largo_medio):
+        # parte de la normalización de BM25 que depende solo del documento
+        self.norma_largo = (self.k1 * (1 - self.b + self.b * self.largos / max(largo_medio, 1.0))).astype(np.float32)
+
+    def _termino(self, palabra):
+        i = np.searchsorted(self.terminos, palabra)
+        return i if i < len(self.terminos) and self.terminos[i] == palabra else None
+
+    def apariciones(self, palabra):
+        """(docs, tf) del término; vacíos si no está en el vocabulario."""
+        t = self._termino(palabra)
+        if t is None:
+            return self.docs[:0], self.tf[:0]
+        inicio, fin = self.indptr[t], self.indptr[t + 1]
+        return self.docs[inicio:fin], self.tf[inicio:fin]
+
+    def acumular(self, puntaje, docs, tf, idf):
+        tf = tf.astype(np.float32)
+        puntaje[docs] += idf * tf * (self.k1 + 1) / (tf + self.norma_largo[docs])
+
+    def puntajes(self, consulta):
+        """Puntaje BM25 de cada documento (array denso) para el texto de la consulta."""
+        puntaje = np.zeros(self.n_docs, dtype=np.float32)
+        for palabra in set(tokenizar(consulta)):
+            docs, tf = self.apariciones(palabra)
+            if len(docs):
+                self.acumular(puntaje, docs, tf, _idf(self.n_docs, len(docs)))
+        return puntaje
+
+    def buscar(self, consulta, k=10):
+        """Los k mejores documentos: lista de (id, puntaje), de mayor a menor."""
+        puntaje = self.puntajes(consulta)
+        return [(int(self.ids[i]), float(puntaje[i])) for i in _mejores(puntaje, k)]
+
+# ============================================
+# ÍNDICE POR SEGMENTOS (incremental)
+# ============================================
+
+SEGMENTOS_MAX = 8               # al superarlo, agregar_segmento compacta todo en uno
+_SEGMENTO = re.compile(r"^seg-(\d{6})$")
+
+
+def segmentos(directorio):
+    """Números de los segmentos completos de un índice incremental, en orden de creación."""
+    if not os.path.isdir(directorio):
+        return []
+    return sorted(int(m.group(1)) for m in map(_SEGMENTO.match, os.listdir(directorio)) if m)
+
+
+def ruta_segmento(directorio, numero):
+    return os.path.join(directorio, f"seg-{numero:06d}")
+
+
+def agregar_segmento(directorio, documentos, lote=LOTE_DOCUMENTOS, segmentos_max=SEGMENTOS_MAX,
+                     extras=None, meta=None):
+    """Indexa (id, texto) en un segmento nuevo; si el id ya estaba en otro segmento, vale el nuevo.
+
+    Con meta={"bits_grupo": n} lo que se reemplaza es el grupo entero (id >> n): así una norma
+    re-indexada con menos pasajes no deja vivos los que sobraban. `extras` son arrays alineados
+    con los documentos que viajan con el segmento. Devuelve la ruta (None si no había documentos).
+    """
+    indice = construir(documentos, lote)
+    if not len(indice["ids"]):
+        return None
+    indice.update(extras or {})
+    numero = max(segmentos(directorio), default=0) + 1
+    os.makedirs(directorio, exist_ok=True)
+    ruta = guardar(indice, ruta_segmento(directorio, numero), meta)
+    if len(segmentos(directorio)) > segmentos_max:
+        ruta = compactar(directorio)
+    return ruta
+
+
+def compactar(directorio):
+    """Une todos los segmentos en uno nuevo dejando solo la versión vigente de cada id (o grupo).
+
+    El segmento unido se escribe antes de borrar los viejos: un lector que llegue en el medio ve
+    documentos repetidos, pero el segmento más nuevo les gana.
+    """
+    indice = IndiceSegmentado(directorio, mmap=True)
+    if len(indice.segmentos) < 2:
+        return indice.rutas[-1] if indice.rutas else None
+
+    terminos = np.unique(np.concatenate([seg.terminos for seg in indice.segmentos]))
+    partes_termino, partes_doc, partes_tf, ids, largos = [], [], [], [], []
+    n_docs = 0
+    for seg in indice.segmentos:
+        nuevo = np.cumsum(seg.vivo) - 1 + n_docs
+        termino = np.repeat(np.searchsorted(terminos, seg.terminos), np.diff(seg.indptr))
+        queda = seg.vivo[seg.docs]
+        partes_termino.append(termino[queda])
+        partes_doc.append(nuevo[seg.docs[queda]])
+        partes_tf.append(seg.tf[queda])
+        ids.append(seg.ids[seg.vivo])
+        largos.append(seg.largos[seg.vivo])
+        n_docs += int(seg.vivo.sum())
+
+    termino = np.concatenate(partes_termino)
+    doc = np.concatenate(partes_doc)
+    orden = np.lexsort((doc, termino))
+    indptr = np.zeros(len(terminos) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(termino, minlength=len(terminos)), out=indptr[1:])
+    unido = {
+        "terminos": terminos,
+        "indptr": indptr,
+        "docs": doc[orden].astype(np.int32),
+        "tf": np.concatenate(partes_tf)[orden],
+        "largos": np.concatenate(largos).astype(np.uint32),
+        "ids": np.concatenate(ids).astype(np.int64),
+    }
+    # los extras que tienen todos los segmentos se conservan; meta.json es la del más nuevo
+    for nombre in set.intersection(*(set(seg.extras) for seg in indice.segmentos)):
+        unido[nombre] = np.concatenate([seg.extras[nombre][seg.vivo] for seg in indice.segmentos])
+    meta = {c: v for c, v in indice.segmentos[-1].meta.items() if c not in ("k1", "b", "documentos")}
+    viejas = indice.rutas
+    del indice
+    ruta = guardar(unido, ruta_segmento(directorio, max(segmentos(directorio)) + 1), meta)
+    for vieja in viejas:
+        shutil.rmtree(vieja, ignore_errors=True)
+    return ruta
+
+
+class IndiceSegmentado:
+    """Los segmentos de un índice incremental puntuados como si fueran uno solo.
+
+    Cantidad de documentos, frecuencia de cada término y largo medio se calculan sobre los
+    documentos vigentes de todos los segmentos, así el puntaje no depende de cómo quedaron
+    repartidos.
+    """
+
+    def __init__(self, directorio, mmap=True):
+        self.rutas = [ruta_segmento(directorio, n) for n in segmentos(directorio)]
+        self.segmentos = [IndiceBM25(ruta, mmap) for ruta in self.rutas]
+        # un id (o grupo) re-indexado vive en el segmento más nuevo que lo tiene
+        vistos = np.zeros(0, dtype=np.int64)
+        for seg in reversed(self.segmentos):
+            grupos = seg.ids >> seg.meta.get("bits_grupo", 0)
+            seg.vivo = ~np.isin(grupos, vistos)
+            vistos = np.concatenate([vistos, grupos])
+        # los documentos vacíos (normas sin texto descargable) no cuentan para las estadísticas
+        self.n_docs = sum(int((seg.vivo & (seg.largos > 0)).sum()) for seg in self.segmentos)
+        largo_total = sum(float(seg.largos[seg.vivo].sum()) for seg in self.segmentos)
+        for seg in self.segmentos:
+            seg.ajustar(largo_total / max(self.n_docs, 1))
+
+    def ids(self):
+        """ids vigentes de todos los segmentos."""
+        if not self.segmentos:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([seg.ids[seg.vivo] for seg in self.segmentos])
+
+    def buscar_posiciones(self, consulta, k=10):
+        """Los k mejores documentos vigentes como (segmento, posición, puntaje), de mayor a menor."""
+        palabras = list(set(tokenizar(consulta)))
+        apariciones = [[seg.apariciones(p) for p in palabras] for seg in self.segmentos]
+        df = np.zeros(len(palabras))
+        for seg, por_palabra in zip(self.segmentos, apariciones):
+            for j, (docs, _) in enumerate(por_palabra):
+                df[j] += seg.vivo[docs].sum()
+
+        hits = []
+        for s, (seg, por_palabra) in enumerate(zip(self.segmentos, apariciones)):
+            puntaje = np.zeros(len(seg.ids), dtype=np.float32)
+            for j, (docs, tf) in enumerate(por_palabra):
+                if len(docs):
+                    seg.acumular(puntaje, docs, tf, _idf(self.n_docs, df[j]))
+            puntaje[~seg.vivo] = 0
+            hits += [(s, int(i), float(puntaje[i])) for i in _mejores(puntaje, k)]
+        return sorted(hits, key=lambda h: -h[2])[:k]
+
+    def buscar(self, consulta, k=10):
+        return [(int(self.segmentos[s].ids[i]), p) for s, i, p in self.buscar_posiciones(consulta, k)]
+
+
+def abrir(directorio, mmap=True):
+    """IndiceSegmentado si la carpeta tiene segmentos, si no IndiceBM25."""
+    return IndiceSegmentado(directorio, mmap) if segmentos(directorio) else IndiceBM25(directorio, mmap)
+
+# ============================================
+# BÚSQUEDA SEMÁNTICA (opcional)
+# ============================================
+
+MODELO_EMBEDDINGS = os.environ.get(
+    "DIGESTO_MODELO_EMBEDDINGS", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+)
+LOTE_EMBEDDINGS = 256
+FILAS_POR_PRODUCTO = 65536      # la matriz (mmap, float16) se multiplica de a tramos en float32
+
+
+def cargar_modelo(nombre=MODELO_EMBEDDINGS):
+    # sentence-transformers (y torch) tardan segundos en importar: solo si se usa
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(nombre)
+
+
+def calcular_embeddings(textos, modelo, lote=LOTE_EMBEDDINGS):
+    """Vectores normalizados en float16: la similitud coseno queda como producto punto."""
+    vectores = modelo.encode(list(textos), batch_size=lote, normalize_embeddings=True, convert_to_numpy=True)
+    return vectores.astype(np.float16)
+
+
+def buscar_semantico(matriz, vector, k=10):
+    """Las k filas de `matriz` más parecidas a `vector`: lista de (posición, similitud)."""
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    similitud = np.empty(len(matriz), dtype=np.float32)
+    for inicio in range(0, len(matriz), FILAS_POR_PRODUCTO):
+        tramo = np.asarray(matriz[inicio:inicio + FILAS_POR_PRODUCTO], dtype=np.float32)
+        similitud[inicio:inicio + len(tramo)] = tramo @ vector
+    k = min(k, len(similitud))
+    if k == 0:
+        return []
+    mejores = np.argpartition(-similitud, k - 1)[:k]
+    mejores = mejores[np.argsort(-similitud[mejores], kind="stable")]
+    return [(int(i), float(similitud[i])) for i in mejores]
+
+# ============================================
+# PRINCIPAL
+# ============================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p = sub.add_parser("construir")
+    p.add_argument("--normas", default="data_procesada/digesto_normas.csv")
+    p.add_argument("--salida", default=INDICE_DIR)
+    p = sub.add_parser("buscar")
+    p.add_argument("consulta")
+    p.add_argument("-k", type=int, default=10)
+    p.add_argument("--indice", default=INDICE_DIR)
+    args = parser.parse_args()
+
+    if args.comando == "construir":
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from esquema_digesto import leer_normas
+
+        df = leer_normas(args.normas, columnas=["id_norma"] + COLUMNAS_TEXTO).dropna(subset=["id_norma"])
+        indice = construir(documentos_normas(df))
+        guardar(indice, args.salida)
+        print(f"✔ Índice BM25: {len(indice['ids']):,} documentos, {len(indice['terminos']):,} términos -> {args.salida}")
+    else:
+        for id_doc, puntaje in abrir(args.indice).buscar(args.consulta, args.k):
+            print(f"{id_doc}\t{puntaje:.3f}")
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+"""Índice temporal de modificaciones: qué versión de una norma estaba vigente en una fecha.
+
+Cada vínculo "modifica" (o "es_modificada_por" dado vuelta) se fecha con la publicación de la
+norma modificadora (o su sanción si no tiene publicación). Los eventos quedan agrupados por norma
+modificada y ordenados por fecha, como una matriz CSR:
+
+    normas          ids de las normas modificadas, ordenados
+    indptr          los eventos de normas[i] son [indptr[i], indptr[i+1])
+    claves          (posición de la norma << 21) | (día + 2**20): orden global por norma y fecha
+    dias            días desde 1970-01-01 de cada evento
+    modificadoras   id de la norma que modifica en cada evento
+
+Una consulta "versión vigente de X en la fecha D" es una búsqueda binaria sobre `claves`, y
+`versiones_en` resuelve muchas normas a la vez con un solo searchsorted.
+
+Uso:
+    python scripts/indice_temporal.py construir
+    python scripts/indice_temporal.py consultar 1234 2015-06-30
+"""
+
+import os
+import sys
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from exportar_grafo import GRAFO_DIR
+# analitica_grafo y pandas se importan donde se usan: consultar el índice ya armado solo necesita numpy
+
+# ============================================
+# CONFIG
+# ============================================
+
+INDICE_PATH = os.path.join(GRAFO_DIR, "indice_temporal.npz")
+
+BITS_DIA = 21                  # días con signo desplazados 2**20 (~2870 años alrededor de 1970)
+DESPLAZAMIENTO_DIA = 2**20
+
+# ============================================
+# CONSTRUCCIÓN
+# ============================================
+
+def dias(fechas):
+    """Serie de fechas -> días desde 1970 como float (NaT queda NaN)."""
+    import pandas as pd
+    fechas = pd.to_datetime(pd.Series(fechas), errors="coerce")
+    return (fechas - pd.Timestamp("1970-01-01")).dt.days.to_numpy("float64", na_value=np.nan)
+
+
+def dia(fecha):
+    """Una fecha (str, date, Timestamp) -> días desde 1970; levanta ValueError si no es una fecha."""
+    try:
+        # AAAA-MM-DD, date o datetime: sin pasar por pandas
+        d = np.datetime64(fecha).astype("datetime64[D]")
+    except (TypeError, ValueError):
+        import pandas as pd
+        return (pd.Timestamp(fecha).normalize() - pd.Timestamp("1970-01-01")).days
+    if np.isnat(d):
+        raise ValueError(f"fecha inválida: {fecha}")
+    return int(d.astype(np.int64))
+
+
+def _clave(pos, dias_evento):
+    return (pos.astype(np.int64) << BITS_DIA) | (dias_evento.astype(np.int64) + DESPLAZAMIENTO_DIA)
+
+
+def eventos_de_modificacion(df_rel):
+    """(modificada, modificadora) únicos a partir de "modifica" y "es_modificada_por"."""
+    from analitica_grafo import INVERSAS, unicos
+    df_rel = df_rel.dropna(subset=["id_origen", "id_destino"])
+    tipo = df_rel["tipo_relacion"]
+    directa = (tipo == "modifica").to_numpy()
+    inversa = np.isin(tipo.to_numpy(), [t for t, activo in INVERSAS.items() if activo == "modifica"])
+    origen = df_rel["id_origen"].to_numpy("int64")
+    destino = df_rel["id_destino"].to_numpy("int64")
+
+    modificada = np.concatenate([destino[directa], origen[inversa]])
+    modificadora = np.concatenate([origen[directa], destino[inversa]])
+    pares = unicos(modificada * 2**31 + modificadora)
+    pares = pares[pares // 2**31 != pares % 2**31]
+    return pares // 2**31, pares % 2**31
+
+
+def construir(df_rel, df_normas):
+    """Arma el índice a partir de las relaciones y de las fechas de digesto_normas.
+
+    Los eventos cuya modificadora no tiene fecha (o no está en el digesto) no se pueden ubicar
+    en el tiempo y se dejan afuera; se informa cuántos.
+    """
+    from analitica_grafo import unicos, posiciones
+    df_normas = df_normas.dropna(subset=["id_norma"]).drop_duplicates("id_norma")
+    fecha = df_normas["fecha_publicacion"].fillna(df_normas["fecha_sancion"])
+    ids_normas = df_normas["id_norma"].to_numpy("int64")
+    dia_norma = dias(fecha)
+
+    modificada, modificadora = eventos_de_modificacion(df_rel)
+    pos = posiciones(ids_normas, modificadora) if len(ids_normas) else np.full(len(modificadora), -1)
+    dia_evento = np.where(pos >= 0, dia_norma[pos], np.nan)
+    fechado = ~np.isnan(dia_evento)
+    if (~fechado).any():
+        print(f"⚠️ {(~fechado).sum():,} modificaciones sin fecha de la modificadora: quedan fuera del índice")
+    modificada, modificadora = modificada[fechado], modificadora[fechado]
+    dia_evento = dia_evento[fechado].astype(np.int64)
+
+    normas = unicos(modificada)
+    pos_norma = posiciones(normas, modificada)
+    claves = _clave(pos_norma, dia_evento)
+    orden = np.lexsort((modificadora, claves))   # a igual fecha, desempata el id de la modificadora
+
+    indptr = np.zeros(len(normas) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pos_norma, minlength=len(normas)), out=indptr[1:])
+    return {
+        "normas": normas.astype(np.int32),
+        "indptr": indptr,
+        "claves": claves[orden],
+        "dias": dia_evento[orden].astype(np.int32),
+        "modificadoras": modificadora[orden].astype(np.int32),
+    }
+
+
+def guardar(indice, path=INDICE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(path, **indice)
+    return path
+
+# ============================================
+# CONSULTAS
+# ============================================
+
+class IndiceTemporal:
+    """Consultas puntuales en el tiempo sobre el índice ya armado (en memoria)."""
+
+    def __init__(self, indice):
+        self.normas = indice["normas"]
+        self.indptr = indice["indptr"]
+        self.claves = indice["claves"]
+        self.dias = indice["dias"]
+        self.modificadoras = indice["modificadoras"]
+
+    @classmethod
+    def cargar(cls, path=INDICE_PATH):
+        with np.load(path) as f:
+            return cls({k: f[k] for k in f.files})
+
+    def _posicion(self, id_norma):
+        i = np.searchsorted(self.normas, int(id_norma))
+        return i if i < len(self.normas) and self.normas[i] == int(id_norma) else None
+
+    def _hasta(self, i, fecha, dias_antes=0):
+        # primer evento de la norma i posterior a `fecha` (menos `dias_antes`)
+        d = dia(fecha) - dias_antes
+        return np.searchsorted(self.claves, _clave(np.array([i]), np.array([d]))[0], side="right")
+
+    def _tabla(self, inicio, fin):
+        import pandas as pd
+        return pd.DataFrame({
+            "fecha": pd.to_datetime(self.dias[inicio:fin], unit="D"),
+            "id_modificadora": pd.array(self.modificadoras[inicio:fin], dtype="Int32"),
+        })
+
+    def eventos(self, id_norma):
+        """Modificaciones de una norma en orden cronológico: DataFrame (fecha, id_modificadora)."""
+        i = self._posicion(id_norma)
+        return self._tabla(0, 0) if i is None else self._tabla(self.indptr[i], self.indptr[i + 1])
+
+    def version_en(self, id_norma, fecha):
+        """(modificaciones vigentes a esa fecha, id de la última modificadora o None).
+
+        La versión 0 es el texto original; la versión k es la que resulta de las primeras k
+        modificaciones (las publicadas hasta `fecha` inclusive).
+        """
+        i = self._posicion(id_norma)
+        if i is None:
+            return 0, None
+        fin = self._hasta(i, fecha)
+        version = int(fin - self.indptr[i])
+        return version, (int(self.modificadoras[fin - 1]) if version else None)
+
+    def versiones_en(self, ids, fecha):
+        """Versión vigente (cantidad de modificaciones) de muchas normas en una misma fecha."""
+        from analitica_grafo import posiciones
+        ids = np.asarray(ids, dtype=np.int64)
+        pos = posiciones(self.normas, ids)
+        conocida = pos >= 0
+        dias_consulta = np.full(conocida.sum(), dia(fecha))
+        fin = np.searchsorted(self.claves, _clave(pos[conocida], dias_consulta), side="right")
+        version = np.zeros(len(ids), dtype=np.int64)
+        version[conocida] = fin - self.indptr[pos[conocida]]
+        return version
+
+    def modificaciones_entre(self, id_norma, desde, hasta):
+        """Eventos de una norma con fecha en [desde, hasta]."""
+        i = self._posicion(id_norma)
+        if i is None:
+            return self._tabla(0, 0)
+        return self._tabla(self._hasta(i, desde, dias_antes=1), self._hasta(i, hasta))
+
+# ============================================
+# PRINCIPAL
+# ============================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("construir")
+    p.add_argument("--relaciones", default="data_procesada/digesto_relaciones_expandido.csv")
+    p.add_argument("--normas", default="data_procesada/digesto_normas.csv")
+    p.add_argument("--salida", default=INDICE_PATH)
+
+    p = sub.add_parser("consultar")
+    p.add_argument("id_norma", type=int)
+    p.add_argument("fecha")
+    p.add_argument("--indice", default=INDICE_PATH)
+    args = parser.parse_args()
+
+    if args.comando == "construir":
+        from esquema_digesto import leer_normas, leer_relaciones
+        df_normas = leer_normas(args.normas, columnas=["id_norma", "fecha_sancion", "fecha_publicacion"])
+        indice = construir(leer_relaciones(args.relaciones), df_normas)
+        guardar(indice, args.salida)
+        print(f"✔ Índice temporal: {len(indice['normas']):,} normas modificadas, "
+              f"{len(indice['modificadoras']):,} modificaciones -> {args.salida}")
+    else:
+        indice = IndiceTemporal.cargar(args.indice)
+        version, ultima = indice.version_en(args.id_norma, args.fecha)
+        print(f"Norma {args.id_norma} al {args.fecha}: versión {version}"
+              + (f" (última modificación: norma {ultima})" if ultima else " (texto original)"))
+        print(indice.eventos(args.id_norma).to_string(index=False))
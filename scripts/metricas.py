@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import functools
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# ============================================
+# CONFIG
+# ============================================
+# DIGESTO_METRICAS          carpeta donde se escriben las métricas (si no está, solo resumen en consola)
+# DIGESTO_METRICAS_FORMATO  "jsonl" (default) o "prometheus" (textfile collector)
+# DIGESTO_PERFIL            "cprofile" o "pyinstrument" para perfilar las funciones marcadas con @perfilar
+
+METRICAS_DIR = os.environ.get("DIGESTO_METRICAS")
+METRICAS_FORMATO = os.environ.get("DIGESTO_METRICAS_FORMATO", "jsonl").lower()
+PERFIL = os.environ.get("DIGESTO_PERFIL", "").lower()
+
+# límites superiores (segundos) del histograma de latencia HTTP
+BUCKETS_LATENCIA = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# ============================================
+# ESTADO
+# ============================================
+
+_lock = threading.Lock()
+_script = None
+_etapas = {}        # nombre -> {"veces", "wall", "cpu", "filas", "rss_bytes"}
+_local = threading.local()  # .pila: etapas abiertas en cada hilo (la última recibe las filas)
+_http = {}          # host -> {"requests", "por_status", "buckets", "suma", "reintentos"}
+_perfiles = {}      # nombre función -> profiler acumulado
+_requests_instrumentado = False
+
+
+def rss_pico_bytes():
+    """Pico de memoria residente del proceso (0 si la plataforma no lo informa)."""
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB, macOS bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def iniciar(script):
+    """Activa las métricas para un script: instrumenta requests y emite al salir."""
+    global _script
+    if _script is not None:
+        return
+    _script = script
+    instrumentar_requests()
+    atexit.register(emitir)
+
+# ============================================
+# ETAPAS
+# ============================================
+
+def _pila():
+    if not hasattr(_local, "pila"):
+        _local.pila = []
+    return _local.pila
+
+
+@contextmanager
+def etapa(nombre):
+    """Mide tiempo de pared, CPU y RSS pico de un bloque del pipeline."""
+    registro = {"filas": 0}
+    pila = _pila()
+    pila.append(registro)
+    t0 = time.perf_counter()
+    c0 = time.process_time()
+    try:
+        yield registro
+    finally:
+        wall = time.perf_counter() - t0
+        cpu = time.process_time() - c0
+        # la pila es del hilo y los with se cierran en orden: la de arriba es esta etapa
+        pila.pop()
+        with _lock:
+            e = _etapas.setdefault(nombre, {"veces": 0, "wall": 0.0, "cpu": 0.0, "filas": 0, "rss_bytes": 0})
+            e["veces"] += 1
+            e["wall"] += wall
+            e["cpu"] += cpu
+            e["filas"] += registro["filas"]
+            e["rss_bytes"] = max(e["rss_bytes"], rss_pico_bytes())
+
+
+def sumar_filas(n):
+    """Suma filas procesadas a la etapa abierta más interna."""
+    pila = _pila()
+    if pila:
+        pila[-1]["filas"] += int(n)
+
+# ============================================
+# HTTP
+# ============================================
+
+def _host(url):
+    return urlsplit(url).hostname or "desconocido"
+
+
+def _registro_host(host):
+    return _http.setdefault(host, {
+        "requests": 0,
+        "por_status": {},
+        "buckets": [0] * len(BUCKETS_LATENCIA),
+        "suma": 0.0,
+        "reintentos": 0,
+    })
+
+
+def registrar_http(url, status, segundos):
+    with _lock:
+        h = _registro_host(_host(url))
+        h["requests"] += 1
+        h["por_status"][str(status)] = h["por_status"].get(str(status), 0) + 1
+        h["suma"] += segundos
+        for i, limite in enumerate(BUCKETS_LATENCIA):
+            if segundos <= limite:
+                h["buckets"][i] += 1
+                break
+
+
+def registrar_reintento(url):
+    with _lock:
+        _registro_host(_host(url))["reintentos"] += 1
+
+
+def instrumentar_requests():
+    """Envuelve Session.send para contar todas las llamadas (requests.get/post incluidas)."""
+    global _requests_instrumentado
+    if _requests_instrumentado:
+        return
+    try:
+        import requests
+    except ImportError:
+        return
+
+    send_original = requests.Session.send
+
+    @functools.wraps(send_original)
+    def send(self, request, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            r = send_original(self, request, **kwargs)
+        except Exception as e:
+            registrar_http(request.url, type(e).__name__, time.perf_counter() - t0)
+            raise
+        registrar_http(request.url, r.status_code, time.perf_counter() - t0)
+        return r
+
+    requests.Session.send = send
+    _requests_instrumentado = True
+
+# ============================================
+# PERFILADO OPCIONAL
+# ============================================
+
+def perfilar(func):
+    """Perfila la función con cProfile/pyinstrument si DIGESTO_PERFIL está seteado.
+
+    Las llamadas se acumulan en un único perfil por función que se vuelca al emitir.
+    """
+    if PERFIL not in ("cprofile", "pyinstrument"):
+        return func
+
+    nombre = f"{func.__module__}.{func.__name__}"
+
+    @functools.wraps(func)
+    def envoltura(*args, **kwargs):
+        if PERFIL == "cprofile":
+            import cProfile
+            prof = _perfiles.setdefault(nombre, cProfile.Profile())
+            try:
+                prof.enable()
+            except ValueError:
+                # ya hay otro profiler activo (llamada anidada)
+                return func(*args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                prof.disable()
+
+        from pyinstrument import Profiler
+        from pyinstrument.session import Session
+        prof = Profiler()
+        try:
+            prof.start()
+        except RuntimeError:
+            return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sesion = prof.stop()
+            previa = _perfiles.get(nombre)
+            _perfiles[nombre] = Session.combine(previa, sesion) if previa else sesion
+
+    return envoltura
+
+
+def _volcar_perfiles(carpeta):
+    os.makedirs(carpeta, exist_ok=True)
+    for nombre, perfil in _perfiles.items():
+        if PERFIL == "cprofile":
+            destino = os.path.join(carpeta, f"{_script}.{nombre}.prof")
+            perfil.dump_stats(destino)
+        else:
+            from pyinstrument.renderers import HTMLRenderer
+            destino = os.path.join(carpeta, f"{_script}.{nombre}.html")
+            with open(destino, "w", encoding="utf-8") as f:
+                f.write(HTMLRenderer().render(perfil))
+        print(f"🔬 Perfil guardado: {destino}")
+
+# ============================================
+# EMISIÓN
+# ============================================
+
+def _registros():
+    base = {
+        "ts": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "script": _script,
+        "run": os.environ.get("GITHUB_RUN_ID"),
+    }
+    for nombre, e in _etapas.items():
+        yield {**base, "tipo": "etapa", "etapa": nombre, **e}
+    for host, h in _http.items():
+        yield {**base, "tipo": "http", "host": host, **h, "buckets_limites": list(BUCKETS_LATENCIA)}
+    yield {**base, "tipo": "proceso", "rss_pico_bytes": rss_pico_bytes(), "cpu": time.process_time()}
+
+
+def _etiquetas(**kv):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in kv.items()) + "}"
+
+
+def _prometheus():
+    s = _script
+    lineas = []
+
+    def metrica(nombre, tipo, ayuda, muestras):
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+        lineas.extend(muestras)
+
+    metrica("digesto_etapa_segundos", "gauge", "Tiempo de pared por etapa",
+            [f"digesto_etapa_segundos{_etiquetas(script=s, etapa=n)} {e['wall']:.6f}" for n, e in _etapas.items()])
+    metrica("digesto_etapa_cpu_segundos", "gauge", "Tiempo de CPU por etapa",
+            [f"digesto_etapa_cpu_segundos{_etiquetas(script=s, etapa=n)} {e['cpu']:.6f}" for n, e in _etapas.items()])
+    metrica("digesto_etapa_filas", "gauge", "Filas procesadas por etapa",
+            [f"digesto_etapa_filas{_etiquetas(script=s, etapa=n)} {e['filas']}" for n, e in _etapas.items()])
+    metrica("digesto_rss_pico_bytes", "gauge", "Pico de memoria residente",
+            [f"digesto_rss_pico_bytes{_etiquetas(script=s)} {rss_pico_bytes()}"])
+
+    req, lat, rein = [], [], []
+    for host, h in _http.items():
+        for status, n in h["por_status"].items():
+            req.append(f"digesto_http_requests_total{_etiquetas(script=s, host=host, status=status)} {n}")
+        acumulado = 0
+        for limite, n in zip(BUCKETS_LATENCIA, h["buckets"]):
+            acumulado += n
+            lat.append(f"digesto_http_latencia_segundos_bucket{_etiquetas(script=s, host=host, le=limite)} {acumulado}")
+        lat.append(f"digesto_http_latencia_segundos_bucket{_etiquetas(script=s, host=host, le='+Inf')} {h['requests']}")
+        lat.append(f"digesto_http_latencia_segundos_sum{_etiquetas(script=s, host=host)} {h['suma']:.6f}")
+        lat.append(f"digesto_http_latencia_segundos_count{_etiquetas(script=s, host=host)} {h['requests']}")
+        rein.append(f"digesto_http_reintentos_total{_etiquetas(script=s, host=host)} {h['reintentos']}")
+
+    metrica("digesto_http_requests_total", "counter", "Requests HTTP por host y status", req)
+    metrica("digesto_http_latencia_segundos", "histogram", "Latencia HTTP por host", lat)
+    metrica("digesto_http_reintentos_total", "counter", "Reintentos HTTP por host", rein)
+    return "\n".join(lineas) + "\n"
+
+
+def resumen():
+    lineas = [f"📊 Métricas {_script}:"]
+    for nombre, e in _etapas.items():
+        lineas.append(
+            f"   {nombre}: {e['wall']:.2f}s pared, {e['cpu']:.2f}s CPU, "
+            f"{e['filas']:,} filas, RSS {e['rss_bytes'] / 2**20:.0f} MB"
+        )
+    for host, h in _http.items():
+        media = h["suma"] / h["requests"] if h["requests"] else 0
+        lineas.append(f"   {host}: {h['requests']} requests, {media:.2f}s promedio, {h['reintentos']} reintentos")
+    return "\n".join(lineas)
+
+
+def emitir():
+    """Imprime el resumen y escribe JSON lines o textfile de Prometheus si está configurado."""
+    if _script is None:
+        return
+    print(resumen())
+
+    if _perfiles:
+        _volcar_perfiles(os.path.join(METRICAS_DIR or ".", "perfiles"))
+
+    if not METRICAS_DIR:
+        return
+    os.makedirs(METRICAS_DIR, exist_ok=True)
+
+    if METRICAS_FORMATO == "prometheus":
+        # escritura atómica: el textfile collector nunca lee un archivo a medias
+        destino = os.path.join(METRICAS_DIR, f"digesto_{_script}.prom")
+        tmp = destino + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(_prometheus())
+        os.replace(tmp, destino)
+    else:
+        destino = os.path.join(METRICAS_DIR, "metricas.jsonl")
+        with open(destino, "a", encoding="utf-8") as f:
+            for reg in _registros():
+                f.write(json.dumps(reg, ensure_ascii=False) + "\n")
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+"""Pasajes: el texto de cada norma partido por artículo, indexado y agregado de vuelta a normas.
+
+Indexar una ley entera como un solo documento diluye la relevancia (un artículo que habla del
+tema queda tapado por cientos que no) y no entra en el contexto de un modelo de embeddings. Acá
+cada norma se parte en sus "ARTICULO N" (los artículos muy largos, en tramos de
+PASAJE_MAX_PALABRAS con algo de solapamiento) y cada pasaje es un documento del índice BM25 por
+segmentos de indice_busqueda.py:
+
+    clave           (id_norma << 16) | orden del pasaje dentro de la norma
+    articulos.npy   número de artículo de cada pasaje (-1: encabezado y considerandos)
+    fuentes.npy     de dónde salió el texto (FUENTES)
+    embeddings.npy  (opcional) vector float16 de cada pasaje
+
+Los segmentos se guardan con bits_grupo=16: al re-indexar una norma se reemplazan todos sus
+pasajes a la vez. En la consulta, los mejores pasajes se agrupan por norma y cada norma queda con
+el puntaje de su mejor pasaje y los artículos que lo explican.
+
+Uso:
+    python scripts/pasajes.py buscar "impuesto a los débitos bancarios"
+"""
+
+import os
+import re
+import sys
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import indice_busqueda
+
+# ============================================
+# CONFIG
+# ============================================
+
+PASAJES_DIR = indice_busqueda.TEXTOS_DIR
+
+BITS_PASAJE = 16
+MAX_PASAJES = 2**BITS_PASAJE
+PASAJE_MAX_PALABRAS = 300       # ~400 tokens: entra en el contexto de los modelos multilingües chicos
+SOLAPAMIENTO = 30               # palabras repetidas entre tramos consecutivos de un artículo largo
+LOTE_PASAJES = 2000             # pasajes por tokenización en lote
+CANDIDATOS_POR_NORMA = 20       # pasajes que se traen por cada norma pedida antes de agrupar
+ARTICULOS_POR_NORMA = 3
+
+FUENTES = {"ficha": 0, "texto": 1, "ficha_sin_texto": 2}   # la última: el texto completo dio 404
+
+_ENCABEZADO_ARTICULO = (
+    r"(?:ART[IÍ]CULO|Art[ií]culo|ART\.|Art\.)\s*(\d+)\s*(?:[°ºo]\.?)?\s*(?:bis|ter|quater)?\s*[-–—.:]"
+)
+# un encabezado de artículo después de un fin de oración va a un renglón propio
+CORTE_ARTICULO = re.compile(r"(?<=[.:;])[ ]+(?=" + _ENCABEZADO_ARTICULO + ")")
+_INICIO_ARTICULO = re.compile(_ENCABEZADO_ARTICULO)
+
+# ============================================
+# PARTIR
+# ============================================
+
+def dividir_articulos(texto):
+    """[(número de artículo o None para el encabezado/considerandos, texto)] en orden."""
+    articulos, numero, renglones = [], None, []
+    for renglon in texto.split("\n"):
+        m = _INICIO_ARTICULO.match(renglon)
+        if m and renglones:
+            articulos.append((numero, "\n".join(renglones)))
+            renglones = []
+        if m:
+            numero = int(m.group(1))
+        renglones.append(renglon)
+    if renglones:
+        articulos.append((numero, "\n".join(renglones)))
+    return articulos
+
+
+def partir(texto, max_palabras=PASAJE_MAX_PALABRAS, solapamiento=SOLAPAMIENTO):
+    """[(artículo o None, texto del pasaje)]: uno por artículo, o varios tramos si es largo."""
+    pasajes = []
+    for articulo, cuerpo in dividir_articulos(texto or ""):
+        palabras = cuerpo.split()
+        if len(palabras) <= max_palabras:
+            pasajes.append((articulo, cuerpo))
+            continue
+        paso = max_palabras - solapamiento
+        for inicio in range(0, len(palabras) - solapamiento, paso):
+            pasajes.append((articulo, " ".join(palabras[inicio:inicio + max_palabras])))
+    return pasajes
+
+
+def clave(id_norma, orden):
+    return (int(id_norma) << BITS_PASAJE) | orden
+
+
+def normas_de(claves):
+    return np.asarray(claves, dtype=np.int64) >> BITS_PASAJE
+
+# ============================================
+# INDEXAR
+# ============================================
+
+def agregar(normas, directorio=PASAJES_DIR, modelo=None):
+    """Indexa en un segmento nuevo los pasajes de (id_norma, texto, fuente).
+
+    Una norma sin texto deja un pasaje vacío: así queda registrado que ya se procesó. Con
+    `modelo` (sentence-transformers) también se guardan los embeddings de los pasajes.
+    """
+    documentos, articulos, fuentes = [], [], []
+    for id_norma, texto, fuente in normas:
+        pasajes = partir(texto) or [(None, "")]
+        if len(pasajes) > MAX_PASAJES:
+            print(f"⚠️ {id_norma}: {len(pasajes):,} pasajes, se indexan los primeros {MAX_PASAJES:,}")
+            pasajes = pasajes[:MAX_PASAJES]
+        for orden, (articulo, cuerpo) in enumerate(pasajes):
+            documentos.append((clave(id_norma, orden), cuerpo))
+            articulos.append(-1 if articulo is None else articulo)
+            fuentes.append(FUENTES[fuente])
+
+    extras = {
+        "articulos": np.array(articulos, dtype=np.int32),
+        "fuentes": np.array(fuentes, dtype=np.int8),
+    }
+    meta = {"bits_grupo": BITS_PASAJE}
+    if modelo is not None:
+        extras["embeddings"] = indice_busqueda.calcular_embeddings([c for _, c in documentos], modelo)
+        meta["modelo_embeddings"] = indice_busqueda.MODELO_EMBEDDINGS
+    return indice_busqueda.agregar_segmento(directorio, documentos, LOTE_PASAJES, extras=extras, meta=meta)
+
+
+def compatible(directorio=PASAJES_DIR):
+    """False si la carpeta tiene segmentos que no son de pasajes (p. ej. un índice por norma viejo)."""
+    return all(
+        indice_busqueda.IndiceBM25(indice_busqueda.ruta_segmento(directorio, n)).meta.get("bits_grupo") == BITS_PASAJE
+        for n in indice_busqueda.segmentos(directorio)
+    )
+
+# ============================================
+# CONSULTAR
+# ============================================
+
+class IndicePasajes:
+    """Búsqueda por pasajes con el resultado agregado por norma."""
+
+    def __init__(self, directorio=PASAJES_DIR, mmap=True):
+        self.indice = indice_busqueda.IndiceSegmentado(directorio, mmap)
+        self.segmentos = self.indice.segmentos
+        self.n_pasajes = self.indice.n_docs
+
+    def fuentes_vigentes(self):
+        """{id_norma: fuente} de lo que está indexado."""
+        vigentes = {}
+        for seg in self.segmentos:
+            normas = normas_de(seg.ids[seg.vivo])
+            vigentes.update(zip(normas.tolist(), seg.extras["fuentes"][seg.vivo].tolist()))
+        return vigentes
+
+    def _agrupar(self, hits, k):
+        """(segmento, posición, puntaje) de mayor a menor -> [(id_norma, puntaje, artículos)]."""
+        normas = {}
+        for s, i, puntaje in hits:
+            seg = self.segmentos[s]
+            id_norma = int(seg.ids[i]) >> BITS_PASAJE
+            if id_norma not in normas:
+                if len(normas) == k:
+                    continue
+                normas[id_norma] = (puntaje, [])
+            articulos = normas[id_norma][1]
+            articulo = int(seg.extras["articulos"][i])
+            if len(articulos) < ARTICULOS_POR_NORMA and articulo not in articulos:
+                articulos.append(articulo)
+        return [(id_norma, puntaje, articulos) for id_norma, (puntaje, articulos) in normas.items()]
+
+    def buscar(self, consulta, k=10):
+        """Las k normas con mejor pasaje: [(id_norma, puntaje, artículos)] (-1 es el encabezado)."""
+        return self._agrupar(self.indice.buscar_posiciones(consulta, k * CANDIDATOS_POR_NORMA), k)
+
+    def modelo_embeddings(self):
+        modelos = {seg.meta.get("modelo_embeddings") for seg in self.segmentos if "embeddings" in seg.extras}
+        return modelos.pop() if len(modelos) == 1 else None
+
+    def similares(self, vector, k=10):
+        """Como buscar, pero por similitud de embeddings (solo segmentos que los tienen)."""
+        hits = []
+        for s, seg in enumerate(self.segmentos):
+            if "embeddings" not in seg.extras:
+                continue
+            for i, similitud in indice_busqueda.buscar_semantico(seg.extras["embeddings"], vector, k * CANDIDATOS_POR_NORMA):
+                if seg.vivo[i] and seg.largos[i]:
+                    hits.append((s, i, similitud))
+        return self._agrupar(sorted(hits, key=lambda h: -h[2]), k)
+
+# ============================================
+# PRINCIPAL
+# ============================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p = sub.add_parser("buscar")
+    p.add_argument("consulta")
+    p.add_argument("-k", type=int, default=10)
+    p.add_argument("--indice", default=PASAJES_DIR)
+    args = parser.parse_args()
+
+    for id_norma, puntaje, articulos in IndicePasajes(args.indice).buscar(args.consulta, args.k):
+        print(f"{id_norma}\t{puntaje:.3f}\t" + ",".join("encabezado" if a < 0 else f"art. {a}" for a in articulos))
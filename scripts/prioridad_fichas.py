@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+import os
+import numpy as np
+import pandas as pd
+
+# ============================================
+# CONFIG
+# ============================================
+
+# ids que los usuarios quieren scrapeados ya (uno por línea, se admiten comentarios con #)
+IDS_FIJADOS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "config",
+    "ids_fijados.txt"
+)
+
+VIDA_MEDIA_DIAS = 2 * 365   # una norma de hace 2 años vale la mitad que una de hoy
+PESO_RECENCIA = 0.5
+PESO_GRADO = 0.5
+
+# ============================================
+# COMPONENTES DEL SCORE
+# ============================================
+
+def recencia(df_normas, hoy=None):
+    """1 para lo publicado hoy, decae a la mitad cada VIDA_MEDIA_DIAS; 0 sin fecha."""
+    hoy = pd.Timestamp(hoy) if hoy is not None else pd.Timestamp.now().normalize()
+    fecha = pd.to_datetime(df_normas["fecha_publicacion"], errors="coerce")
+    fecha = fecha.fillna(pd.to_datetime(df_normas["fecha_sancion"], errors="coerce"))
+    dias = (hoy - fecha).dt.days.clip(lower=0)
+    return np.exp2(-dias / VIDA_MEDIA_DIAS).fillna(0.0)
+
+
+def grado_entrada(df_rel):
+    """Cantidad de normas distintas que modifican (o citan) a cada norma.
+
+    digesto_relaciones trae cada vínculo en los dos sentidos ("modifica" y
+    "es_modificada_por"), así que se normaliza a (destino, origen) y se deduplica.
+    """
+    invertida = df_rel["tipo_relacion"].str.startswith("es_")
+    destino = df_rel["id_destino"].where(~invertida, df_rel["id_origen"])
+    origen = df_rel["id_origen"].where(~invertida, df_rel["id_destino"])
+    pares = pd.DataFrame({"destino": destino, "origen": origen}).dropna().drop_duplicates()
+    return pares.groupby("destino").size()
+
+
+def calcular_prioridades(df_normas, df_rel, hoy=None):
+    """Score en [0, 1] por id_norma: mezcla recencia y grado de entrada (escala log)."""
+    grado = df_normas["id_norma"].map(grado_entrada(df_rel)).fillna(0)
+    grado_norm = np.log1p(grado) / np.log1p(grado.max()) if grado.max() > 0 else grado * 0.0
+    score = PESO_RECENCIA * recencia(df_normas, hoy) + PESO_GRADO * grado_norm
+    return pd.Series(score.to_numpy(), index=df_normas["id_norma"])
+
+# ============================================
+# FIJADOS
+# ============================================
+
+def leer_ids_fijados(path=IDS_FIJADOS_PATH):
+    """Ids del archivo config/ids_fijados.txt más los de DIGESTO_IDS_FIJADOS (separados por coma)."""
+    ids = []
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for linea in f:
+                linea = linea.split("#", 1)[0].strip()
+                if linea:
+                    ids.append(linea)
+    ids.extend(i.strip() for i in os.environ.get("DIGESTO_IDS_FIJADOS", "").split(",") if i.strip())
+    return list(dict.fromkeys(ids))
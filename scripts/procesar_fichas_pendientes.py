@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import metricas
+from almacen_fichas import AlmacenFichas, bajar_almacen, subir_almacen
+from esquema_digesto import leer_normas, leer_relaciones, ids_enteros
+from cola_fichas import ColaFichas, COLA_PATH, DROPBOX_COLA_PATH
+from cambios_infoleg import cargar as cargar_cambios, normas_con_cambios
+from prioridad_fichas import calcular_prioridades, leer_ids_fijados
+from cliente_infoleg import CircuitoAbierto
+from scraper_fichas_infoleg import (
+    obtener_ficha_o_error, ErrorFicha, dropbox_download, dropbox_upload, DROPBOX_FOLDER_JSON, CLIENTE_INFOLEG
+)
+
+NORMAS_CSV = "data_procesada/digesto_normas.csv"
+RELACIONES_CSV = "data_procesada/digesto_relaciones.csv"
+
+# ============================================
+# CHECKPOINT EN DROPBOX
+# ============================================
+
+def bajar_cola():
+    """Trae el último checkpoint de la cola si no hay uno local."""
+    if os.path.exists(COLA_PATH):
+        return
+    contenido = dropbox_download(DROPBOX_COLA_PATH)
+    if contenido:
+        os.makedirs(os.path.dirname(COLA_PATH), exist_ok=True)
+        with open(COLA_PATH, "wb") as f:
+            f.write(contenido)
+        print("📌 Cola recuperada desde Dropbox.")
+    else:
+        print("📌 Sin cola previa en Dropbox, se crea una nueva.")
+
+
+def subir_cola(cola=None, sin_subir=()):
+    """Checkpoint de la cola en Dropbox.
+
+    `sin_subir` son ids marcados ok cuya ficha todavía no está en el almacén remoto: se sube una
+    copia donde siguen pendientes, así la cola de Dropbox nunca da por hecha una ficha perdida.
+    """
+    path = COLA_PATH
+    if sin_subir:
+        path = COLA_PATH + ".checkpoint"
+        cola.exportar(path, sin_subir)
+    with open(path, "rb") as f:
+        dropbox_upload(DROPBOX_COLA_PATH, f.read())
+    if path != COLA_PATH:
+        os.remove(path)
+
+# ============================================
+# SIEMBRA
+# ============================================
+
+def sembrar_desde_digesto(cola):
+    """Agrega a la cola los ids nuevos del digesto (los ya parseados entran como ok).
+
+    Solo la primera vez (cola vacía) se lista /fichas_json para no re-scrapear lo que ya existe;
+    después la cola es la fuente de verdad y no se vuelve a listar Dropbox.
+    """
+    df = leer_normas(NORMAS_CSV, columnas=["id_norma", "ficha_parseada"])
+    df = df.dropna(subset=["id_norma"])
+    parseadas = df["ficha_parseada"]
+
+    if not cola.resumen():
+        from sync_fichas_dropbox import dropbox_list_folder
+        print("📌 Cola nueva: listando JSON en Dropbox una única vez...")
+        ids_json = {fname.replace(".json", "") for fname in dropbox_list_folder(DROPBOX_FOLDER_JSON)}
+        parseadas |= df["id_norma"].isin(ids_enteros(ids_json))
+
+    nuevos_ok = cola.sembrar(df.loc[parseadas, "id_norma"], estado="ok")
+    nuevos = cola.sembrar(df.loc[~parseadas, "id_norma"])
+    print(f"📌 Cola: {nuevos:,} ids pendientes nuevos, {nuevos_ok:,} ya parseados.")
+
+
+def reabrir_modificadas(cola):
+    """Las normas que cambiaron en el dump de hoy (cambios_infoleg.py) vuelven a pendiente."""
+    modificadas = normas_con_cambios(cargar_cambios())
+    if len(modificadas):
+        reabiertas = cola.reabrir(modificadas.tolist())
+        print(f"📌 {reabiertas:,} fichas de normas modificadas en Infoleg vuelven a pendiente.")
+
+
+def priorizar(cola, fijados_cli):
+    """Recalcula la prioridad de cada id (recencia + grado de entrada) y aplica los fijados."""
+    columnas = ["id_norma", "fecha_publicacion", "fecha_sancion"]
+    df_normas = leer_normas(NORMAS_CSV, columnas=columnas).dropna(subset=["id_norma"])
+    if os.path.exists(RELACIONES_CSV):
+        df_rel = leer_relaciones(RELACIONES_CSV)
+    else:
+        df_rel = pd.DataFrame(columns=["id_origen", "id_destino", "tipo_relacion"])
+
+    prioridades = calcular_prioridades(df_normas, df_rel)
+    cola.actualizar_prioridades(prioridades.items())
+
+    fijados = leer_ids_fijados() + fijados_cli
+    cola.fijar(fijados)
+    print(f"📌 Prioridades actualizadas ({len(prioridades):,} ids, {len(fijados)} fijados).")
+
+# ============================================
+# TRABAJO
+# ============================================
+
+def procesar_id(id_norma, almacen):
+    """Devuelve (error, permanente, espera_circuito) sin levantar excepciones."""
+    try:
+        obtener_ficha_o_error(id_norma, almacen)
+        return None, False, None
+    except CircuitoAbierto as e:
+        return None, False, e.espera
+    except ErrorFicha as e:
+        return str(e), e.permanente, None
+    except Exception as e:
+        return f"{type(e).__name__}: {e}", False, None
+
+# ============================================
+# PRINCIPAL
+# ============================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Procesa las fichas pendientes de la cola persistente.")
+    parser.add_argument("--limite", type=int, default=2000, help="fichas por corrida (límite diario)")
+    parser.add_argument("--checkpoint", type=int, default=200, help="subir la cola a Dropbox cada N fichas; 0 = solo al final (el almacén se sube al sellar un segmento y al final)")
+    parser.add_argument("--fijar", default="", help="ids a procesar primero, separados por coma")
+    parser.add_argument("--max-aperturas", type=int, default=3,
+                        help="cortar la corrida si el circuito de Infoleg se abre más veces que esto")
+    args = parser.parse_args()
+    if args.checkpoint < 0:
+        parser.error("--checkpoint no puede ser negativo")
+
+    metricas.iniciar("procesar_fichas_pendientes")
+
+    with metricas.etapa("cola"):
+        bajar_cola()
+        cola = ColaFichas()
+        recuperados = cola.recuperar_en_curso()
+        if recuperados:
+            print(f"📌 {recuperados} ids de una corrida interrumpida vuelven a pendiente.")
+        sembrar_desde_digesto(cola)
+        reabrir_modificadas(cola)
+        priorizar(cola, [i.strip() for i in args.fijar.split(",") if i.strip()])
+        print(f"📌 Estado de la cola: {cola.resumen()}")
+
+    with metricas.etapa("almacen"):
+        # alcanza con el índice y el último segmento; los demás se bajan solo si se los lee
+        bajar_almacen(completo=False)
+        almacen = AlmacenFichas(bajar_faltantes=True)
+        almacen.asegurar_diccionarios()
+
+    ids = cola.tomar(args.limite)
+    print(f"Procesando {len(ids)} fichas (hasta {CLIENTE_INFOLEG.concurrencia_max} en paralelo)...")
+
+    pendientes = deque(ids)
+    en_vuelo = {}
+    # el almacén se sube al sellarse un segmento y al final: en los checkpoints solo va la cola
+    sin_subir = []
+    segmento_subido = almacen.activo
+    cortada = False
+    ok = errores = hechas = 0
+    try:
+        with metricas.etapa("scraping"), ThreadPoolExecutor(CLIENTE_INFOLEG.concurrencia_max) as pool:
+            while pendientes or en_vuelo:
+                # el cliente limita cuántos requests a Infoleg salen a la vez; acá solo se llena la tubería
+                while pendientes and len(en_vuelo) < CLIENTE_INFOLEG.concurrencia_max:
+                    id_norma = pendientes.popleft()
+                    en_vuelo[pool.submit(procesar_id, id_norma, almacen)] = id_norma
+
+                listos, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                for fut in listos:
+                    id_norma = en_vuelo.pop(fut)
+                    error, permanente, espera = fut.result()
+
+                    if espera is not None:
+                        # circuito abierto: no cuenta como intento, vuelve a la tubería
+                        if not cortada:
+                            pendientes.appendleft(id_norma)
+                        continue
+
+                    if error is None:
+                        cola.marcar_ok(id_norma)
+                        sin_subir.append(id_norma)
+                        ok += 1
+                    else:
+                        estado = cola.marcar_error(id_norma, error, permanente=permanente)
+                        errores += 1
+                        print(f"⚠️ {id_norma}: {error} ({estado})")
+                    hechas += 1
+                    metricas.sumar_filas(1)
+
+                    if args.checkpoint and hechas % args.checkpoint == 0:
+                        print(f"{hechas}/{len(ids)} · ok {ok} · errores {errores} · checkpoint")
+                        if almacen.activo != segmento_subido:
+                            # segmento sellado: se sube una vez completo y ya no cambia
+                            subir_almacen()
+                            segmento_subido = almacen.activo
+                            sin_subir.clear()
+                        subir_cola(cola, sin_subir)
+
+                espera = CLIENTE_INFOLEG.espera_restante()
+                if espera:
+                    if CLIENTE_INFOLEG.aperturas > args.max_aperturas:
+                        print("⛔ Infoleg sigue degradado, se corta la corrida (lo pendiente queda en la cola).")
+                        pendientes.clear()
+                        cortada = True
+                        continue
+                    print(f"⏸️ Esperando {espera:.0f}s a que Infoleg se recupere...")
+                    time.sleep(espera)
+    finally:
+        # lo que no llegó a procesarse vuelve a pendiente antes del checkpoint final
+        cola.recuperar_en_curso()
+        # el almacén antes que la cola: la cola nunca marca ok algo que no quedó subido
+        subir_almacen()
+        subir_cola()
+        print(f"✔ Fichas ok: {ok} · errores: {errores} · cola: {cola.resumen()}")
+        cola.cerrar()
+        almacen.cerrar()
@@ -1,33 +1,43 @@
 # -*- coding: utf-8 -*-
 
 import os
-import csv
+import sys
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import metricas
+from esquema_digesto import NORMAS, RELACIONES, a_id, tipar, escribir_normas, escribir_relaciones
+
 # ==================================================
 # Paths
 # ==================================================
 
-BASE_DIR = os.path.join(
+# DIGESTO_DATA_DIR / DIGESTO_PROCESADA_DIR permiten correrlo sobre otro corpus (benchmarks)
+BASE_DIR = os.environ.get("DIGESTO_DATA_DIR") or os.path.join(
     os.path.dirname(os.path.abspath(__file__)),
     "..",
     "data"
 )
 
-BASE_PROCESADA = os.path.join(
+BASE_PROCESADA = os.environ.get("DIGESTO_PROCESADA_DIR") or os.path.join(
     os.path.dirname(os.path.abspath(__file__)),
     "..",
     "data_procesada"
 )
 
-os.makedirs(BASE_PROCESADA, exist_ok=True)
+# tamaño de bloque cuando se pide paralelismo sin --bloque: bloques chicos reparten mejor
+# la carga, pero cada uno paga el envío del DataFrame entre procesos
+BLOQUE_PARALELO = 50000
 
 # ==================================================
 # Helpers
 # ==================================================
 
 def normalizar_fecha(serie):
-    return pd.to_datetime(serie, errors="coerce").dt.strftime("%Y-%m-%d")
+    return pd.to_datetime(serie, errors="coerce").dt.normalize()
 
 
 def reparar_mojibake_texto(x):
@@ -41,161 +51,238 @@ def reparar_mojibake_texto(x):
         return x
 
 
+@metricas.perfilar
 def reparar_mojibake_df(df):
     return df.applymap(reparar_mojibake_texto)
 
 
 def leer_csv_reforzado(path):
+    # todo como texto: los ids no pasan por float ("594.0") y cada bloque se lee igual que el archivo entero
     try:
-        df = pd.read_csv(path, encoding="utf-8", low_memory=False)
+        df = pd.read_csv(path, encoding="utf-8", dtype=str)
     except:
-        df = pd.read_csv(path, encoding="utf-8-sig", low_memory=False)
+        df = pd.read_csv(path, encoding="utf-8-sig", dtype=str)
     return reparar_mojibake_df(df)
 
-# ==================================================
-# URL dinámica
-# ==================================================
 
-def reconstruir_url_infoleg(id_norma):
-    return f"https://servicios.infoleg.gob.ar/infolegInternet/verNorma.do?id={id_norma}"
+def leer_csv_por_bloques(path, filas):
+    """Bloques crudos de `filas` filas (utf-8-sig también lee utf-8 sin BOM); el mojibake se repara
+    en la transformación de cada bloque, que puede correr en otro proceso."""
+    with pd.read_csv(path, encoding="utf-8-sig", dtype=str, chunksize=filas) as lector:
+        yield from lector
 
 # ==================================================
-# Procesamiento
+# URLs
 # ==================================================
 
-print("Procesando Infoleg...")
-
-df_norm = leer_csv_reforzado(os.path.join(BASE_DIR, "infoleg_normativa.csv"))
-df_modif = leer_csv_reforzado(os.path.join(BASE_DIR, "infoleg_modificadas.csv"))
-df_modifatorias = leer_csv_reforzado(os.path.join(BASE_DIR, "infoleg_modificatorias.csv"))
+def limpiar_url(serie):
+    """Quita espacios y trata "", "nan", "None" y "0" como URL ausente."""
+    limpia = serie.astype("string").str.strip()
+    return limpia.mask(limpia.isin(["", "nan", "None", "0"]))
 
 # ==================================================
-# Crear digesto_normas
+# Transformaciones (sirven igual para el archivo entero o para un bloque)
 # ==================================================
 
-df_digesto_normas = pd.DataFrame({
-    "id_norma": df_norm["id_norma"],
-    "tipo_norma": df_norm["tipo_norma"],
-    "numero_norma": df_norm["numero_norma"],
-    "fecha_sancion": normalizar_fecha(df_norm["fecha_sancion"]),
-    "organismo": df_norm["organismo_origen"],
-    "titulo_resumido": df_norm["titulo_resumido"],
-    "titulo_sumario": df_norm["titulo_sumario"],
-    "fecha_publicacion": normalizar_fecha(df_norm["fecha_boletin"]),
-    "estado": "",
-    "fuente": "Infoleg",
-    "url_texto_original": df_norm["texto_original"],
-    "url_texto_actualizado": df_norm["texto_actualizado"],
-})
-
-df_digesto_normas = reparar_mojibake_df(df_digesto_normas)
+def transformar_normas(df_norm):
+    df_digesto_normas = pd.DataFrame({
+        "id_norma": df_norm["id_norma"],
+        "tipo_norma": df_norm["tipo_norma"],
+        "numero_norma": df_norm["numero_norma"],
+        "fecha_sancion": normalizar_fecha(df_norm["fecha_sancion"]),
+        "organismo": df_norm["organismo_origen"],
+        "titulo_resumido": df_norm["titulo_resumido"],
+        "titulo_sumario": df_norm["titulo_sumario"],
+        "fecha_publicacion": normalizar_fecha(df_norm["fecha_boletin"]),
+        "estado": "",
+        "fuente": "Infoleg",
+        "url_texto_original": df_norm["texto_original"],
+        "url_texto_actualizado": df_norm["texto_actualizado"],
+    })
+
+    df_digesto_normas = reparar_mojibake_df(df_digesto_normas)
+
+    # ==================================================
+    # Agregar columnas de integración con el scraper
+    # ==================================================
+
+    # la URL dinámica (url_infoleg_ficha), los paths lógicos en Dropbox y texto_original_alternativo
+    # dependen solo de id_norma: los agrega esquema_digesto.derivar al escribir o al leer
+
+    # indicadores (FALSE hasta que descarguemos algo)
+    df_digesto_normas["ficha_descargada"] = False
+    df_digesto_normas["ficha_parseada"] = False
+
+    # info auxiliar
+    df_digesto_normas["tiene_texto_original"] = df_digesto_normas["url_texto_original"].notna()
+    df_digesto_normas["tiene_resumen"] = df_digesto_normas["titulo_sumario"].notna()
+
+    # ==================================================
+    # NORMALIZACIÓN DE id_norma (CLAVE)
+    # ==================================================
+    # "594.0", " 594 ", 594.0 → 594 (Int32); NaN y basura → NA
+
+    df_digesto_normas["id_norma"] = a_id(df_digesto_normas["id_norma"])
+
+    # ==================================================
+    # Normalizar url_texto_original
+    # ==================================================
+
+    df_digesto_normas["url_texto_original"] = limpiar_url(df_digesto_normas["url_texto_original"])
+
+    # NO rellenamos url_texto_original (la alternativa es la columna derivada texto_original_alternativo)
+    df_digesto_normas["resumen_infoleg"] = pd.NA
+
+    # ==================================================
+    # Tipos del esquema (categorías, fechas, bools)
+    # ==================================================
+
+    return tipar(df_digesto_normas, NORMAS)
+
+
+def transformar_relaciones(df_modifatorias, df_modif):
+    """"modifica" desde infoleg_modificatorias y "es_modificada_por" desde infoleg_modificadas."""
+    partes = []
+    if df_modifatorias is not None:
+        partes.append(pd.DataFrame({
+            "id_origen": df_modifatorias["id_norma_modificatoria"],
+            "id_destino": df_modifatorias["id_norma_modificada"],
+            "tipo_relacion": "modifica"
+        }))
+    if df_modif is not None:
+        partes.append(pd.DataFrame({
+            "id_origen": df_modif["id_norma_modificada"],
+            "id_destino": df_modif["id_norma_modificatoria"],
+            "tipo_relacion": "es_modificada_por"
+        }))
+    df_digesto_rel = pd.concat(partes, ignore_index=True)
+    return tipar(df_digesto_rel, RELACIONES)
 
 # ==================================================
-# Agregar columnas de integración con el scraper
+# Bloques en paralelo
 # ==================================================
 
-def construir_url_ficha(id_norma):
-    return f"https://servicios.infoleg.gob.ar/infolegInternet/verNorma.do?id={id_norma}"
+# funciones de módulo (no lambdas) para que se puedan mandar a los procesos del pool
 
-# URL dinámica SIEMPRE presente
-df_digesto_normas["url_infoleg_ficha"] = df_digesto_normas["id_norma"].astype(str).apply(construir_url_ficha)
+def transformar_bloque_normas(df_norm):
+    return transformar_normas(reparar_mojibake_df(df_norm))
 
-# paths lógicos en Dropbox
-df_digesto_normas["path_ficha_html"] = df_digesto_normas["id_norma"].apply(lambda x: f"/fichas_html/{x}.html")
-df_digesto_normas["path_ficha_json"] = df_digesto_normas["id_norma"].apply(lambda x: f"/fichas_json/{x}.json")
 
-# indicadores (FALSE hasta que descarguemos algo)
-df_digesto_normas["ficha_descargada"] = False
-df_digesto_normas["ficha_parseada"] = False
+def transformar_bloque_modificatorias(df_modifatorias):
+    return transformar_relaciones(reparar_mojibake_df(df_modifatorias), None)
 
-# info auxiliar
-df_digesto_normas["tiene_texto_original"] = df_digesto_normas["url_texto_original"].notna()
-df_digesto_normas["tiene_resumen"] = df_digesto_normas["titulo_sumario"].notna()
 
+def transformar_bloque_modificadas(df_modif):
+    return transformar_relaciones(None, reparar_mojibake_df(df_modif))
 
 
+def mapear_en_orden(funcion, bloques, procesos):
+    """Como map(), repartiendo los bloques entre `procesos` procesos.
 
-# ==================================================
-# NORMALIZACIÓN DE id_norma (CLAVE)
-# ==================================================
-# Elimina ".0", convierte todo a string, quita espacios, elimina NaN
-
-df_digesto_normas["id_norma"] = (
-    df_digesto_normas["id_norma"]
-    .astype(str)                     # convierte 594.0 → "594.0"
-    .str.replace(r"\.0$", "", regex=True)   # elimina ".0"
-    .str.strip()                     # quita espacios invisibles
-    .replace({"nan": pd.NA})         # convierte "nan" real a NA
-)
+    Los resultados salen en el orden de entrada (la salida es idéntica con 1 o N procesos) y
+    hay como mucho dos bloques por proceso en vuelo, así la lectura no se adelanta sin límite.
+    """
+    if procesos <= 1:
+        yield from map(funcion, bloques)
+        return
+    with ProcessPoolExecutor(procesos) as pool:
+        en_vuelo = deque()
+        for bloque in bloques:
+            en_vuelo.append(pool.submit(funcion, bloque))
+            if len(en_vuelo) >= 2 * procesos:
+                yield en_vuelo.popleft().result()
+        while en_vuelo:
+            yield en_vuelo.popleft().result()
 
 # ==================================================
-# Normalizar url_texto_original
-# ==================================================
-
-def limpiar_url(x):
-    if not isinstance(x, str):
-        return pd.NA
-    xs = x.strip()
-    if xs in ("", "nan", "None", "0"):
-        return pd.NA
-    return xs
-
-df_digesto_normas["url_texto_original"] = (
-    df_digesto_normas["url_texto_original"]
-    .astype("string")
-    .apply(limpiar_url)
-)
-
-# ==================================================
-# Construir SIEMPRE la alternativa
-# ==================================================
-
-df_digesto_normas["texto_original_alternativo"] = (
-    df_digesto_normas["id_norma"].apply(lambda x: reconstruir_url_infoleg(x) if pd.notna(x) else pd.NA)
-)
-
-# NO rellenamos url_texto_original
-df_digesto_normas["resumen_infoleg"] = pd.NA
-
-# ==================================================
-# Guardar CSV con QUOTE_ALL para que Excel NO corte URLs
+# Procesamiento
 # ==================================================
 
-df_digesto_normas.to_csv(
-    os.path.join(BASE_PROCESADA, "digesto_normas.csv"),
-    index=False,
-    encoding="utf-8-sig",
-    quoting=csv.QUOTE_ALL,
-    escapechar="\\"
-)
-
-print("digesto_normas.csv generado correctamente.")
+def procesar_completo():
+    """Lee los tres CSV enteros en memoria (modo original)."""
+    with metricas.etapa("lectura_csv"):
+        df_norm = leer_csv_reforzado(os.path.join(BASE_DIR, "infoleg_normativa.csv"))
+        df_modif = leer_csv_reforzado(os.path.join(BASE_DIR, "infoleg_modificadas.csv"))
+        df_modifatorias = leer_csv_reforzado(os.path.join(BASE_DIR, "infoleg_modificatorias.csv"))
+        metricas.sumar_filas(len(df_norm) + len(df_modif) + len(df_modifatorias))
+
+    with metricas.etapa("digesto_normas"):
+        df_digesto_normas = transformar_normas(df_norm)
+        escribir_normas(df_digesto_normas, os.path.join(BASE_PROCESADA, "digesto_normas.csv"))
+        metricas.sumar_filas(len(df_digesto_normas))
+    print("digesto_normas.csv generado correctamente.")
+
+    with metricas.etapa("digesto_relaciones"):
+        df_digesto_rel = transformar_relaciones(df_modifatorias, df_modif)
+        escribir_relaciones(df_digesto_rel, os.path.join(BASE_PROCESADA, "digesto_relaciones.csv"))
+        metricas.sumar_filas(len(df_digesto_rel))
+    print("digesto_relaciones.csv generado correctamente.")
+
+
+def procesar_por_bloques(filas, procesos=1):
+    """Lee, transforma y escribe de a `filas` filas: la memoria depende del bloque, no del corpus.
+
+    El archivo de salida se abre una sola vez (el BOM de utf-8-sig va solo al principio)
+    y cada bloque se agrega sin encabezado, así el CSV sale igual que en modo completo.
+    Con `procesos` > 1 los bloques se transforman en paralelo y se escriben en orden.
+    """
+    with metricas.etapa("digesto_normas"):
+        path = os.path.join(BASE_PROCESADA, "digesto_normas.csv")
+        bloques = leer_csv_por_bloques(os.path.join(BASE_DIR, "infoleg_normativa.csv"), filas)
+        with open(path, "w", encoding="utf-8-sig", newline="") as salida:
+            for i, df_digesto_normas in enumerate(mapear_en_orden(transformar_bloque_normas, bloques, procesos)):
+                escribir_normas(df_digesto_normas, salida, encabezado=(i == 0))
+                metricas.sumar_filas(len(df_digesto_normas))
+    print("digesto_normas.csv generado correctamente.")
+
+    with metricas.etapa("digesto_relaciones"):
+        path = os.path.join(BASE_PROCESADA, "digesto_relaciones.csv")
+        fuentes = [
+            ("infoleg_modificatorias.csv", transformar_bloque_modificatorias),
+            ("infoleg_modificadas.csv", transformar_bloque_modificadas),
+        ]
+        primero = True
+        with open(path, "w", encoding="utf-8-sig", newline="") as salida:
+            for archivo, transformar in fuentes:
+                bloques = leer_csv_por_bloques(os.path.join(BASE_DIR, archivo), filas)
+                for df_digesto_rel in mapear_en_orden(transformar, bloques, procesos):
+                    escribir_relaciones(df_digesto_rel, salida, encabezado=primero)
+                    primero = False
+                    metricas.sumar_filas(len(df_digesto_rel))
+    print("digesto_relaciones.csv generado correctamente.")
 
 # ==================================================
-# Crear digesto_relaciones
+# Principal
 # ==================================================
 
-df_rel_modifica = pd.DataFrame({
-    "id_origen": df_modifatorias["id_norma_modificatoria"],
-    "id_destino": df_modifatorias["id_norma_modificada"],
-    "tipo_relacion": "modifica"
-})
-
-df_rel_modificada_por = pd.DataFrame({
-    "id_origen": df_modif["id_norma_modificada"],
-    "id_destino": df_modif["id_norma_modificatoria"],
-    "tipo_relacion": "es_modificada_por"
-})
-
-df_digesto_rel = pd.concat([df_rel_modifica, df_rel_modificada_por], ignore_index=True)
-df_digesto_rel = reparar_mojibake_df(df_digesto_rel)
-
-df_digesto_rel.to_csv(
-    os.path.join(BASE_PROCESADA, "digesto_relaciones.csv"),
-    index=False,
-    encoding="utf-8-sig",
-    quoting=csv.QUOTE_ALL
-)
-
-print("digesto_relaciones.csv generado correctamente.")
-print("Digesto listo.")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera digesto_normas.csv y digesto_relaciones.csv desde los CSV de Infoleg.")
+    parser.add_argument(
+        "--bloque", type=int, default=int(os.environ.get("DIGESTO_BLOQUE_FILAS", "0")),
+        help="procesar de a N filas con memoria acotada (0 = todo en memoria)"
+    )
+    parser.add_argument(
+        "--procesos", type=int, default=int(os.environ.get("DIGESTO_PROCESOS", "1")),
+        help="transformar los bloques en N procesos (0 = uno por núcleo); implica --bloque"
+    )
+    args = parser.parse_args(argv)
+
+    procesos = args.procesos or os.cpu_count() or 1
+    bloque = args.bloque
+    if procesos > 1 and bloque <= 0:
+        bloque = BLOQUE_PARALELO
+
+    os.makedirs(BASE_PROCESADA, exist_ok=True)
+    metricas.iniciar("procesar_infoleg")
+
+    print("Procesando Infoleg...")
+    if bloque > 0:
+        print(f"Modo por bloques de {bloque:,} filas en {procesos} proceso(s).")
+        procesar_por_bloques(bloque, procesos)
+    else:
+        procesar_completo()
+    print("Digesto listo.")
+
+
+if __name__ == "__main__":
+    main()
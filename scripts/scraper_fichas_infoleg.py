@@ -1,12 +1,15 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
 import json
-import time
 import requests
-from bs4 import BeautifulSoup
 import re
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import metricas
+from cliente_infoleg import ClienteAdaptativo, CircuitoAbierto
+
 # ============================================
 # CONFIG (CON TUS SECRETS)
 # ============================================
@@ -20,6 +23,9 @@ BASE_URL = "https://servicios.infoleg.gob.ar/infolegInternet/verNorma.do?id="
 DROPBOX_FOLDER_HTML = "/fichas_html"
 DROPBOX_FOLDER_JSON = "/fichas_json"
 
+# un único cliente por proceso: comparte el límite de concurrencia y el circuit breaker
+CLIENTE_INFOLEG = ClienteAdaptativo()
+
 
 # ============================================
 # TOKEN DROPBOX
@@ -80,16 +86,35 @@ def dropbox_download(path):
 # SCRAP INFOLEG
 # ============================================
 
+class ErrorFicha(Exception):
+    """No se pudo obtener la ficha. `permanente` indica que reintentar no tiene sentido (404, sin ficha)."""
+
+    def __init__(self, motivo, permanente=False):
+        super().__init__(motivo)
+        self.permanente = permanente
+
+
+def descargar_html_infoleg_o_error(id_norma):
+    """Descarga la ficha con el cliente adaptativo (reintentos, backoff y circuit breaker).
+
+    Deja pasar CircuitoAbierto para que quien procesa el lote pueda esperar sin gastar intentos.
+    """
+    try:
+        r = CLIENTE_INFOLEG.get(BASE_URL + str(id_norma))
+    except requests.RequestException as e:
+        raise ErrorFicha(type(e).__name__)
+    if r.status_code == 200:
+        return r.text
+    if r.status_code == 404:
+        raise ErrorFicha("http 404", permanente=True)
+    raise ErrorFicha(f"http {r.status_code}")
+
+
 def descargar_html_infoleg(id_norma):
-    url = BASE_URL + str(id_norma)
-    for _ in range(3):
-        try:
-            r = requests.get(url, timeout=10)
-            if r.status_code == 200:
-                return r.text
-        except:
-            time.sleep(1.5)
-    return None
+    try:
+        return descargar_html_infoleg_o_error(id_norma)
+    except (ErrorFicha, CircuitoAbierto):
+        return None
 
 
 # ============================================
@@ -231,7 +256,9 @@ def parsear_profundo(soup):
 # PARSEO GENERAL DE FICHA
 # ============================================
 
+@metricas.perfilar
 def parsear_html(id_norma, html):
+    from bs4 import BeautifulSoup   # solo quien parsea fichas paga el import
     soup = BeautifulSoup(html, "html.parser")
     box = soup.find("div", {"id": "Textos_Completos"})
     if not box:
@@ -309,45 +336,64 @@ def parsear_html(id_norma, html):
 # FUNCIÓN PRINCIPAL
 # ============================================
 
-def obtener_ficha(id_norma):
+def obtener_ficha_o_error(id_norma, almacen=None):
+    """Igual que obtener_ficha pero levanta ErrorFicha con el motivo en vez de devolver None.
+
+    Con `almacen` (AlmacenFichas) las fichas se leen y se guardan en el almacén empaquetado;
+    los archivos sueltos de /fichas_json y /fichas_html se siguen leyendo como respaldo.
+    """
     json_path = f"{DROPBOX_FOLDER_JSON}/{id_norma}.json"
     html_path = f"{DROPBOX_FOLDER_HTML}/{id_norma}.html"
 
-    contenido_json = dropbox_download(json_path)
-    if contenido_json:
-        return json.loads(contenido_json.decode("utf-8"))
+    if almacen is not None:
+        data = almacen.leer_json(id_norma)
+        if data is not None:
+            return data
+        contenido_html = almacen.leer("html", id_norma)
+    else:
+        contenido_html = None
+
+    if contenido_html is None:
+        contenido_json = dropbox_download(json_path)
+        if contenido_json:
+            if almacen is not None:
+                almacen.agregar("json", id_norma, contenido_json)
+            return json.loads(contenido_json.decode("utf-8"))
+        contenido_html = dropbox_download(html_path)
 
-    contenido_html = dropbox_download(html_path)
     if contenido_html:
         html = contenido_html.decode("utf-8")
-        data = parsear_html(id_norma, html)
-        if data:
-            dropbox_upload(
-                json_path,
-                json.dumps(data, ensure_ascii=False).encode("utf-8")
-            )
-        return data
-
-    html = descargar_html_infoleg(id_norma)
-    if not html:
-        return None
-
-    dropbox_upload(html_path, html.encode("utf-8"))
+    else:
+        html = descargar_html_infoleg_o_error(id_norma)
+        guardar(almacen, "html", id_norma, html_path, html.encode("utf-8"))
 
     data = parsear_html(id_norma, html)
-    if data:
-        dropbox_upload(
-            json_path,
-            json.dumps(data, ensure_ascii=False).encode("utf-8")
-        )
+    if not data:
+        raise ErrorFicha("ficha sin Textos_Completos", permanente=True)
 
+    guardar(almacen, "json", id_norma, json_path, json.dumps(data, ensure_ascii=False).encode("utf-8"))
     return data
 
 
+def guardar(almacen, tipo, id_norma, dropbox_path, contenido):
+    if almacen is not None:
+        almacen.agregar(tipo, id_norma, contenido)
+    else:
+        dropbox_upload(dropbox_path, contenido)
+
+
+def obtener_ficha(id_norma, almacen=None):
+    try:
+        return obtener_ficha_o_error(id_norma, almacen)
+    except (ErrorFicha, CircuitoAbierto):
+        return None
+
+
 # ============================================
 # TEST
 # ============================================
 
 if __name__ == "__main__":
+    metricas.iniciar("scraper_fichas_infoleg")
     print(json.dumps(obtener_ficha(283855), indent=2, ensure_ascii=False))
 
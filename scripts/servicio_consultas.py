@@ -0,0 +1,683 @@
+# -*- coding: utf-8 -*-
+
+"""Servicio de consultas sobre el digesto: normas por id, búsqueda y vecindario en la telaraña.
+
+El pipeline publica una "versión" de artefactos listos para consultar y el servicio la abre una
+sola vez con mmap (nada se parsea por consulta):
+
+    normas/             digesto_normas ordenado por id_norma (sin columnas derivadas), cada fila ya
+                        en JSON (filas.jsonl + offsets.npy), con ids.npy y grupos.npy: se abre sin
+                        cargar pandas
+    grafo/              CSR de aristas salientes (salida_*) y entrantes (entrada_*) en .npy
+    indice_bm25/        índice invertido de indice_busqueda.py
+    indice_textos/      (opcional) índice de pasajes por artículo de los textos completos (pasajes.py)
+    indice_temporal/    índice de modificaciones de indice_temporal.py en .npy
+    embeddings.npy      (opcional) vectores de las normas para búsqueda semántica
+
+El manifiesto (manifiesto.json) trae además los conteos de la versión, para que `estado` no
+tenga que abrir nada.
+
+Las versiones viven en servicio/versiones/<version>/ y servicio/ACTUAL dice cuál está vigente.
+ACTUAL se reescribe con un rename al final de la publicación: el servicio lo revisa cada
+INTERVALO_RECARGA segundos y, si cambió, abre la versión nueva completa y recién ahí la pone en
+uso (las consultas en curso terminan con la anterior). Las respuestas se guardan en un LRU
+acotado por bytes.
+
+Uso:
+    python scripts/servicio_consultas.py publicar
+    python scripts/servicio_consultas.py servir --puerto 8080
+    python scripts/servicio_consultas.py consultar "/buscar?q=emergencia sanitaria"
+
+Endpoints (GET, responden JSON):
+    /norma/<id>                         fila de digesto_normas
+    /buscar?q=...&k=10                  BM25 sobre títulos y resúmenes
+    /buscar?q=...&indice=textos         BM25 sobre los artículos del texto completo, agrupado por norma
+    /similares?q=...&k=10               búsqueda semántica (si la versión tiene embeddings)
+    /similares?q=...&indice=textos      búsqueda semántica sobre pasajes (si se indexaron con embeddings)
+                                        (buscar y similares muestran una norma por grupo de casi
+                                        duplicados; &duplicados=mostrar las trae todas)
+    /duplicados/<id>                    normas del grupo de casi duplicados (duplicados.py)
+    /vecinos/<id>?direccion=ambas&tipo= normas vinculadas en la telaraña
+    /version/<id>?fecha=AAAA-MM-DD      versión vigente según el índice temporal
+    /estado                             versión publicada y uso del caché
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import shutil
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import pasajes
+import indice_busqueda
+from esquema_digesto import URL_VER_NORMA
+from indice_temporal import IndiceTemporal
+
+# ============================================
+# CONFIG
+# ============================================
+
+DROPBOX_CLIENT_ID = os.environ.get("APP_KEY")
+DROPBOX_CLIENT_SECRET = os.environ.get("APP_SECRET")
+DROPBOX_REFRESH_TOKEN = os.environ.get("REFRESH_TOKEN")
+
+SERVICIO_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "data_procesada",
+    "servicio"
+)
+DROPBOX_SERVICIO_FOLDER = "/data_procesada/servicio"
+ACTUAL = "ACTUAL"
+
+CACHE_BYTES = int(os.environ.get("DIGESTO_CACHE_MB", "64")) * 2**20
+INTERVALO_RECARGA = 30         # segundos entre revisiones de ACTUAL
+VERSIONES_A_MANTENER = 2       # la vigente y la anterior (por si un proceso todavía la tiene abierta)
+K_MAX = 100
+FILAS_POR_BLOQUE = 50000       # normas por bloque al serializar normas/filas.jsonl
+CANDIDATOS_POR_RESULTADO = 3   # al colapsar casi duplicados se piden k*3 para que queden k distintos
+
+COLUMNAS_RESULTADO = ["id_norma", "tipo_norma", "numero_norma", "fecha_publicacion", "titulo_resumido"]
+
+
+class NoEncontrado(Exception):
+    """La consulta es válida pero no hay nada que devolver (HTTP 404)."""
+
+
+class ConsultaInvalida(Exception):
+    """Faltan parámetros o tienen un formato que no se entiende (HTTP 400)."""
+
+# ============================================
+# DROPBOX
+# ============================================
+
+# requests se importa en cada función: consultar una versión local no lo necesita
+
+def dropbox_get_access_token():
+    import requests
+    data = {
+        "grant_type": "refresh_token",
+        "refresh_token": DROPBOX_REFRESH_TOKEN,
+        "client_id": DROPBOX_CLIENT_ID,
+        "client_secret": DROPBOX_CLIENT_SECRET,
+    }
+    r = requests.post("https://api.dropbox.com/oauth2/token", data=data)
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+def dropbox_download(token, remoto):
+    import requests
+    headers = {"Authorization": f"Bearer {token}", "Dropbox-API-Arg": json.dumps({"path": remoto})}
+    r = requests.post("https://content.dropboxapi.com/2/files/download", headers=headers)
+    return r.content if r.status_code == 200 else None
+
+
+def dropbox_download_a_archivo(token, remoto, local):
+    import requests
+    headers = {"Authorization": f"Bearer {token}", "Dropbox-API-Arg": json.dumps({"path": remoto})}
+    with requests.post("https://content.dropboxapi.com/2/files/download", headers=headers, stream=True) as r:
+        r.raise_for_status()
+        with open(local, "wb") as f:
+            for bloque in r.iter_content(2**20):
+                f.write(bloque)
+
+
+def dropbox_upload_archivo(token, local, remoto):
+    import requests
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/octet-stream",
+        "Dropbox-API-Arg": json.dumps({"path": remoto, "mode": "overwrite", "autorename": False}),
+    }
+    with open(local, "rb") as f:
+        r = requests.post("https://content.dropboxapi.com/2/files/upload", headers=headers, data=f)
+    r.raise_for_status()
+
+
+def subir_version(version, base=SERVICIO_DIR):
+    """Sube una versión a Dropbox; ACTUAL se sube al final, cuando ya está todo lo que nombra."""
+    token = dropbox_get_access_token()
+    directorio = os.path.join(base, "versiones", version)
+    for raiz, _, archivos in os.walk(directorio):
+        for nombre in sorted(archivos):
+            local = os.path.join(raiz, nombre)
+            relativo = os.path.relpath(local, directorio).replace(os.sep, "/")
+            dropbox_upload_archivo(token, local, f"{DROPBOX_SERVICIO_FOLDER}/versiones/{version}/{relativo}")
+    dropbox_upload_archivo(token, os.path.join(base, ACTUAL), f"{DROPBOX_SERVICIO_FOLDER}/{ACTUAL}")
+
+
+def bajar_version_publicada(base=SERVICIO_DIR):
+    """Si en Dropbox hay una versión más nueva que la local, la baja y la activa. Devuelve la versión."""
+    token = dropbox_get_access_token()
+    remota = dropbox_download(token, f"{DROPBOX_SERVICIO_FOLDER}/{ACTUAL}")
+    if not remota:
+        return None
+    version = remota.decode("utf-8").strip()
+    if version == version_actual(base):
+        return version
+
+    remoto_manifiesto = f"{DROPBOX_SERVICIO_FOLDER}/versiones/{version}/manifiesto.json"
+    manifiesto = json.loads(dropbox_download(token, remoto_manifiesto))
+    tmp = os.path.join(base, "versiones", version + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    for relativo in manifiesto["archivos"]:
+        local = os.path.join(tmp, *relativo.split("/"))
+        os.makedirs(os.path.dirname(local), exist_ok=True)
+        dropbox_download_a_archivo(token, f"{DROPBOX_SERVICIO_FOLDER}/versiones/{version}/{relativo}", local)
+    os.rename(tmp, os.path.join(base, "versiones", version))
+    activar(version, base)
+    print(f"⬇️ Versión {version} bajada de Dropbox", file=sys.stderr)
+    return version
+
+# ============================================
+# PUBLICACIÓN
+# ============================================
+
+def version_actual(base=SERVICIO_DIR):
+    try:
+        with open(os.path.join(base, ACTUAL), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def activar(version, base=SERVICIO_DIR):
+    """Apunta ACTUAL a `version` con un rename (atómico) y borra versiones viejas."""
+    tmp = os.path.join(base, ACTUAL + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp, os.path.join(base, ACTUAL))
+
+    versiones = sorted(v for v in os.listdir(os.path.join(base, "versiones")) if not v.endswith(".tmp"))
+    for vieja in versiones[:-VERSIONES_A_MANTENER]:
+        if vieja != version:
+            shutil.rmtree(os.path.join(base, "versiones", vieja), ignore_errors=True)
+
+
+def _guardar_arrays(directorio, arrays):
+    os.makedirs(directorio, exist_ok=True)
+    for nombre, array in arrays.items():
+        np.save(os.path.join(directorio, f"{nombre}.npy"), array)
+
+
+def _guardar_filas(directorio, df_normas):
+    """normas/: cada fila en JSON (un renglón por norma) y dónde empieza cada una.
+
+    Leer una fila es un slice del archivo mapeado y un json.loads: el servicio arranca sin
+    pandas.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    fechas = [c for c in df_normas.columns if str(df_normas[c].dtype).startswith("datetime64")]
+    offsets, escritos = [np.zeros(1, dtype=np.int64)], 0
+    with open(os.path.join(directorio, "filas.jsonl"), "wb") as f:
+        for inicio in range(0, len(df_normas), FILAS_POR_BLOQUE):
+            bloque = df_normas.iloc[inicio:inicio + FILAS_POR_BLOQUE].copy()
+            for col in fechas:
+                bloque[col] = bloque[col].dt.strftime("%Y-%m-%d")
+            datos = bloque.to_json(orient="records", lines=True, force_ascii=False, double_precision=15).encode("utf-8")
+            if not datos.endswith(b"\n"):
+                datos += b"\n"
+            # dentro de un JSON los saltos de línea van escapados: cada \n cierra una fila
+            offsets.append(np.flatnonzero(np.frombuffer(datos, dtype=np.uint8) == 10) + 1 + escritos)
+            f.write(datos)
+            escritos += len(datos)
+    arrays = {"ids": df_normas["id_norma"].to_numpy("int32"), "offsets": np.concatenate(offsets)}
+    if "grupo_duplicados" in df_normas.columns:
+        arrays["grupos"] = df_normas["grupo_duplicados"].to_numpy("int32", na_value=-1)
+    _guardar_arrays(directorio, arrays)
+
+
+def publicar(normas_csv, relaciones_csv, base=SERVICIO_DIR, embeddings=False, textos_dir=indice_busqueda.TEXTOS_DIR):
+    """Arma una versión nueva de los artefactos y la activa. Devuelve el nombre de la versión."""
+    from esquema_digesto import DERIVADAS, leer_normas, leer_relaciones
+    from exportar_grafo import armar_csr
+    import indice_temporal
+
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    tmp = os.path.join(base, "versiones", version + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    df_normas = leer_normas(normas_csv)
+    df_normas = df_normas.dropna(subset=["id_norma"]).drop_duplicates("id_norma")
+    df_normas = df_normas.drop(columns=[c for c in DERIVADAS if c in df_normas.columns])
+    df_normas = df_normas.sort_values("id_norma", ignore_index=True)
+    _guardar_filas(os.path.join(tmp, "normas"), df_normas)
+    print(f"✔ normas/: {len(df_normas):,} normas")
+
+    df_rel = leer_relaciones(relaciones_csv).dropna(subset=["id_origen", "id_destino"])
+    for sentido, invertir in (("salida", False), ("entrada", True)):
+        csr = armar_csr(df_rel, invertir=invertir)
+        _guardar_arrays(os.path.join(tmp, "grafo"), {f"{sentido}_{k}": v for k, v in csr.items()})
+    print(f"✔ grafo: {len(df_rel):,} aristas")
+
+    indice_busqueda.guardar(indice_busqueda.construir(indice_busqueda.documentos_normas(df_normas)),
+                            os.path.join(tmp, "indice_bm25"))
+    _guardar_arrays(os.path.join(tmp, "indice_temporal"), indice_temporal.construir(df_rel, df_normas))
+    print("✔ índices BM25 y temporal")
+
+    segmentos_textos = indice_busqueda.segmentos(textos_dir)
+    for numero in segmentos_textos:
+        origen = indice_busqueda.ruta_segmento(textos_dir, numero)
+        shutil.copytree(origen, os.path.join(tmp, "indice_textos", os.path.basename(origen)))
+    n_pasajes = 0
+    if segmentos_textos:
+        n_pasajes = pasajes.IndicePasajes(os.path.join(tmp, "indice_textos")).n_pasajes
+        print(f"✔ índice de textos completos ({len(segmentos_textos)} segmentos, {n_pasajes:,} pasajes)")
+
+    if embeddings:
+        modelo = indice_busqueda.cargar_modelo()
+        textos = [texto for _, texto in indice_busqueda.documentos_normas(df_normas)]
+        np.save(os.path.join(tmp, "embeddings.npy"), indice_busqueda.calcular_embeddings(textos, modelo))
+        print(f"✔ embeddings ({indice_busqueda.MODELO_EMBEDDINGS})")
+
+    archivos = sorted(
+        os.path.relpath(os.path.join(raiz, n), tmp).replace(os.sep, "/")
+        for raiz, _, nombres in os.walk(tmp) for n in nombres
+    )
+    with open(os.path.join(tmp, "manifiesto.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": version, "archivos": archivos + ["manifiesto.json"],
+                   "modelo_embeddings": indice_busqueda.MODELO_EMBEDDINGS if embeddings else None,
+                   "normas": len(df_normas), "aristas": len(df_rel), "pasajes": n_pasajes}, f, indent=2)
+
+    os.rename(tmp, os.path.join(base, "versiones", version))
+    activar(version, base)
+    print(f"✔ Versión {version} publicada")
+    return version
+
+# ============================================
+# ARTEFACTOS
+# ============================================
+
+def _cargar_arrays(directorio, prefijo=""):
+    return {
+        nombre[len(prefijo):-4]: np.load(os.path.join(directorio, nombre), mmap_mode="r")
+        for nombre in os.listdir(directorio)
+        if nombre.startswith(prefijo) and nombre.endswith(".npy")
+    }
+
+
+class Artefactos:
+    """Una versión publicada, abierta con mmap. Es de solo lectura: se reemplaza entera al recargar."""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        with open(os.path.join(directorio, "manifiesto.json"), encoding="utf-8") as f:
+            self.manifiesto = json.load(f)
+        self.version = self.manifiesto["version"]
+
+        normas = _cargar_arrays(os.path.join(directorio, "normas"))
+        self.ids, self.offsets = normas["ids"], normas["offsets"]
+        # grupo de casi duplicados de cada norma, alineado con ids (-1: sin grupo)
+        self.grupos = normas.get("grupos")
+        path_filas = os.path.join(directorio, "normas", "filas.jsonl")
+        with open(path_filas, "rb") as f:
+            self._filas = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path_filas) else b""
+        grafo = os.path.join(directorio, "grafo")
+        self.salida = _cargar_arrays(grafo, "salida_")
+        self.entrada = _cargar_arrays(grafo, "entrada_")
+        self.bm25 = indice_busqueda.IndiceBM25(os.path.join(directorio, "indice_bm25"))
+        textos = os.path.join(directorio, "indice_textos")
+        self.textos = pasajes.IndicePasajes(textos) if os.path.isdir(textos) else None
+        self.temporal = IndiceTemporal(_cargar_arrays(os.path.join(directorio, "indice_temporal")))
+
+        path_embeddings = os.path.join(directorio, "embeddings.npy")
+        self.embeddings = np.load(path_embeddings, mmap_mode="r") if os.path.exists(path_embeddings) else None
+        self._modelos = {}
+        self._lock_modelo = threading.Lock()
+
+    # ---------- normas ----------
+
+    def posicion(self, id_norma):
+        i = int(np.searchsorted(self.ids, id_norma))
+        if i >= len(self.ids) or self.ids[i] != id_norma:
+            raise NoEncontrado(f"no existe la norma {id_norma}")
+        return i
+
+    def filas(self, posiciones, columnas=None):
+        filas = [json.loads(self._filas[self.offsets[i]:self.offsets[i + 1]]) for i in posiciones]
+        if columnas:
+            filas = [{c: fila[c] for c in columnas if c in fila} for fila in filas]
+        return filas
+
+    def norma(self, id_norma):
+        fila = self.filas([self.posicion(id_norma)])[0]
+        fila["url_infoleg_ficha"] = f"{URL_VER_NORMA}{id_norma}"
+        return fila
+
+    def _con_normas(self, hits, campo_puntaje, k, colapsar=True):
+        """Agrega los datos básicos de cada norma a una lista de (id_norma, puntaje[, artículos]).
+
+        Con `colapsar` queda solo la mejor de cada grupo de casi duplicados y las demás se
+        cuentan en "duplicados_ocultos".
+        """
+        conocidos, ocultos, primera = [], {}, {}
+        for hit in hits:
+            if hit[0] not in self:
+                continue
+            grupo = self.grupos[self.posicion(hit[0])] if colapsar and self.grupos is not None else -1
+            if grupo >= 0 and grupo in primera:
+                ocultos[primera[grupo]] = ocultos.get(primera[grupo], 0) + 1
+                continue
+            if len(conocidos) == k:
+                continue
+            primera[grupo] = hit[0]
+            conocidos.append(hit)
+        filas = self.filas([self.posicion(hit[0]) for hit in conocidos], COLUMNAS_RESULTADO)
+        for fila, hit in zip(filas, conocidos):
+            fila[campo_puntaje] = round(hit[1], 4)
+            if len(hit) > 2:
+                fila["articulos"] = hit[2]
+            if hit[0] in ocultos:
+                fila["duplicados_ocultos"] = ocultos[hit[0]]
+        return filas
+
+    def duplicados(self, id_norma):
+        """Normas del grupo de casi duplicados de `id_norma` (ella incluida); [] si no tiene."""
+        grupo = self.grupos[self.posicion(id_norma)] if self.grupos is not None else -1
+        if grupo < 0:
+            return []
+        return self.filas(np.flatnonzero(self.grupos == grupo), COLUMNAS_RESULTADO)
+
+    def __contains__(self, id_norma):
+        i = int(np.searchsorted(self.ids, id_norma))
+        return i < len(self.ids) and self.ids[i] == id_norma
+
+    # ---------- búsqueda ----------
+
+    def _indice_textos(self, indice):
+        if indice not in ("normas", "textos"):
+            raise ConsultaInvalida("indice debe ser normas o textos")
+        if indice == "textos" and self.textos is None:
+            raise NoEncontrado("esta versión no tiene índice de textos completos")
+        return indice == "textos"
+
+    def _candidatos(self, k, colapsar):
+        return k * CANDIDATOS_POR_RESULTADO if colapsar and self.grupos is not None else k
+
+    def buscar(self, consulta, k=10, indice="normas", colapsar=True):
+        n = self._candidatos(k, colapsar)
+        if self._indice_textos(indice):
+            return self._con_normas(self.textos.buscar(consulta, n), "puntaje", k, colapsar)
+        return self._con_normas(self.bm25.buscar(consulta, n), "puntaje", k, colapsar)
+
+    def _vector(self, consulta, nombre_modelo):
+        with self._lock_modelo:
+            if nombre_modelo not in self._modelos:
+                self._modelos[nombre_modelo] = indice_busqueda.cargar_modelo(nombre_modelo)
+        return indice_busqueda.calcular_embeddings([consulta], self._modelos[nombre_modelo])[0]
+
+    def similares(self, consulta, k=10, indice="normas", colapsar=True):
+        n = self._candidatos(k, colapsar)
+        if self._indice_textos(indice):
+            modelo = self.textos.modelo_embeddings()
+            if modelo is None:
+                raise NoEncontrado("los pasajes de esta versión no tienen embeddings (textos_normas.py --embeddings)")
+            return self._con_normas(self.textos.similares(self._vector(consulta, modelo), n), "similitud", k, colapsar)
+        if self.embeddings is None:
+            raise NoEncontrado("esta versión no tiene embeddings (publicar con --embeddings)")
+        hits = indice_busqueda.buscar_semantico(self.embeddings, self._vector(consulta, self.manifiesto["modelo_embeddings"]), n)
+        return self._con_normas([(int(self.ids[i]), s) for i, s in hits], "similitud", k, colapsar)
+
+    # ---------- telaraña ----------
+
+    def _vecinos(self, csr, id_norma, sentido, tipo):
+        i = np.searchsorted(csr["nodos"], id_norma)
+        if i >= len(csr["nodos"]) or csr["nodos"][i] != id_norma:
+            return []
+        tramo = slice(csr["indptr"][i], csr["indptr"][i + 1])
+        tipos = csr["tipos"]
+        return [
+            {"id_norma": int(csr["nodos"][j]), "tipo_relacion": str(tipos[t]), "sentido": sentido}
+            for j, t in zip(csr["indices"][tramo], csr["tipo"][tramo])
+            if tipo is None or tipos[t] == tipo
+        ]
+
+    def vecinos(self, id_norma, direccion="ambas", tipo=None):
+        if direccion not in ("salida", "entrada", "ambas"):
+            raise ConsultaInvalida("direccion debe ser salida, entrada o ambas")
+        vecinos = []
+        if direccion in ("salida", "ambas"):
+            vecinos += self._vecinos(self.salida, id_norma, "salida", tipo)
+        if direccion in ("entrada", "ambas"):
+            vecinos += self._vecinos(self.entrada, id_norma, "entrada", tipo)
+        return vecinos
+
+    def version_en(self, id_norma, fecha):
+        version, ultima = self.temporal.version_en(id_norma, fecha)
+        return {"id_norma": id_norma, "fecha": fecha, "version": version, "ultima_modificadora": ultima}
+
+
+# ============================================
+# CACHÉ
+# ============================================
+
+class CacheLRU:
+    """LRU de respuestas ya serializadas, acotado por la suma de bytes (no por cantidad)."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.datos = OrderedDict()
+        self.lock = threading.Lock()
+        self.aciertos = self.fallos = 0
+
+    def obtener(self, clave):
+        with self.lock:
+            valor = self.datos.get(clave)
+            if valor is None:
+                self.fallos += 1
+                return None
+            self.datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave, valor):
+        if len(valor) > self.max_bytes:
+            return
+        with self.lock:
+            if clave in self.datos:
+                self.bytes -= len(self.datos.pop(clave))
+            self.datos[clave] = valor
+            self.bytes += len(valor)
+            while self.bytes > self.max_bytes:
+                _, viejo = self.datos.popitem(last=False)
+                self.bytes -= len(viejo)
+
+    def vaciar(self):
+        with self.lock:
+            self.datos.clear()
+            self.bytes = 0
+
+    def estadisticas(self):
+        with self.lock:
+            return {"entradas": len(self.datos), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "aciertos": self.aciertos, "fallos": self.fallos}
+
+# ============================================
+# SERVICIO
+# ============================================
+
+class Servicio:
+    def __init__(self, base=SERVICIO_DIR, cache_bytes=CACHE_BYTES, desde_dropbox=False):
+        self.base = base
+        self.desde_dropbox = desde_dropbox
+        self.cache = CacheLRU(cache_bytes)
+        self.artefactos = None
+        self._lock_recarga = threading.Lock()
+        self.recargar()
+
+    def recargar(self):
+        """Abre la versión de ACTUAL si es distinta de la que está en uso. Devuelve True si cambió.
+
+        Los avisos van a stderr: en `consultar` stdout es solo el JSON de la respuesta.
+        """
+        with self._lock_recarga:
+            if self.desde_dropbox:
+                import requests
+                try:
+                    bajar_version_publicada(self.base)
+                except (requests.RequestException, ValueError) as e:
+                    print(f"⚠️ No se pudo revisar Dropbox: {e}", file=sys.stderr)
+            version = version_actual(self.base)
+            if version is None or (self.artefactos and self.artefactos.version == version):
+                return False
+            nuevos = Artefactos(os.path.join(self.base, "versiones", version))
+            # una sola asignación: cada consulta toma self.artefactos una vez y sigue con esa versión
+            self.artefactos = nuevos
+            self.cache.vaciar()
+            print(f"🔄 Versión {version} en uso", file=sys.stderr)
+            return True
+
+    def vigilar(self, intervalo=INTERVALO_RECARGA):
+        def bucle():
+            while True:
+                time.sleep(intervalo)
+                try:
+                    self.recargar()
+                except Exception as e:  # una versión rota no tira el servicio: sigue la anterior
+                    print(f"⚠️ Error al recargar: {type(e).__name__}: {e}", file=sys.stderr)
+        threading.Thread(target=bucle, daemon=True, name="recarga").start()
+
+    def _responder(self, artefactos, partes, params):
+        def param(nombre, defecto=None):
+            return params.get(nombre, [defecto])[0]
+
+        def entero(valor, nombre):
+            try:
+                return int(valor)
+            except (TypeError, ValueError):
+                raise ConsultaInvalida(f"{nombre} debe ser un entero")
+
+        k = min(entero(param("k", 10), "k"), K_MAX)
+        if partes == ["estado"]:
+            return {"version": artefactos.version, "normas": len(artefactos.ids),
+                    "embeddings": artefactos.embeddings is not None,
+                    "pasajes": artefactos.textos.n_pasajes if artefactos.textos is not None else 0,
+                    "cache": self.cache.estadisticas()}
+        if len(partes) == 2 and partes[0] == "norma":
+            return artefactos.norma(entero(partes[1], "id_norma"))
+        if partes in (["buscar"], ["similares"]):
+            consulta = param("q")
+            if not consulta:
+                raise ConsultaInvalida("falta q")
+            duplicados = param("duplicados", "colapsar")
+            if duplicados not in ("colapsar", "mostrar"):
+                raise ConsultaInvalida("duplicados debe ser colapsar o mostrar")
+            return {"resultados": getattr(artefactos, partes[0])(
+                consulta, k, param("indice", "normas"), duplicados == "colapsar")}
+        if len(partes) == 2 and partes[0] == "duplicados":
+            id_norma = entero(partes[1], "id_norma")
+            return {"id_norma": id_norma, "duplicados": artefactos.duplicados(id_norma)}
+        if len(partes) == 2 and partes[0] == "vecinos":
+            id_norma = entero(partes[1], "id_norma")
+            return {"id_norma": id_norma, "vecinos": artefactos.vecinos(id_norma, param("direccion", "ambas"), param("tipo"))}
+        if len(partes) == 2 and partes[0] == "version":
+            fecha = param("fecha")
+            if not fecha:
+                raise ConsultaInvalida("falta fecha")
+            try:
+                return artefactos.version_en(entero(partes[1], "id_norma"), fecha)
+            except ValueError:
+                raise ConsultaInvalida(f"fecha inválida: {fecha}")
+        raise NoEncontrado("ruta desconocida")
+
+    def consultar(self, ruta):
+        """Resuelve una ruta ("/buscar?q=...") y devuelve (status, cuerpo JSON en bytes)."""
+        artefactos = self.artefactos
+        if artefactos is None:
+            return 503, b'{"error": "no hay ninguna versi\\u00f3n publicada"}'
+        url = urlsplit(ruta)
+        partes = [p for p in url.path.split("/") if p]
+        params = parse_qs(url.query)
+        # /estado cambia con cada consulta: no se cachea
+        clave = None if partes == ["estado"] else (artefactos.version, url.path, tuple(sorted(
+            (k, tuple(v)) for k, v in params.items())))
+
+        if clave is not None:
+            cuerpo = self.cache.obtener(clave)
+            if cuerpo is not None:
+                return 200, cuerpo
+        try:
+            status, respuesta = 200, self._responder(artefactos, partes, params)
+        except NoEncontrado as e:
+            status, respuesta = 404, {"error": str(e)}
+        except ConsultaInvalida as e:
+            status, respuesta = 400, {"error": str(e)}
+        cuerpo = json.dumps(respuesta, ensure_ascii=False).encode("utf-8")
+        if status == 200 and clave is not None:
+            self.cache.guardar(clave, cuerpo)
+        return status, cuerpo
+
+
+def servir(servicio, host, puerto):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            try:
+                status, cuerpo = servicio.consultar(self.path)
+            except Exception as e:
+                status, cuerpo = 500, json.dumps({"error": f"{type(e).__name__}: {e}"}).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, formato, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, puerto), Manejador)
+    servidor.daemon_threads = True
+    print(f"✔ Escuchando en http://{host}:{puerto}")
+    servidor.serve_forever()
+
+# ============================================
+# PRINCIPAL
+# ============================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base", default=SERVICIO_DIR)
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("publicar", help="arma una versión nueva de los artefactos y la activa")
+    p.add_argument("--normas", default="data_procesada/digesto_normas.csv")
+    p.add_argument("--relaciones", default="data_procesada/digesto_relaciones_expandido.csv")
+    p.add_argument("--embeddings", action="store_true", help="calcular embeddings (sentence-transformers)")
+    p.add_argument("--textos", default=indice_busqueda.TEXTOS_DIR, help="índice de textos completos (si existe)")
+    p.add_argument("--subir", action="store_true", help="subir la versión a Dropbox")
+
+    p = sub.add_parser("servir")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--puerto", type=int, default=8080)
+    p.add_argument("--dropbox", action="store_true", help="bajar de Dropbox las versiones que publica el pipeline")
+    p.add_argument("--intervalo", type=float, default=INTERVALO_RECARGA, help="segundos entre revisiones de ACTUAL")
+
+    p = sub.add_parser("consultar", help="resuelve una ruta sin levantar el servidor")
+    p.add_argument("ruta")
+    args = parser.parse_args()
+
+    if args.comando == "publicar":
+        version = publicar(args.normas, args.relaciones, args.base, args.embeddings, args.textos)
+        if args.subir:
+            subir_version(version, args.base)
+    elif args.comando == "servir":
+        servicio = Servicio(args.base, desde_dropbox=args.dropbox)
+        servicio.vigilar(args.intervalo)
+        servir(servicio, args.host, args.puerto)
+    else:
+        status, cuerpo = Servicio(args.base).consultar(args.ruta)
+        print(json.dumps(json.loads(cuerpo), ensure_ascii=False, indent=2))
+        sys.exit(0 if status == 200 else 1)
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
 import json
 import requests
-import pandas as pd
-import csv
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import metricas
+from esquema_digesto import leer_normas, escribir_normas, ids_enteros
 
 # ============================================
 # CONFIG (USANDO TUS SECRETS)
@@ -115,51 +118,59 @@ def dropbox_delete(path):
 
 if __name__ == "__main__":
 
-    print("📌 Leyendo digesto_normas.csv local...")
-    df = pd.read_csv("data_procesada/digesto_normas.csv", dtype=str)
-
-    print("📌 Listando HTML en Dropbox (con paginación)...")
-    archivos_html = dropbox_list_folder(DROPBOX_FOLDER_HTML)
-    ids_html = {fname.replace(".html", "") for fname in archivos_html}
+    metricas.iniciar("sync_fichas_dropbox")
 
-    print("📌 Listando JSON en Dropbox (con paginación)...")
-    archivos_json = dropbox_list_folder(DROPBOX_FOLDER_JSON)
-    ids_json = {fname.replace(".json", "") for fname in archivos_json}
+    print("📌 Leyendo digesto_normas.csv local...")
+    with metricas.etapa("lectura_normas"):
+        df = leer_normas("data_procesada/digesto_normas.csv")
+        metricas.sumar_filas(len(df))
+
+    with metricas.etapa("listado_dropbox"):
+        print("📌 Listando HTML en Dropbox (con paginación)...")
+        archivos_html = dropbox_list_folder(DROPBOX_FOLDER_HTML)
+        ids_html = {fname.replace(".html", "") for fname in archivos_html}
+
+        print("📌 Listando JSON en Dropbox (con paginación)...")
+        archivos_json = dropbox_list_folder(DROPBOX_FOLDER_JSON)
+        ids_json = {fname.replace(".json", "") for fname in archivos_json}
+        metricas.sumar_filas(len(archivos_html) + len(archivos_json))
+
+        print("📌 Leyendo índice del almacén empaquetado...")
+        from almacen_fichas import ids_en_dropbox
+        ids_almacen = ids_en_dropbox()
+        ids_html |= ids_almacen.get("html", set())
+        ids_json |= ids_almacen.get("json", set())
 
     print(f"✔ HTML encontrados: {len(ids_html)}")
     print(f"✔ JSON encontrados: {len(ids_json)}")
 
-    print("📌 Reset de columnas...")
-    df["ficha_descargada"] = False
-    df["ficha_parseada"] = False
-
-    print("📌 Calculando columnas...")
-    df["ficha_descargada"] = df["id_norma"].apply(lambda x: x in ids_html)
-    df["ficha_parseada"] = df["id_norma"].apply(lambda x: x in ids_json)
-
-    print("📌 Guardando CSV actualizado localmente...")
-    df.to_csv(
-        "data_procesada/digesto_normas.csv",
-        index=False,
-        encoding="utf-8-sig",
-        quoting=csv.QUOTE_ALL,
-        escapechar="\\"
-    )
-
-    print("📌 Subiendo digesto_normas.csv a Dropbox...")
-    with open("data_procesada/digesto_normas.csv", "rb") as f:
-        dropbox_upload("/data_procesada/digesto_normas.csv", f.read())
-
-    # --- digesto_relaciones.csv ---
-    rel_path = "data_procesada/digesto_relaciones.csv"
-    if os.path.exists(rel_path):
-        print("📌 Eliminando remoto: /data_procesada/digesto_relaciones.csv")
-        dropbox_delete("/data_procesada/digesto_relaciones.csv")
-
-        print("📌 Subiendo nuevo digesto_relaciones.csv a Dropbox (delete + recreate)...")
-        with open(rel_path, "rb") as f:
-            dropbox_upload("/data_procesada/digesto_relaciones.csv", f.read())
-    else:
-        print("⚠️ Aviso: data_procesada/digesto_relaciones.csv no existe en este run.")
+    with metricas.etapa("marcado_columnas"):
+        print("📌 Reset de columnas...")
+        df["ficha_descargada"] = False
+        df["ficha_parseada"] = False
+
+        print("📌 Calculando columnas...")
+        df["ficha_descargada"] = df["id_norma"].isin(ids_enteros(ids_html))
+        df["ficha_parseada"] = df["id_norma"].isin(ids_enteros(ids_json))
+
+        print("📌 Guardando CSV actualizado localmente...")
+        escribir_normas(df, "data_procesada/digesto_normas.csv")
+
+    with metricas.etapa("subida_dropbox"):
+        print("📌 Subiendo digesto_normas.csv a Dropbox...")
+        with open("data_procesada/digesto_normas.csv", "rb") as f:
+            dropbox_upload("/data_procesada/digesto_normas.csv", f.read())
+
+        # --- digesto_relaciones.csv ---
+        rel_path = "data_procesada/digesto_relaciones.csv"
+        if os.path.exists(rel_path):
+            print("📌 Eliminando remoto: /data_procesada/digesto_relaciones.csv")
+            dropbox_delete("/data_procesada/digesto_relaciones.csv")
+
+            print("📌 Subiendo nuevo digesto_relaciones.csv a Dropbox (delete + recreate)...")
+            with open(rel_path, "rb") as f:
+                dropbox_upload("/data_procesada/digesto_relaciones.csv", f.read())
+        else:
+            print("⚠️ Aviso: data_procesada/digesto_relaciones.csv no existe en este run.")
 
     print("✔ Sincronización de fichas completada.")
@@ -0,0 +1,454 @@
+# -*- coding: utf-8 -*-
+
+"""Descarga el texto completo de las normas (url_texto_actualizado o url_texto_original) y lo indexa.
+
+El HTML se lee de a bloques y pasa directo por un parser incremental que solo junta el texto
+visible (sin DOM): una ley de varios MB nunca está entera en memoria como HTML. El texto limpio
+queda con un párrafo por renglón y cada "ARTICULO N" empezando renglón, y se guarda en el
+almacén de fichas como tipo "texto" (un texto vacío marca que la norma no tiene texto
+descargable, para no volver a pedirla).
+
+Los textos nuevos se parten por artículo y se indexan de a tandas en el índice de pasajes
+(pasajes.py, data_procesada/indice_textos/), que también se sincroniza con Dropbox. Las normas
+sin texto completo entran con el texto de su ficha (texto_completo_ficha).
+
+Uso:
+    python scripts/textos_normas.py --limite 500
+    python scripts/textos_normas.py --reindexar     # índice de pasajes desde cero, desde el almacén
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import codecs
+import shutil
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from html.parser import HTMLParser
+import pandas as pd
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import metricas
+import pasajes
+import indice_busqueda
+import cambios_infoleg
+from almacen_fichas import AlmacenFichas, bajar_almacen, subir_almacen
+from esquema_digesto import leer_normas
+from cliente_infoleg import CircuitoAbierto
+from scraper_fichas_infoleg import ErrorFicha, CLIENTE_INFOLEG
+
+# ============================================
+# CONFIG
+# ============================================
+
+DROPBOX_CLIENT_ID = os.environ.get("APP_KEY")
+DROPBOX_CLIENT_SECRET = os.environ.get("APP_SECRET")
+DROPBOX_REFRESH_TOKEN = os.environ.get("REFRESH_TOKEN")
+
+NORMAS_CSV = "data_procesada/digesto_normas.csv"
+DROPBOX_TEXTOS_FOLDER = "/data_procesada/indice_textos"
+
+BLOQUE_DESCARGA = 64 * 1024
+TEXTO_MAX_BYTES = 16 * 2**20      # más que esto es un anexo escaneado o una página rota: se trunca
+TANDA_BYTES = 32 * 2**20          # texto acumulado antes de escribir un segmento del índice
+FICHAS_POR_CORRIDA = 20000        # fichas sin texto completo que se indexan por corrida
+CHECKPOINT = 200                  # subir el almacén cada N textos
+
+_CHARSET = re.compile(rb"""charset=["']?([\w-]+)""", re.I)
+_ESPACIOS = re.compile(r"[ \t\r\f\v\xa0]+")
+
+# ============================================
+# EXTRACCIÓN
+# ============================================
+
+class ExtractorTexto(HTMLParser):
+    """Junta el texto visible de un HTML que llega de a pedazos; los bloques pasan a renglones."""
+
+    IGNORADAS = {"script", "style", "head", "title", "noscript"}
+    BLOQUES = {"p", "br", "div", "tr", "li", "table", "blockquote", "center", "hr",
+               "h1", "h2", "h3", "h4", "h5", "h6"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.partes = []
+        self.ignorando = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.IGNORADAS:
+            self.ignorando += 1
+        elif tag in self.BLOQUES:
+            self.partes.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.IGNORADAS:
+            self.ignorando = max(self.ignorando - 1, 0)
+        elif tag in self.BLOQUES:
+            self.partes.append("\n")
+
+    def handle_data(self, data):
+        if not self.ignorando:
+            self.partes.append(data)
+
+    def texto(self):
+        return limpiar_texto("".join(self.partes))
+
+
+def limpiar_texto(crudo):
+    """Un párrafo por renglón, espacios colapsados y cada artículo en un renglón propio."""
+    renglones = (_ESPACIOS.sub(" ", r).strip() for r in crudo.split("\n"))
+    return "\n".join(pasajes.CORTE_ARTICULO.sub("\n", r) for r in renglones if r)
+
+
+def _codificacion(primer_bloque, declarada):
+    m = _CHARSET.search(primer_bloque[:4096])
+    codificacion = m.group(1).decode("ascii").lower() if m else (declarada or "").lower()
+    # Infoleg declara latin-1 pero escribe comillas y guiones de windows-1252
+    if codificacion in ("", "iso-8859-1", "latin-1", "latin1"):
+        return "windows-1252"
+    try:
+        codecs.lookup(codificacion)
+    except LookupError:
+        return "windows-1252"
+    return codificacion
+
+
+def descargar_texto_o_error(url):
+    """Texto limpio de una URL de Infoleg, leyendo el HTML de a BLOQUE_DESCARGA.
+
+    Deja pasar CircuitoAbierto, como descargar_html_infoleg_o_error.
+    """
+    try:
+        # el lugar de concurrencia del cliente queda tomado hasta leer el último bloque
+        with CLIENTE_INFOLEG.get_stream(url) as r:
+            if r.status_code == 404:
+                raise ErrorFicha("http 404", permanente=True)
+            if r.status_code != 200:
+                raise ErrorFicha(f"http {r.status_code}")
+
+            extractor = ExtractorTexto()
+            decodificador = None
+            leidos = 0
+            for bloque in r.iter_content(BLOQUE_DESCARGA):
+                if decodificador is None:
+                    decodificador = codecs.getincrementaldecoder(_codificacion(bloque, r.encoding))(errors="replace")
+                extractor.feed(decodificador.decode(bloque))
+                leidos += len(bloque)
+                if leidos >= TEXTO_MAX_BYTES:
+                    print(f"⚠️ {url}: más de {TEXTO_MAX_BYTES / 2**20:.0f} MB, se trunca")
+                    break
+    except requests.RequestException as e:
+        # fuera del with: así el cliente registra el corte del cuerpo como un fallo
+        raise ErrorFicha(type(e).__name__)
+    if decodificador is not None:
+        extractor.feed(decodificador.decode(b"", final=True))
+    extractor.close()
+    return extractor.texto()
+
+# ============================================
+# SELECCIÓN
+# ============================================
+
+def pendientes(normas_csv, con_texto, limite, cambiadas=()):
+    """[(id_norma, url)] de las normas con URL de texto que todavía no están en el almacén.
+
+    Primero las `cambiadas` (su texto o sus vínculos cambiaron en Infoleg: se vuelven a bajar
+    aunque ya estén), después las más centrales de la telaraña (pagerank) y después las más nuevas.
+    """
+    en_archivo = set(pd.read_csv(normas_csv, nrows=0).columns)
+    columnas = ["id_norma", "url_texto_original", "url_texto_actualizado"]
+    columnas += [c for c in ("pagerank",) if c in en_archivo]
+    df = leer_normas(normas_csv, columnas=columnas).dropna(subset=["id_norma"])
+    df["url"] = df["url_texto_actualizado"].fillna(df["url_texto_original"])
+    df["cambiada"] = df["id_norma"].isin(cambiadas)
+    df = df[df["url"].notna() & (df["cambiada"] | ~df["id_norma"].astype(str).isin(con_texto))]
+    orden = [c for c in ("cambiada", "pagerank", "id_norma") if c in df.columns]
+    df = df.sort_values(orden, ascending=False, na_position="last").drop_duplicates("id_norma")
+    return list(zip(df["id_norma"].astype(int), df["url"].astype(str)))[:limite]
+
+# ============================================
+# INDEXACIÓN
+# ============================================
+
+def texto_de_ficha(almacen, id_norma):
+    ficha = almacen.leer_json(id_norma)
+    return (ficha or {}).get("deep", {}).get("texto_completo_ficha") or ""
+
+
+class Tanda:
+    """Normas esperando a ser partidas en pasajes e indexadas; se vuelcan al pasar TANDA_BYTES."""
+
+    def __init__(self, almacen, directorio=pasajes.PASAJES_DIR, max_bytes=TANDA_BYTES, modelo=None):
+        self.almacen = almacen
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.modelo = modelo
+        self.normas = {}
+        self.bytes = 0
+        self.indexados = 0
+
+    def agregar(self, id_norma, texto, fuente="texto"):
+        """Una norma sin texto completo se indexa con el texto de su ficha, si hay."""
+        if fuente == "texto" and not texto:
+            texto, fuente = texto_de_ficha(self.almacen, id_norma), "ficha_sin_texto"
+        # los vacíos también entran: así el índice sabe que esa norma ya se procesó
+        self.normas[int(id_norma)] = (texto or "", fuente)
+        self.bytes += len(texto or "")
+        if self.bytes >= self.max_bytes:
+            self.volcar()
+
+    def volcar(self):
+        if self.normas:
+            pasajes.agregar(((i, t, f) for i, (t, f) in self.normas.items()), self.directorio, self.modelo)
+            self.indexados += len(self.normas)
+        self.normas, self.bytes = {}, 0
+
+
+def indexar_faltantes(almacen, tanda, limite_fichas=0):
+    """Indexa lo que el almacén tiene y el índice de pasajes no.
+
+    Primero los textos completos (p. ej. si una corrida se cortó antes de volcar, o la norma
+    estaba indexada solo con su ficha); después, hasta `limite_fichas` fichas de normas que
+    todavía no tienen texto. Devuelve cuántas normas se indexaron.
+    """
+    directorio = tanda.directorio
+    if not pasajes.compatible(directorio):
+        print("📌 El índice de textos no es por pasajes: se rehace desde el almacén.")
+        shutil.rmtree(directorio, ignore_errors=True)
+    vigentes = pasajes.IndicePasajes(directorio).fuentes_vigentes() if indice_busqueda.segmentos(directorio) else {}
+    con_texto = (pasajes.FUENTES["texto"], pasajes.FUENTES["ficha_sin_texto"])
+    textos = almacen.ids("texto")
+    faltantes = sorted((i for i in textos if vigentes.get(int(i)) not in con_texto), key=int)
+    for id_norma in faltantes:
+        tanda.agregar(id_norma, almacen.leer("texto", id_norma).decode("utf-8"))
+
+    fichas = sorted((i for i in almacen.ids("json") - textos if int(i) not in vigentes), key=int)[:limite_fichas]
+    for id_norma in fichas:
+        tanda.agregar(id_norma, texto_de_ficha(almacen, id_norma), "ficha")
+    tanda.volcar()
+    return len(faltantes) + len(fichas)
+
+
+def reindexar(almacen, directorio=pasajes.PASAJES_DIR, modelo=None):
+    """Rehace el índice de pasajes desde cero: textos completos y, para el resto, fichas."""
+    shutil.rmtree(directorio, ignore_errors=True)
+    tanda = Tanda(almacen, directorio, modelo=modelo)
+    textos = almacen.ids("texto")
+    for _, id_norma, datos in almacen.iterar("texto"):
+        tanda.agregar(id_norma, datos.decode("utf-8"))
+    for _, id_norma, datos in almacen.iterar("json"):
+        if id_norma not in textos:
+            ficha = json.loads(datos.decode("utf-8"))
+            tanda.agregar(id_norma, ficha.get("deep", {}).get("texto_completo_ficha") or "", "ficha")
+    tanda.volcar()
+    indice_busqueda.compactar(directorio)
+    return tanda.indexados
+
+# ============================================
+# DROPBOX (índice de textos)
+# ============================================
+
+def dropbox_get_access_token():
+    data = {
+        "grant_type": "refresh_token",
+        "refresh_token": DROPBOX_REFRESH_TOKEN,
+        "client_id": DROPBOX_CLIENT_ID,
+        "client_secret": DROPBOX_CLIENT_SECRET,
+    }
+    r = requests.post("https://api.dropbox.com/oauth2/token", data=data)
+    r.raise_for_status()
+    return r.json()["access_token"]
+
+
+def dropbox_listar_recursivo(token, path):
+    """{ruta relativa: tamaño} de todos los archivos debajo de `path` (vacío si no existe)."""
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    r = requests.post("https://api.dropboxapi.com/2/files/list_folder", headers=headers,
+                      json={"path": path, "recursive": True})
+    if r.status_code != 200:
+        return {}
+    data = r.json()
+    entries = data.get("entries", [])
+    while data.get("has_more"):
+        r = requests.post("https://api.dropboxapi.com/2/files/list_folder/continue",
+                          headers=headers, json={"cursor": data["cursor"]})
+        r.raise_for_status()
+        data = r.json()
+        entries.extend(data.get("entries", []))
+    largo = len(path.rstrip("/")) + 1
+    return {e["path_display"][largo:]: e["size"] for e in entries if e[".tag"] == "file"}
+
+
+def dropbox_download_a_archivo(token, remoto, local):
+    headers = {"Authorization": f"Bearer {token}", "Dropbox-API-Arg": json.dumps({"path": remoto})}
+    with requests.post("https://content.dropboxapi.com/2/files/download", headers=headers, stream=True) as r:
+        r.raise_for_status()
+        with open(local, "wb") as f:
+            for bloque in r.iter_content(2**20):
+                f.write(bloque)
+
+
+def dropbox_upload_archivo(token, local, remoto):
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/octet-stream",
+        "Dropbox-API-Arg": json.dumps({"path": remoto, "mode": "overwrite", "autorename": False})
+    }
+    with open(local, "rb") as f:
+        r = requests.post("https://content.dropboxapi.com/2/files/upload", headers=headers, data=f)
+    if r.status_code not in (200, 409):
+        raise Exception(f"Error subiendo a Dropbox: {r.text}")
+
+
+def dropbox_delete(token, path):
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    requests.post("https://api.dropboxapi.com/2/files/delete_v2", headers=headers, json={"path": path})
+
+
+def _archivos_locales(directorio):
+    return {
+        os.path.relpath(os.path.join(raiz, n), directorio).replace(os.sep, "/"): os.path.getsize(os.path.join(raiz, n))
+        for numero in indice_busqueda.segmentos(directorio)
+        for raiz, _, nombres in os.walk(indice_busqueda.ruta_segmento(directorio, numero))
+        for n in nombres
+    }
+
+
+def bajar_indice(directorio=pasajes.PASAJES_DIR):
+    """Trae los segmentos del índice de textos que faltan localmente."""
+    token = dropbox_get_access_token()
+    locales = _archivos_locales(directorio)
+    for relativo, tamano in dropbox_listar_recursivo(token, DROPBOX_TEXTOS_FOLDER).items():
+        if locales.get(relativo) == tamano:
+            continue
+        local = os.path.join(directorio, *relativo.split("/"))
+        os.makedirs(os.path.dirname(local), exist_ok=True)
+        dropbox_download_a_archivo(token, f"{DROPBOX_TEXTOS_FOLDER}/{relativo}", local)
+
+
+def subir_indice(directorio=pasajes.PASAJES_DIR):
+    """Sube los segmentos nuevos y después borra en Dropbox los que se compactaron."""
+    token = dropbox_get_access_token()
+    remotos = dropbox_listar_recursivo(token, DROPBOX_TEXTOS_FOLDER)
+    locales = _archivos_locales(directorio)
+    # meta.json al final de cada segmento: un segmento remoto sin meta.json está a medio subir
+    for relativo in sorted(locales, key=lambda r: (r.split("/")[0], r.endswith("meta.json"))):
+        if remotos.get(relativo) != locales[relativo]:
+            print(f"⬆️ {DROPBOX_TEXTOS_FOLDER}/{relativo} ({locales[relativo] / 2**20:.1f} MB)")
+            dropbox_upload_archivo(token, os.path.join(directorio, relativo), f"{DROPBOX_TEXTOS_FOLDER}/{relativo}")
+    segmentos_locales = {r.split("/")[0] for r in locales}
+    for segmento in {r.split("/")[0] for r in remotos} - segmentos_locales:
+        dropbox_delete(token, f"{DROPBOX_TEXTOS_FOLDER}/{segmento}")
+
+# ============================================
+# TRABAJO
+# ============================================
+
+def procesar_texto(id_norma, url):
+    """Devuelve (texto, error, permanente, espera_circuito) sin levantar excepciones."""
+    try:
+        return descargar_texto_o_error(url), None, False, None
+    except CircuitoAbierto as e:
+        return None, None, False, e.espera
+    except ErrorFicha as e:
+        return None, str(e), e.permanente, None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", False, None
+
+
+def descargar_textos(trabajos, almacen, tanda, max_aperturas=3):
+    """Descarga en paralelo (el cliente de Infoleg acota la concurrencia) y guarda/indexa cada texto."""
+    pendientes_ = deque(trabajos)
+    en_vuelo = {}
+    ok = errores = hechas = 0
+    with ThreadPoolExecutor(CLIENTE_INFOLEG.concurrencia_max) as pool:
+        while pendientes_ or en_vuelo:
+            while pendientes_ and len(en_vuelo) < CLIENTE_INFOLEG.concurrencia_max:
+                id_norma, url = pendientes_.popleft()
+                en_vuelo[pool.submit(procesar_texto, id_norma, url)] = (id_norma, url)
+
+            listos, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            for fut in listos:
+                id_norma, url = en_vuelo.pop(fut)
+                texto, error, permanente, espera = fut.result()
+                if espera is not None:
+                    pendientes_.appendleft((id_norma, url))
+                    continue
+                if error is None or permanente:
+                    # sin texto (404) queda guardado vacío: no se vuelve a pedir
+                    almacen.agregar("texto", id_norma, (texto or "").encode("utf-8"))
+                    tanda.agregar(id_norma, texto)
+                    ok += error is None
+                if error is not None:
+                    errores += 1
+                    print(f"⚠️ {id_norma}: {error}")
+                hechas += 1
+                metricas.sumar_filas(1)
+                if hechas % CHECKPOINT == 0:
+                    print(f"{hechas}/{len(trabajos)} · ok {ok} · errores {errores} · checkpoint")
+                    subir_almacen()
+
+            espera = CLIENTE_INFOLEG.espera_restante()
+            if espera:
+                if CLIENTE_INFOLEG.aperturas > max_aperturas:
+                    print("⛔ Infoleg sigue degradado, se corta la corrida (lo pendiente sigue sin texto).")
+                    pendientes_.clear()
+                    continue
+                print(f"⏸️ Esperando {espera:.0f}s a que Infoleg se recupere...")
+                time.sleep(espera)
+    return ok, errores
+
+# ============================================
+# PRINCIPAL
+# ============================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--normas", default=NORMAS_CSV)
+    parser.add_argument("--limite", type=int, default=500, help="textos por corrida")
+    parser.add_argument("--max-aperturas", type=int, default=3,
+                        help="cortar la corrida si el circuito de Infoleg se abre más veces que esto")
+    parser.add_argument("--fichas", type=int, default=FICHAS_POR_CORRIDA,
+                        help="fichas sin texto completo a indexar por corrida")
+    parser.add_argument("--reindexar", action="store_true", help="rehacer el índice de pasajes desde el almacén")
+    parser.add_argument("--embeddings", action="store_true", help="guardar embeddings de los pasajes (sentence-transformers)")
+    parser.add_argument("--local", action="store_true", help="no bajar ni subir nada de Dropbox")
+    args = parser.parse_args()
+
+    metricas.iniciar("textos_normas")
+
+    with metricas.etapa("almacen"):
+        if not args.local:
+            bajar_almacen(completo=args.reindexar)
+            bajar_indice()
+        almacen = AlmacenFichas(bajar_faltantes=not args.local)
+
+    modelo = indice_busqueda.cargar_modelo() if args.embeddings else None
+    tanda = Tanda(almacen, modelo=modelo)
+    try:
+        if args.reindexar:
+            with metricas.etapa("reindexar"):
+                print(f"✔ Índice de pasajes rehecho: {reindexar(almacen, modelo=modelo):,} normas")
+        else:
+            with metricas.etapa("indice"):
+                recuperados = indexar_faltantes(almacen, tanda, args.fichas)
+                if recuperados:
+                    print(f"📌 {recuperados:,} normas del almacén que faltaban en el índice de pasajes.")
+
+            cambiadas = cambios_infoleg.normas_con_cambios(cambios_infoleg.cargar(), ("textos", "vinculos"))
+            trabajos = pendientes(args.normas, almacen.ids("texto"), args.limite, cambiadas.tolist())
+            print(f"Descargando {len(trabajos)} textos (hasta {CLIENTE_INFOLEG.concurrencia_max} en paralelo)...")
+            with metricas.etapa("descarga"):
+                ok, errores = descargar_textos(trabajos, almacen, tanda, args.max_aperturas)
+            print(f"✔ Textos ok: {ok} · errores: {errores}")
+    finally:
+        # el almacén antes que el índice: el índice nunca nombra un texto que no quedó subido
+        with metricas.etapa("indice"):
+            tanda.volcar()
+        if not args.local:
+            subir_almacen()
+            subir_indice()
+        almacen.cerrar()